@@ -0,0 +1,283 @@
+"""Benchmark setup and refresh cycles of the sensor platform against a simulated account.
+
+Run from the repository root:
+
+    python -m benchmarks.refresh --batteries 1,10,100,1000 --latency 0.05
+    python -m benchmarks.refresh --save       # store the results as the new baseline
+    python -m benchmarks.refresh --compare    # exit with 1 on a regression against the baseline
+
+Every scenario sets up one config entry with async_setup_entry, runs the
+first refresh (login, discovery and the initial fetch) and then the given
+number of scheduled _refresh_sensors cycles. Requests go through the real
+AsyncFrankEnergie client, rate limiter and batching to a simulated session.
+The background backfill of the session history is not part of the cycles.
+"""
+import argparse
+import asyncio
+import functools
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from unittest.mock import patch
+
+from homeassistant.helpers.entity import Entity
+
+from custom_components.frank_energie_slim import sensor
+from custom_components.frank_energie_slim.ratelimit import TokenBucket
+from .simulated_api import SimulatedAccount, SimulatedSession
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+# Relative slack on timings and memory before a scenario counts as a regression;
+# request and write counts are deterministic and compared exactly
+DEFAULT_TOLERANCE = 0.25
+
+
+class _States:
+    def async_available(self, entity_id):
+        return True
+
+
+class _Config:
+    def __init__(self, config_dir):
+        self.config_dir = config_dir
+        self.components = set()
+
+    def path(self, *parts):
+        return os.path.join(self.config_dir, *parts)
+
+
+class BenchmarkHass:
+    """Just enough of HomeAssistant for the sensor platform."""
+
+    def __init__(self, config_dir):
+        self.data = {}
+        self.states = _States()
+        self.config = _Config(config_dir)
+        self.pending = []
+        self.skipped_tasks = 0
+        self.is_stopping = False
+
+    def async_create_task(self, coro):
+        if coro.cr_code.co_name == "_async_sync_history":
+            # The history backfill runs outside of the refresh cycle
+            coro.close()
+            self.skipped_tasks += 1
+            return None
+        self.pending.append(coro)
+        return None
+
+    async def async_add_executor_job(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    async def async_run_pending(self):
+        while self.pending:
+            await self.pending.pop(0)
+
+
+class BenchmarkEntry:
+    def __init__(self, options):
+        self.entry_id = "benchmark"
+        self.data = {"username": "benchmark@example.com", "password": "benchmark"}
+        self.options = options
+        self._on_unload = []
+
+    def async_on_unload(self, func):
+        self._on_unload.append(func)
+
+    async def async_unload(self):
+        for func in reversed(self._on_unload):
+            result = func()
+            if asyncio.iscoroutine(result):
+                await result
+
+
+class _TokenStore:
+    async def async_get(self, username):
+        return None
+
+    def async_update(self, username, auth):
+        pass
+
+
+class _SnapshotStore:
+    def __init__(self, hass, entry_id):
+        self.saves = 0
+
+    async def async_load(self):
+        return None, []
+
+    def async_save(self, battery_data):
+        self.saves += 1
+
+
+async def _no_migration(hass, entry):
+    pass
+
+
+async def run_scenario(batteries, latency=0.0, cycles=5, changed_fraction=0.5, batch_requests=True):
+    """Set up an entry for a simulated account and run refresh cycles; returns the measurements."""
+    account = SimulatedAccount(batteries, changed_fraction)
+    session = SimulatedSession(account, latency)
+    writes = 0
+    scheduled = []
+
+    def count_write(entity):
+        nonlocal writes
+        writes += 1
+
+    def add_entities(new_entities):
+        # The entity platform writes the initial state of every added entity and subscribes it to its coordinator
+        for entity in new_entities:
+            entity.async_write_ha_state()
+            entity.coordinator.async_add_listener(entity._handle_coordinator_update)
+
+    def call_later(hass, delay, action):
+        scheduled.append(action)
+        return lambda: None
+
+    def measure(before_requests, before_writes, started):
+        return (
+            (time.perf_counter() - started) * 1000,
+            sum(session.requests.values()) - before_requests,
+            writes - before_writes,
+        )
+
+    with tempfile.TemporaryDirectory() as config_dir, \
+            patch.object(Entity, "async_write_ha_state", count_write), \
+            patch.object(sensor, "async_create_clientsession", lambda hass: session), \
+            patch.object(sensor, "async_call_later", call_later), \
+            patch.object(sensor, "async_migrate_total_unique_ids", _no_migration), \
+            patch.object(sensor, "get_token_store", lambda hass: _TokenStore()), \
+            patch.object(sensor, "SnapshotStore", _SnapshotStore), \
+            patch.object(sensor, "AsyncFrankEnergie", functools.partial(sensor.AsyncFrankEnergie, rate_limiter=TokenBucket())):
+        # A fresh rate limiter per scenario, so scenarios do not share a drained bucket
+        hass = BenchmarkHass(config_dir)
+        entry = BenchmarkEntry({"batch_requests": batch_requests})
+
+        started = time.perf_counter()
+        await sensor.async_setup_entry(hass, entry, add_entities)
+        setup_ms, _, setup_writes = measure(0, 0, started)
+
+        started = time.perf_counter()
+        await hass.async_run_pending()
+        first_ms, first_requests, first_writes = measure(0, setup_writes, started)
+
+        cycle_ms, cycle_requests, cycle_writes, cycle_bytes, alloc_peaks = [], [], [], [], []
+        for cycle in range(cycles):
+            account.advance()
+            refresh = scheduled.pop()
+            before_requests, before_writes = sum(session.requests.values()), writes
+            before_bytes = session.bytes_sent
+            # Allocations are traced in a separate, last cycle so tracing does not skew the timings
+            traced = cycle == cycles - 1
+            if traced:
+                tracemalloc.start()
+            started = time.perf_counter()
+            await refresh(None)
+            await hass.async_run_pending()
+            elapsed, requests, cycle_write_count = measure(before_requests, before_writes, started)
+            if traced:
+                alloc_peaks.append(tracemalloc.get_traced_memory()[1] / 1024)
+                tracemalloc.stop()
+            else:
+                cycle_ms.append(elapsed)
+            cycle_requests.append(requests)
+            cycle_writes.append(cycle_write_count)
+            cycle_bytes.append(session.bytes_sent - before_bytes)
+
+        await entry.async_unload()
+
+    return {
+        "entities": len(hass.data["frank_energie_slim"][entry.entry_id]["entities"]),
+        "setup_ms": round(setup_ms, 2),
+        "first_cycle_ms": round(first_ms, 2),
+        "first_cycle_requests": first_requests,
+        "first_cycle_writes": first_writes,
+        "cycle_ms": round(statistics.median(cycle_ms), 2) if cycle_ms else None,
+        "requests_per_cycle": max(cycle_requests) if cycle_requests else None,
+        "writes_per_cycle": max(cycle_writes) if cycle_writes else None,
+        "upload_bytes_per_cycle": max(cycle_bytes) if cycle_bytes else None,
+        "alloc_peak_kib": round(max(alloc_peaks), 1) if alloc_peaks else None,
+    }
+
+
+def scenario_key(batteries, latency, batch_requests):
+    return f"batteries={batteries},latency={latency},{'batch' if batch_requests else 'concurrent'}"
+
+
+COUNT_METRICS = (
+    "first_cycle_requests", "first_cycle_writes", "requests_per_cycle", "writes_per_cycle", "upload_bytes_per_cycle",
+)
+SCALED_METRICS = ("setup_ms", "first_cycle_ms", "cycle_ms", "alloc_peak_kib")
+
+
+def find_regressions(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Return one message per metric that got worse than its baseline."""
+    regressions = []
+    for key, result in results.items():
+        expected = baseline.get(key)
+        if expected is None:
+            continue
+        for metric in COUNT_METRICS:
+            if expected.get(metric) is not None and result[metric] > expected[metric]:
+                regressions.append(f"{key}: {metric} {result[metric]} > {expected[metric]}")
+        for metric in SCALED_METRICS:
+            if expected.get(metric) and result[metric] > expected[metric] * (1 + tolerance):
+                regressions.append(f"{key}: {metric} {result[metric]} > {expected[metric]} (+{tolerance:.0%})")
+    return regressions
+
+
+def _print_table(results):
+    columns = ("entities",) + SCALED_METRICS + COUNT_METRICS
+    print("scenario".ljust(44) + "".join(column.rjust(24) for column in columns))
+    for key, result in results.items():
+        print(key.ljust(44) + "".join(str(result[column]).rjust(24) for column in columns))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batteries", default="1,10,100,1000", help="comma separated battery counts")
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated API latency per request in seconds")
+    parser.add_argument("--cycles", type=int, default=5, help="refresh cycles after the first one")
+    parser.add_argument("--changed", type=float, default=0.5, help="fraction of batteries changing per cycle")
+    parser.add_argument("--concurrent", action="store_true", help="fetch per battery instead of batched")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--save", action="store_true", help="merge the results into the baseline file")
+    parser.add_argument("--compare", action="store_true", help="exit with 1 when a metric regressed")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.ERROR)
+
+    results = {}
+    for batteries in (int(count) for count in args.batteries.split(",")):
+        key = scenario_key(batteries, args.latency, not args.concurrent)
+        results[key] = asyncio.run(run_scenario(
+            batteries, args.latency, args.cycles, args.changed, batch_requests=not args.concurrent
+        ))
+    _print_table(results)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    if args.compare:
+        regressions = find_regressions(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    if args.save:
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
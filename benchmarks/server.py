@@ -0,0 +1,220 @@
+"""Local stand-in for the Frank Energie GraphQL API, with fault injection.
+
+Run from the repository root and point the integration at it:
+
+    python -m benchmarks.server --batteries 10 --latency 0.2 --error-rate 0.05 --auth-expiry 600
+    FRANK_ENERGIE_SLIM_DATA_URL=http://127.0.0.1:8765/ hass -c config
+
+Responses come from a SimulatedAccount, or from recorded responses given
+with --fixture OPERATION=PATH. Any password is accepted. Queries may be sent
+by hash as Automatic Persisted Queries, by POST or by GET; --no-persisted-queries
+and --no-get emulate a server without either. GET /_stats returns
+the request and fault counters, POST /_expire invalidates all issued tokens
+and POST /_advance moves the simulated values to the next quarter-hour.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+from itertools import count
+
+from aiohttp import web
+
+from .simulated_api import SimulatedAccount, parse_get_url
+
+AUTH_ERROR = "user-error:auth-not-authorised"
+# Operations that do not need an auth token
+PUBLIC_OPERATIONS = ("Login", "RenewToken")
+
+
+class Faults:
+    """Fault injection settings; every rate is the probability per request."""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, rate_limit_rate=0.0, retry_after=1,
+                 null_data_rate=0.0, auth_error_rate=0.0, auth_expiry=None, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.null_data_rate = null_data_rate
+        self.auth_error_rate = auth_error_rate
+        # Seconds an issued auth token stays valid, None for no expiry
+        self.auth_expiry = auth_expiry
+        self._random = random.Random(seed)
+
+    def delay(self):
+        return max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+
+    def roll(self, rate):
+        return rate > 0 and self._random.random() < rate
+
+    def error_status(self):
+        return self._random.choice((500, 502, 503))
+
+
+class StandInAPI:
+    """Answers GraphQL requests like the Frank Energie API, injecting the configured faults."""
+
+    def __init__(self, account, faults=None, fixtures=None, clock=time.monotonic):
+        self.account = account
+        self.faults = faults or Faults()
+        self.fixtures = fixtures or {}
+        self.stats = Counter()
+        self._clock = clock
+        self._serial = count(1)
+        # token -> time it was issued
+        self._auth_tokens = {}
+        self._refresh_tokens = set()
+
+    def _issue_tokens(self):
+        serial = next(self._serial)
+        auth_token, refresh_token = f"stand-in-auth-{serial}", f"stand-in-refresh-{serial}"
+        self._auth_tokens[auth_token] = self._clock()
+        self._refresh_tokens.add(refresh_token)
+        return {"authToken": auth_token, "refreshToken": refresh_token}
+
+    def expire_tokens(self):
+        """Invalidate all auth tokens; refresh tokens stay valid."""
+        self._auth_tokens.clear()
+
+    def _authorised(self, headers):
+        token = (headers.get("Authorization") or "").removeprefix("Bearer ")
+        issued = self._auth_tokens.get(token)
+        if issued is None:
+            return False
+        expiry = self.faults.auth_expiry
+        if expiry is not None and self._clock() - issued > expiry:
+            del self._auth_tokens[token]
+            return False
+        return True
+
+    def _auth_error(self):
+        self.stats["fault:auth"] += 1
+        return 200, {}, {"errors": [{"message": AUTH_ERROR}], "data": None}
+
+    def _execute(self, query_data):
+        operation = query_data.get("operationName")
+        if operation == "Login":
+            return {"data": {"login": self._issue_tokens()}}
+        if operation == "RenewToken":
+            refresh_token = (query_data.get("variables") or {}).get("refreshToken")
+            if refresh_token not in self._refresh_tokens:
+                return {"errors": [{"message": AUTH_ERROR}], "data": None}
+            self._refresh_tokens.discard(refresh_token)
+            return {"data": {"renewToken": self._issue_tokens()}}
+        if operation in self.fixtures:
+            return self.fixtures[operation]
+        return self.account.execute(query_data)
+
+    async def handle(self, query_data, headers):
+        """Return (status, headers, body) for a GraphQL request payload."""
+        operation = query_data.get("operationName")
+        self.stats[f"operation:{operation}"] += 1
+        delay = self.faults.delay()
+        if delay:
+            await asyncio.sleep(delay)
+        if self.faults.roll(self.faults.rate_limit_rate):
+            self.stats["fault:429"] += 1
+            return 429, {"Retry-After": str(self.faults.retry_after)}, {"errors": [{"message": "Too many requests"}]}
+        if self.faults.roll(self.faults.error_rate):
+            self.stats["fault:5xx"] += 1
+            return self.faults.error_status(), {}, {"errors": [{"message": "Internal error"}]}
+        if "extensions" in query_data:
+            query_data, error = self.account.resolve(query_data)
+            if error is not None:
+                self.stats["persisted:miss"] += 1
+                return 200, {}, error
+        if operation not in PUBLIC_OPERATIONS:
+            if not self._authorised(headers) or self.faults.roll(self.faults.auth_error_rate):
+                return self._auth_error()
+        if self.faults.roll(self.faults.null_data_rate):
+            self.stats["fault:null"] += 1
+            return 200, {}, {"data": None}
+        return 200, {}, self._execute(query_data)
+
+
+def create_app(api, get_requests=True):
+    async def graphql(request):
+        try:
+            query_data = await request.json()
+        except ValueError:
+            return web.json_response({"errors": [{"message": "Invalid JSON"}]}, status=400)
+        status, headers, body = await api.handle(query_data, request.headers)
+        return web.json_response(body, status=status, headers=headers)
+
+    async def graphql_get(request):
+        if not get_requests:
+            return web.json_response({"errors": [{"message": "Method not allowed"}]}, status=405)
+        try:
+            query_data = parse_get_url(str(request.url))
+        except (KeyError, ValueError):
+            return web.json_response({"errors": [{"message": "Invalid request"}]}, status=400)
+        status, headers, body = await api.handle(query_data, request.headers)
+        return web.json_response(body, status=status, headers=headers)
+
+    async def stats(request):
+        return web.json_response(dict(api.stats))
+
+    async def expire(request):
+        api.expire_tokens()
+        return web.json_response({"expired": True})
+
+    async def advance(request):
+        api.account.advance()
+        return web.json_response({"cycle": api.account.cycle})
+
+    app = web.Application()
+    app.router.add_post("/", graphql)
+    app.router.add_get("/", graphql_get)
+    app.router.add_get("/_stats", stats)
+    app.router.add_post("/_expire", expire)
+    app.router.add_post("/_advance", advance)
+    return app
+
+
+def load_fixtures(specs):
+    """Map OPERATION=PATH arguments to the recorded responses in those files."""
+    fixtures = {}
+    for spec in specs or []:
+        operation, _, path = spec.partition("=")
+        with open(path) as f:
+            fixtures[operation] = json.load(f)
+    return fixtures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--batteries", type=int, default=1)
+    parser.add_argument("--fixture", action="append", metavar="OPERATION=PATH",
+                        help="answer OPERATION with the recorded response in PATH")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random +/- seconds on the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability of a 5xx response")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="probability of a 429 response")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with a 429")
+    parser.add_argument("--null-data-rate", type=float, default=0.0, help='probability of a {"data": null} response')
+    parser.add_argument("--auth-error-rate", type=float, default=0.0, help="probability of rejecting a valid token")
+    parser.add_argument("--auth-expiry", type=float, default=None, help="seconds an auth token stays valid")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--no-persisted-queries", action="store_true", help="reject queries sent by hash")
+    parser.add_argument("--no-get", action="store_true", help="answer GET requests with 405")
+    args = parser.parse_args(argv)
+
+    faults = Faults(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after,
+        null_data_rate=args.null_data_rate, auth_error_rate=args.auth_error_rate,
+        auth_expiry=args.auth_expiry, seed=args.seed,
+    )
+    account = SimulatedAccount(args.batteries, persisted_queries=not args.no_persisted_queries)
+    api = StandInAPI(account, faults, load_fixtures(args.fixture))
+    web.run_app(create_app(api, get_requests=not args.no_get), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
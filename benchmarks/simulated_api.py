@@ -0,0 +1,203 @@
+"""Simulated Frank Energie account answering the integration's GraphQL queries."""
+import asyncio
+import hashlib
+import json
+import re
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qsl, urlsplit
+
+# b{index}_{alias}: field(... deviceId: $d{index}) as written by build_battery_batch_query
+_BATCH_SELECTION = re.compile(r"(b\d+_(?:sessions|battery|summary)):\s*(\w+)\([^)]*deviceId:\s*\$(\w+)\)")
+PERSISTED_QUERY_NOT_FOUND = {"errors": [{
+    "message": "PersistedQueryNotFound", "extensions": {"code": "PERSISTED_QUERY_NOT_FOUND"},
+}], "data": None}
+PERSISTED_QUERY_NOT_SUPPORTED = {"errors": [{"message": "Must provide query string."}], "data": None}
+
+
+class SimulatedAccount:
+    """An account with a number of batteries whose values move every cycle.
+
+    execute() answers a GraphQL request payload the way the Frank Energie API
+    would, for the queries the integration sends. advance() moves the values of
+    changed_fraction of the batteries, like a new quarter-hour of trading.
+    """
+
+    def __init__(self, batteries=1, changed_fraction=1.0, start=None, persisted_queries=True):
+        self.device_ids = [f"battery{index:04d}" for index in range(batteries)]
+        self.changed_fraction = changed_fraction
+        self.cycle = 0
+        self._now = start or datetime(2025, 4, 20, 11, 0, tzinfo=timezone.utc)
+        self._results = {device_id: 0.0 for device_id in self.device_ids}
+        self._soc = {device_id: 50 for device_id in self.device_ids}
+        self.persisted_queries = persisted_queries
+        # sha256 hash -> document registered through Automatic Persisted Queries
+        self.persisted = {}
+
+    def advance(self):
+        self.cycle += 1
+        self._now += timedelta(minutes=15)
+        changed = round(len(self.device_ids) * self.changed_fraction)
+        for device_id in self.device_ids[:changed]:
+            self._results[device_id] = round(self._results[device_id] + 0.25, 2)
+            self._soc[device_id] = 20 + (self._soc[device_id] + 7) % 70
+
+    def _sessions(self, device_id, start_date, end_date):
+        total = self._results[device_id]
+        return {
+            "deviceId": device_id,
+            "periodStartDate": start_date,
+            "periodEndDate": end_date,
+            "periodEpexResult": round(total * 0.1, 4),
+            "periodFrankSlim": round(total * 0.2, 4),
+            "periodImbalanceResult": round(total * 0.7, 4),
+            "periodTotalResult": total,
+            "periodTradeIndex": None,
+            "periodTradingResult": round(total * 0.9, 4),
+            "sessions": [{"date": end_date, "result": total, "cumulativeResult": total}],
+        }
+
+    def _battery(self, device_id):
+        return {
+            "brand": "SolarEdge",
+            "capacity": 16,
+            "id": device_id,
+            "settings": {
+                "batteryMode": "IMBALANCE_TRADING",
+                "imbalanceTradingStrategy": "AGGRESSIVE",
+                "selfConsumptionTradingAllowed": True,
+            },
+        }
+
+    def _summary(self, device_id):
+        return {
+            "lastKnownStateOfCharge": self._soc[device_id],
+            "lastKnownStatus": "CHARGE_IMBALANCE",
+            "lastUpdate": self._now.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+            "totalResult": 200 + self._results[device_id],
+        }
+
+    def _field(self, field, device_id, variables):
+        if device_id not in self._results:
+            return None
+        if field == "smartBatterySessions":
+            return self._sessions(device_id, variables.get("startDate"), variables.get("endDate"))
+        if field == "smartBattery":
+            return self._battery(device_id)
+        return self._summary(device_id)
+
+    def resolve(self, query_data):
+        """Fill in the document of a hash-only request.
+
+        Returns (query_data, None), or (None, error body) when the hash is not
+        registered yet or persisted queries are switched off.
+        """
+        persisted = (query_data.get("extensions") or {}).get("persistedQuery")
+        if "query" in query_data:
+            if persisted and self.persisted_queries:
+                document = query_data["query"]
+                if hashlib.sha256(document.encode()).hexdigest() == persisted.get("sha256Hash"):
+                    self.persisted[persisted["sha256Hash"]] = document
+            return query_data, None
+        if not self.persisted_queries or not persisted:
+            return None, PERSISTED_QUERY_NOT_SUPPORTED
+        document = self.persisted.get(persisted.get("sha256Hash"))
+        if document is None:
+            return None, PERSISTED_QUERY_NOT_FOUND
+        return dict(query_data, query=document), None
+
+    def execute(self, query_data):
+        """Return the response body for a GraphQL request payload."""
+        query_data, error = self.resolve(query_data)
+        if error is not None:
+            return error
+        operation = query_data.get("operationName")
+        variables = query_data.get("variables") or {}
+        if operation in ("Login", "RenewToken"):
+            field = "login" if operation == "Login" else "renewToken"
+            return {"data": {field: {"authToken": "simulated-token", "refreshToken": "simulated-refresh"}}}
+        if operation == "SmartBatteries":
+            return {"data": {"smartBatteries": [{"id": device_id} for device_id in self.device_ids]}}
+        if operation == "SmartBatteryBatch":
+            return {"data": {
+                alias: self._field(field, variables.get(var), variables)
+                for alias, field, var in _BATCH_SELECTION.findall(query_data["query"])
+            }}
+        device_id = variables.get("deviceId")
+        if operation == "SmartBattery":
+            return {"data": {
+                "smartBattery": self._field("smartBattery", device_id, variables),
+                "smartBatterySummary": self._field("smartBatterySummary", device_id, variables),
+            }}
+        if operation == "SmartBatterySessions":
+            return {"data": {"smartBatterySessions": self._field("smartBatterySessions", device_id, variables)}}
+        if operation == "SmartBatterySummary":
+            return {"data": {"smartBatterySummary": self._field("smartBatterySummary", device_id, variables)}}
+        return {"errors": [{"message": f"Unknown operation {operation}"}]}
+
+
+class SimulatedResponse:
+    def __init__(self, body, status=200):
+        self._body = body
+        self.status = status
+        self.headers = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    async def json(self):
+        return self._body
+
+    async def read(self):
+        return json.dumps(self._body).encode()
+
+
+class SimulatedSession:
+    """Stands in for the aiohttp session, answering from a SimulatedAccount after latency seconds."""
+
+    def __init__(self, account, latency=0.0):
+        self.account = account
+        self.latency = latency
+        self.requests = Counter()
+        self.bytes_sent = 0
+
+    def post(self, url, data=None, headers=None, **kwargs):
+        query_data = json.loads(data)
+        self.requests[query_data.get("operationName")] += 1
+        self.bytes_sent += len(data)
+        return _DelayedResponse(self, query_data)
+
+    def get(self, url, headers=None, **kwargs):
+        query_data = parse_get_url(url)
+        self.requests[query_data.get("operationName")] += 1
+        self.bytes_sent += len(url)
+        return _DelayedResponse(self, query_data)
+
+
+def parse_get_url(url):
+    """Return the payload of a GraphQL GET request url."""
+    params = dict(parse_qsl(urlsplit(url).query))
+    return {
+        key: json.loads(params[key]) if key in ("variables", "extensions") else params[key]
+        for key in params
+    }
+
+
+class _DelayedResponse:
+    def __init__(self, session, query_data):
+        self._session = session
+        self._query_data = query_data
+
+    async def __aenter__(self):
+        if self._session.latency:
+            await asyncio.sleep(self._session.latency)
+        return SimulatedResponse(self._session.account.execute(self._query_data))
+
+    async def __aexit__(self, *exc):
+        return False
@@ -1,20 +1,64 @@
 # Initialize the Frank Energie Slim package
-
-async def _frank_energie_load_data(hass, client):
-    """Fetch data and update entities for Frank Energie."""
-    # No longer needed: entity setup is now handled in sensor.py
-    pass
+from homeassistant.core import SupportsResponse
 
 async def async_setup(hass, config):
     """Set up the Frank Energie integration."""
-    conf = config.get("frank_energie")
-    if conf is None:
-        return True
-    # No longer needed: entity setup is now handled in sensor.py
+
+    async def _async_handle_refresh(call):
+        """Refresh all entries now, optionally refetching the cached battery details."""
+        for data in list(hass.data.get("frank_energie_slim", {}).values()):
+            refresh = data.get("refresh")
+            if refresh is not None:
+                await refresh(refresh_details=call.data.get("details", True))
+
+    hass.services.async_register("frank_energie_slim", "refresh", _async_handle_refresh)
+
+    async def _async_handle_profile_refresh(call):
+        """Profile one refresh cycle per entry and write the reports to the config dir."""
+        # Only loaded when profiling, so cProfile and pstats stay out of startup
+        from .profiling import async_profile_refresh
+        entry_id = call.data.get("entry_id")
+        results = []
+        for data_entry_id, data in list(hass.data.get("frank_energie_slim", {}).items()):
+            refresh = data.get("refresh")
+            if refresh is None or (entry_id and data_entry_id != entry_id):
+                continue
+            results.append(await async_profile_refresh(hass, data_entry_id, refresh))
+        return {"profiles": results}
+
+    hass.services.async_register(
+        "frank_energie_slim", "profile_refresh", _async_handle_profile_refresh,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
     return True
 
 async def async_setup_entry(hass, entry):
     """Set up Frank Energie from a config entry."""
     # Delegate entity setup to sensor.py
     await hass.config_entries.async_forward_entry_setups(entry, ["sensor"])
-    return True
\ No newline at end of file
+    # Reload when the options change so the new fetch settings take effect
+    entry.async_on_unload(entry.add_update_listener(_async_reload_entry))
+    return True
+
+async def _async_reload_entry(hass, entry):
+    await hass.config_entries.async_reload(entry.entry_id)
+
+async def async_remove_entry(hass, entry):
+    """Forget the snapshot of the entry, and its tokens once no other entry uses the account."""
+    from .snapshot import SnapshotStore
+    from .tokens import get_token_store
+    await SnapshotStore(hass, entry.entry_id).async_remove()
+    username = entry.data.get("username")
+    others = [
+        other for other in hass.config_entries.async_entries("frank_energie_slim")
+        if other.entry_id != entry.entry_id and other.data.get("username") == username
+    ]
+    if not others:
+        await get_token_store(hass).async_remove(username)
+
+async def async_unload_entry(hass, entry):
+    """Unload a Frank Energie config entry."""
+    unloaded = await hass.config_entries.async_unload_platforms(entry, ["sensor"])
+    if unloaded:
+        hass.data.get("frank_energie_slim", {}).pop(entry.entry_id, None)
+    return unloaded
@@ -1,162 +1,633 @@
-import requests
-from datetime import datetime
+import asyncio
+import base64
+import json
+import os
+import aiohttp
+import time
+from functools import lru_cache
 import logging
+from .breaker import CircuitBreaker, CircuitOpenError
+from .graphql import PERSISTED_QUERY_NOT_FOUND, compile_query, compiled_for, persisted_query_error
+from .metrics import ApiMetrics
+from .ratelimit import (
+    GRAPHQL_RATE_LIMITER,
+    RETRY_STATUSES,
+    RetryPolicy,
+    TransientError,
+    parse_retry_after,
+    remaining_time,
+)
 
 _LOGGER: logging.Logger = logging.getLogger(__package__)
 
-class FrankEnergie:
-    def __init__(self, auth_token=None, refresh_token=None):
-        self.DATA_URL = "https://frank-graphql-prod.graphcdn.app/"
-        self.auth = {"auth_token": auth_token, "refresh_token": refresh_token} if auth_token or refresh_token else None
+DATA_URL = "https://frank-graphql-prod.graphcdn.app/"
+# Points the clients at another GraphQL endpoint, such as the local stand-in in benchmarks/server.py
+DATA_URL_ENV = "FRANK_ENERGIE_SLIM_DATA_URL"
+DEFAULT_MAX_CONCURRENCY = 4
+# Renew the auth token this many seconds before it expires
+TOKEN_REFRESH_MARGIN = 300
 
-    def query(self, query_data):
-        headers = {
-            'Content-Type': 'application/json',
-            'User-Agent': 'Python/FrankV1',
+
+def get_data_url():
+    return os.environ.get(DATA_URL_ENV) or DATA_URL
+
+
+def _build_headers(auth):
+    headers = {
+        'Content-Type': 'application/json',
+        'User-Agent': 'Python/FrankV1',
+    }
+    if auth and auth.get('authToken'):
+        headers['Authorization'] = f"Bearer {auth['authToken']}"
+    return headers
+
+
+def _variables_key(variables):
+    """Return variables as canonical JSON, to match identical queries."""
+    return json.dumps(variables or {}, sort_keys=True, separators=(',', ':'), default=str)
+
+
+def _check_response(query_data, data):
+    """Log GraphQL errors and raise on authentication failures."""
+    # Log GraphQL request when API responds with errors to aid debugging
+    errors = data.get('errors') if isinstance(data, dict) else None
+    if isinstance(errors, list) and errors:
+        # Build a redacted copy of the request to avoid leaking secrets
+        safe_query = query_data
+        try:
+            if isinstance(query_data, dict):
+                safe_query = dict(query_data)
+                vars_in = safe_query.get('variables') if isinstance(safe_query.get('variables'), dict) else None
+                if isinstance(vars_in, dict):
+                    vars_copy = dict(vars_in)
+                    for k in ['password', 'email', 'authToken', 'refreshToken', 'token', 'authorization', 'Authorization']:
+                        if k in vars_copy and vars_copy[k] is not None:
+                            vars_copy[k] = '***REDACTED***'
+                    safe_query['variables'] = vars_copy
+        except Exception:
+            # Best-effort redaction; ignore redaction failures
+            pass
+        _LOGGER.error("GraphQL returned errors: %s; Request payload: %s", errors, safe_query)
+
+        # Preserve explicit handling of authentication errors
+        for error in errors:
+            if isinstance(error, dict) and error.get('message') == "user-error:auth-not-authorised":
+                raise Exception("Authentication required")
+
+
+_LOGIN = compile_query("Login", """
+    mutation Login($email: String!, $password: String!) {
+        login(email: $email, password: $password) {
+            authToken
+            refreshToken
+        }
+    }
+""")
+
+
+def _login_query(username, password):
+    return _LOGIN.payload({"email": username, "password": password})
+
+
+def _parse_login(response):
+    # If errors are present, raise the first error message
+    if response and 'errors' in response and response['errors']:
+        raise Exception(response['errors'][0].get('message', 'Onbekende fout'))
+    # Defensive: check for expected structure
+    if not response or 'data' not in response:
+        raise Exception("Inloggen mislukt: controleer gebruikersnaam en wachtwoord.")
+    return response['data']['login']
+
+
+_RENEW_TOKEN = compile_query("RenewToken", """
+    mutation RenewToken($authToken: String!, $refreshToken: String!) {
+        renewToken(authToken: $authToken, refreshToken: $refreshToken) {
+            authToken
+            refreshToken
+        }
+    }
+""")
+
+
+def _renew_token_query(auth_token, refresh_token):
+    return _RENEW_TOKEN.payload({"authToken": auth_token, "refreshToken": refresh_token})
+
+
+def _parse_renew_token(response):
+    renewed = ((response or {}).get('data') or {}).get('renewToken')
+    if not renewed or not renewed.get('authToken'):
+        raise Exception("Authentication required")
+    return renewed
+
+
+def get_token_expiry(token):
+    """Return the ``exp`` claim of a JWT as a unix timestamp, or None if it cannot be read.
+
+    The signature is not verified; the expiry is only used to renew the token in time.
+    """
+    try:
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload)).get('exp')
+        return float(exp) if exp is not None else None
+    except Exception:
+        return None
+
+
+_SMART_BATTERIES = compile_query("SmartBatteries", """
+    query SmartBatteries {
+        smartBatteries {
+            id
+        }
+    }
+""")
+
+
+def _smart_batteries_query():
+    return _SMART_BATTERIES.payload()
+
+
+# Selection sets shared by the single-battery and batched queries
+_SMART_BATTERY_FIELDS = """
+    brand
+    capacity
+    id
+    settings {
+        batteryMode
+        imbalanceTradingStrategy
+        selfConsumptionTradingAllowed
+    }
+"""
+
+_SMART_BATTERY_SUMMARY_FIELDS = """
+    lastKnownStateOfCharge
+    lastKnownStatus
+    lastUpdate
+    totalResult
+"""
+
+_SMART_BATTERY_SESSIONS_FIELDS = """
+    deviceId
+    periodStartDate
+    periodEndDate
+    periodEpexResult
+    periodFrankSlim
+    periodImbalanceResult
+    periodTotalResult
+    periodTradeIndex
+    periodTradingResult
+    sessions {
+        cumulativeResult
+        date
+        result
+    }
+"""
+
+
+_SMART_BATTERY = compile_query("SmartBattery", """
+    query SmartBattery($deviceId: String!) {
+        smartBattery(deviceId: $deviceId) {""" + _SMART_BATTERY_FIELDS + """}
+        smartBatterySummary(deviceId: $deviceId) {""" + _SMART_BATTERY_SUMMARY_FIELDS + """}
+    }
+""")
+
+_SMART_BATTERY_SESSIONS = compile_query("SmartBatterySessions", """
+    query SmartBatterySessions($startDate: String!, $endDate: String!, $deviceId: String!) {
+        smartBatterySessions(
+            startDate: $startDate
+            endDate: $endDate
+            deviceId: $deviceId
+        ) {""" + _SMART_BATTERY_SESSIONS_FIELDS + """}
+    }
+""")
+
+_SMART_BATTERY_SUMMARY = compile_query("SmartBatterySummary", """
+    query SmartBatterySummary($deviceId: String!) {
+        smartBatterySummary(deviceId: $deviceId) {""" + _SMART_BATTERY_SUMMARY_FIELDS + """}
+    }
+""")
+
+
+def _smart_battery_details_query(device_id):
+    return _SMART_BATTERY.payload({"deviceId": device_id})
+
+
+def _smart_battery_sessions_query(device_id, start_date, end_date):
+    return _SMART_BATTERY_SESSIONS.payload({
+        "deviceId": device_id,
+        "startDate": start_date.strftime('%Y-%m-%d'),
+        "endDate": end_date.strftime('%Y-%m-%d')
+    })
+
+
+def _smart_battery_summary_query(device_id):
+    return _SMART_BATTERY_SUMMARY.payload({"deviceId": device_id})
+
+
+@lru_cache(maxsize=64)
+def _battery_batch_document(count, include_details, include_summary):
+    """Compile the batch document for count batteries once; the device ids are variables."""
+    variable_defs = ["$startDate: String!", "$endDate: String!"]
+    selections = []
+    for index in range(count):
+        var = f"d{index}"
+        variable_defs.append(f"${var}: String!")
+        selections.append(
+            f"b{index}_sessions: smartBatterySessions(startDate: $startDate, endDate: $endDate, deviceId: ${var}) {{"
+            + _SMART_BATTERY_SESSIONS_FIELDS + "}"
+        )
+        if include_details:
+            selections.append(f"b{index}_battery: smartBattery(deviceId: ${var}) {{" + _SMART_BATTERY_FIELDS + "}")
+        if include_summary:
+            selections.append(f"b{index}_summary: smartBatterySummary(deviceId: ${var}) {{" + _SMART_BATTERY_SUMMARY_FIELDS + "}")
+    return compile_query(
+        "SmartBatteryBatch",
+        "query SmartBatteryBatch(" + ", ".join(variable_defs) + ") {\n" + "\n".join(selections) + "\n}",
+    )
+
+
+def build_battery_batch_query(device_ids, start_date, end_date, include_details=True, include_summary=None):
+    """Build one aliased query fetching sessions (and optionally details) for all batteries.
+
+    include_details selects the slow-changing smartBattery part, include_summary
+    the smartBatterySummary with SoC and status; it follows include_details when
+    not given. Every battery gets its own ``b{index}_`` prefixed aliases and
+    ``$d{index}`` variable; use split_battery_batch_response to map the result back.
+    """
+    if include_summary is None:
+        include_summary = include_details
+    variables = {
+        "startDate": start_date.strftime('%Y-%m-%d'),
+        "endDate": end_date.strftime('%Y-%m-%d'),
+    }
+    for index, device_id in enumerate(device_ids):
+        variables[f"d{index}"] = device_id
+    return _battery_batch_document(len(device_ids), bool(include_details), bool(include_summary)).payload(variables)
+
+
+_BATCH_ALIASES = {
+    'sessions': 'smartBatterySessions',
+    'battery': 'smartBattery',
+    'summary': 'smartBatterySummary',
+}
+
+
+def split_battery_batch_response(response, device_ids):
+    """Split a SmartBatteryBatch response into a per-battery dict keyed by device id.
+
+    Each value has the same shape as the ``data`` of the single-battery queries,
+    i.e. ``smartBatterySessions``, ``smartBattery`` and ``smartBatterySummary``.
+    Aliases that failed server-side come back as None.
+    """
+    data = response.get('data') if isinstance(response, dict) else None
+    data = data if isinstance(data, dict) else {}
+    results = {}
+    for index, device_id in enumerate(device_ids):
+        results[device_id] = {
+            field: data.get(f"b{index}_{alias}")
+            for alias, field in _BATCH_ALIASES.items()
+            if f"b{index}_{alias}" in data
         }
-        if self.auth:
-            headers['Authorization'] = f"Bearer {self.auth['authToken']}"
-
-        response = requests.post(self.DATA_URL, json=query_data, headers=headers)
-        response.raise_for_status()
-        data = response.json()
-
-        # Log GraphQL request when API responds with errors to aid debugging
-        errors = data.get('errors') if isinstance(data, dict) else None
-        if isinstance(errors, list) and errors:
-            # Build a redacted copy of the request to avoid leaking secrets
-            safe_query = query_data
-            try:
-                if isinstance(query_data, dict):
-                    safe_query = dict(query_data)
-                    vars_in = safe_query.get('variables') if isinstance(safe_query.get('variables'), dict) else None
-                    if isinstance(vars_in, dict):
-                        vars_copy = dict(vars_in)
-                        for k in ['password', 'email', 'authToken', 'refreshToken', 'token', 'authorization', 'Authorization']:
-                            if k in vars_copy and vars_copy[k] is not None:
-                                vars_copy[k] = '***REDACTED***'
-                        safe_query['variables'] = vars_copy
-            except Exception:
-                # Best-effort redaction; ignore redaction failures
-                pass
-            _LOGGER.error("GraphQL returned errors: %s; Request payload: %s", errors, safe_query)
-
-            # Preserve explicit handling of authentication errors
-            for error in errors:
-                if isinstance(error, dict) and error.get('message') == "user-error:auth-not-authorised":
-                    raise Exception("Authentication required")
+    return results
 
+
+class AsyncFrankEnergie:
+    """Asyncio client for the Frank Energie GraphQL API.
+
+    All requests go through the given aiohttp session, so a single pooled
+    keep-alive connection is reused across calls instead of doing a new TLS
+    handshake on every request.
+    """
+
+    def __init__(self, session, auth_token=None, refresh_token=None, rate_limiter=GRAPHQL_RATE_LIMITER,
+                 retry_policy=None, circuit_breaker=None, data_url=None, persisted_queries=True, get_requests=False,
+                 freshness_window=0):
+        self.DATA_URL = data_url or get_data_url()
+        self._session = session
+        self.auth = {"authToken": auth_token, "refreshToken": refresh_token} if auth_token or refresh_token else None
+        self._credentials = None
+        self._auth_lock = asyncio.Lock()
+        self._rate_limiter = rate_limiter
+        self._retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.metrics = ApiMetrics()
+        # Send the sha256 hash of a known query instead of the document; switched off when the server lacks support
+        self.persisted_queries = persisted_queries
+        # Send hash-only queries as GET requests that a CDN may cache
+        self.get_requests = get_requests
+        self._headers_for = None
+        self._headers = None
+        # Identical queries in flight share one request: (operation, variables) -> task
+        self._in_flight = {}
+        # Seconds an identical query is answered with the last response; 0 only shares requests in flight
+        self.freshness_window = freshness_window
+        self._recent = {}
+        # Called with the new tokens after every login or renewal, e.g. to persist them
+        self.token_listener = None
+
+    def _set_auth(self, auth):
+        self.auth = auth
+        if self.token_listener is not None:
+            self.token_listener(auth)
+
+    def set_credentials(self, username, password):
+        """Keep credentials for a password login when the stored tokens are rejected."""
+        self._credentials = (username, password)
+
+    def _request_headers(self):
+        """Return the request headers, rebuilt only when the auth token changes."""
+        token = (self.auth or {}).get('authToken')
+        if self._headers is None or token != self._headers_for:
+            self._headers = _build_headers(self.auth)
+            self._headers_for = token
+        return self._headers
+
+    async def _post_once(self, query_data, compiled, persisted=False):
+        operation = query_data.get('operationName')
+        variables = query_data.get('variables')
+        kwargs = {'headers': self._request_headers()}
+        remaining = remaining_time()
+        if remaining is not None:
+            # Do not let a single request outlive the refresh cycle's deadline
+            kwargs['timeout'] = aiohttp.ClientTimeout(total=max(remaining, 0.1))
+        get_url = None
+        if persisted and self.get_requests and not compiled.mutation:
+            get_url = compiled.get_url(self.DATA_URL, variables)
+        if get_url is not None:
+            body = b""
+            request = self._session.get(get_url, **kwargs)
+        else:
+            body = compiled.body(variables, persisted=persisted, register=self.persisted_queries and not persisted)
+            request = self._session.post(self.DATA_URL, data=body, **kwargs)
+        started = self.metrics.start()
+        received = 0
+        try:
+            async with request as response:
+                if response.status in RETRY_STATUSES:
+                    raise TransientError(
+                        f"HTTP {response.status}", parse_retry_after(response.headers.get('Retry-After'))
+                    )
+                if persisted and response.status in (400, 404, 405):
+                    self.metrics.record(operation, started, len(body), received)
+                    if get_url is not None:
+                        _LOGGER.info("GraphQL GET requests rejected with HTTP %s, using POST", response.status)
+                        self.get_requests = False
+                        return await self._post_once(query_data, compiled, persisted)
+                    try:
+                        data = json.loads(await response.read())
+                    except ValueError:
+                        data = None
+                    if persisted_query_error(data) is not None:
+                        # The server says why it did not serve the hash
+                        return data
+                    # Rejected without a reason, e.g. by a CDN; answer like a server that does not know the
+                    # hash, so this request is repeated with the full document and persisted queries stay on
+                    return {"errors": [{
+                        "message": f"HTTP {response.status}",
+                        "extensions": {"code": PERSISTED_QUERY_NOT_FOUND[1]},
+                    }], "data": None}
+                response.raise_for_status()
+                raw = await response.read()
+                received = len(raw)
+                data = json.loads(raw)
+        except Exception as e:
+            self.metrics.record(operation, started, len(body), received, error=e)
+            if isinstance(e, (aiohttp.ClientConnectionError, asyncio.TimeoutError)):
+                raise TransientError(repr(e)) from e
+            raise
+        self.metrics.record(operation, started, len(body), received)
         return data
 
-    def login(self, username, password):
-        query = {
-            "query": """
-                mutation Login($email: String!, $password: String!) {
-                    login(email: $email, password: $password) {
-                        authToken
-                        refreshToken
-                    }
-                }
-            """,
-            "operationName": "Login",
-            "variables": {"email": username, "password": password}
+    async def _send(self, query_data, compiled, persisted):
+        """Send one request through the circuit breaker, rate limiter and retry policy."""
+        operation = query_data.get('operationName')
+        attempts = 0
+
+        async def attempt():
+            nonlocal attempts
+            if attempts:
+                self.metrics.record_retry(operation)
+            attempts += 1
+            return await self._post_once(query_data, compiled, persisted)
+
+        try:
+            return await self.circuit_breaker.async_call(
+                lambda: self._retry_policy.async_call(attempt, self._rate_limiter)
+            )
+        except CircuitOpenError:
+            self.metrics.circuit_open_rejections += 1
+            raise
+
+    async def _post(self, query_data):
+        """Post a query through the shared rate limiter, retrying transient errors with backoff.
+
+        With persisted queries only the hash of the document is sent; the full
+        document follows when the server does not know the hash yet. Fails fast
+        with CircuitOpenError while the circuit breaker is open.
+        """
+        compiled = compiled_for(query_data)
+        persisted = self.persisted_queries
+        data = await self._send(query_data, compiled, persisted)
+        miss = persisted_query_error(data) if persisted else None
+        if miss is not None:
+            self.metrics.persisted_query_misses += 1
+            data = await self._send(query_data, compiled, False)
+            if miss == "unsupported" and not data.get('errors'):
+                _LOGGER.info("GraphQL endpoint does not support persisted queries, sending full queries")
+                self.persisted_queries = False
+                self.get_requests = False
+        try:
+            _check_response(query_data, data)
+        except Exception as e:
+            self.metrics.record_error(query_data.get('operationName'), e)
+            raise
+        return data
+
+    async def query(self, query_data):
+        """Run a query; identical queries already in flight share its request.
+
+        Queries match on operation name and variables. Every caller gets the
+        same response, so treat it as read-only. Within freshness_window seconds
+        after a query completed, an identical query is answered with its
+        response without a request. Mutations such as Login are always sent.
+        """
+        if compiled_for(query_data).mutation:
+            return await self._query(query_data)
+        key = (query_data.get('operationName'), _variables_key(query_data.get('variables')))
+        if self.freshness_window:
+            recent = self._recent.get(key)
+            if recent is not None and time.monotonic() - recent[0] < self.freshness_window:
+                self.metrics.coalesced_requests += 1
+                return recent[1]
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.metrics.coalesced_requests += 1
+        else:
+            task = self._in_flight[key] = asyncio.ensure_future(self._query(query_data))
+            task.add_done_callback(lambda done: self._query_done(key, done))
+        # One caller being cancelled does not cancel the request of the others
+        return await asyncio.shield(task)
+
+    def _query_done(self, key, task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Always retrieve the exception, so a failure nobody awaited any more is not logged as unretrieved
+        if task.cancelled() or task.exception() is not None or not self.freshness_window:
+            return
+        now = time.monotonic()
+        self._recent = {
+            recent_key: recent for recent_key, recent in self._recent.items()
+            if now - recent[0] < self.freshness_window
         }
+        self._recent[key] = (now, task.result())
+
+    async def _query(self, query_data):
+        """Run a query, renewing the auth token ahead of expiry and once more if it is rejected."""
+        await self._ensure_fresh_token()
+        used_auth = self.auth
+        try:
+            return await self._post(query_data)
+        except Exception as e:
+            if str(e) != "Authentication required" or not self.auth:
+                raise
+            _LOGGER.info("Authentication token rejected, re-authenticating")
+            await self._reauthenticate(used_auth)
+            return await self._post(query_data)
+
+    def _token_needs_refresh(self):
+        expiry = get_token_expiry((self.auth or {}).get('authToken') or '')
+        return expiry is not None and expiry - time.time() < TOKEN_REFRESH_MARGIN
 
-        response = self.query(query)
-        # If errors are present, raise the first error message
-        if response and 'errors' in response and response['errors']:
-            raise Exception(response['errors'][0].get('message', 'Onbekende fout'))
-        # Defensive: check for expected structure
-        if not response or 'data' not in response:
-            raise Exception("Inloggen mislukt: controleer gebruikersnaam en wachtwoord.")
-        self.auth = response['data']['login']
+    async def _ensure_fresh_token(self):
+        if self.auth and self._token_needs_refresh():
+            await self._reauthenticate(self.auth)
+
+    async def _reauthenticate(self, stale_auth):
+        """Replace stale_auth with fresh tokens; concurrent callers share a single re-auth."""
+        async with self._auth_lock:
+            if self.auth is not stale_auth:
+                # Another caller already renewed the tokens while we waited
+                return
+            refresh_token = (self.auth or {}).get('refreshToken')
+            if refresh_token:
+                try:
+                    response = await self._post(_renew_token_query(self.auth.get('authToken'), refresh_token))
+                    self._set_auth(_parse_renew_token(response))
+                    self.metrics.token_renewals += 1
+                    _LOGGER.debug("Renewed Frank Energie auth token")
+                    return
+                except Exception as e:
+                    _LOGGER.info("Renewing auth token failed (%s), falling back to login", e)
+            if not self._credentials:
+                raise Exception("Authentication required")
+            response = await self._post(_login_query(*self._credentials))
+            self._set_auth(_parse_login(response))
+            self.metrics.logins += 1
+
+    async def async_ensure_authenticated(self):
+        """Log in with the stored credentials unless there are tokens already."""
+        async with self._auth_lock:
+            if self.auth:
+                return
+            if not self._credentials:
+                raise Exception("Authentication required")
+            response = await self._post(_login_query(*self._credentials))
+            self._set_auth(_parse_login(response))
+            self.metrics.logins += 1
+
+    async def login(self, username, password):
+        response = await self._post(_login_query(username, password))
+        # Kept for a password login when the refresh token is rejected as well
+        self.set_credentials(username, password)
+        self._set_auth(_parse_login(response))
+        self.metrics.logins += 1
         return self.auth
 
-    def get_smart_batteries(self):
+    async def get_smart_batteries(self):
         if not self.auth:
             raise Exception("Authentication required")
+        return await self.query(_smart_batteries_query())
 
-        query = {
-            "query": """
-                query SmartBatteries {
-                    smartBatteries {
-                        id
-                   }
-              }
-            """,
-            "operationName": "SmartBatteries"
-        }
-
-        return self.query(query)
+    async def get_smart_battery_details(self, device_id):
+        if not self.auth:
+            raise Exception("Authentication required")
+        return await self.query(_smart_battery_details_query(device_id))
 
-    def get_smart_battery_details(self, device_id):
+    async def get_smart_battery_sessions(self, device_id, start_date, end_date):
         if not self.auth:
             raise Exception("Authentication required")
+        return await self.query(_smart_battery_sessions_query(device_id, start_date, end_date))
 
-        query = {
-            "query": """
-                query SmartBattery($deviceId: String!) {
-                    smartBattery(deviceId: $deviceId) {
-                        brand
-                        capacity
-                        id
-                        settings {
-                            batteryMode
-                            imbalanceTradingStrategy
-                            selfConsumptionTradingAllowed
-                        }
-                    }
-                    smartBatterySummary(deviceId: $deviceId) {
-                        lastKnownStateOfCharge
-                        lastKnownStatus
-                        lastUpdate
-                        totalResult
-                    }
-                }
-            """,
-            "operationName": "SmartBattery",
-            "variables": {"deviceId": device_id}
-        }
-        return self.query(query)
+    async def get_smart_battery_summary(self, device_id):
+        if not self.auth:
+            raise Exception("Authentication required")
+        return await self.query(_smart_battery_summary_query(device_id))
 
-    def get_smart_battery_sessions(self, device_id, start_date, end_date):
+    async def get_smart_battery_batch(self, device_ids, start_date, end_date, include_details=True, include_summary=None):
+        """Fetch sessions, details and summary for all batteries in one round-trip."""
         if not self.auth:
             raise Exception("Authentication required")
+        if not device_ids:
+            return {}
+        response = await self.query(
+            build_battery_batch_query(device_ids, start_date, end_date, include_details, include_summary)
+        )
+        return split_battery_batch_response(response, device_ids)
 
-        query = {
-            "query": """
-                query SmartBatterySessions($startDate: String!, $endDate: String!, $deviceId: String!) {
-                    smartBatterySessions(
-                        startDate: $startDate
-                        endDate: $endDate
-                        deviceId: $deviceId
-                    ) {
-                        deviceId
-                        periodStartDate
-                        periodEndDate
-                        periodEpexResult
-                        periodFrankSlim
-                        periodImbalanceResult
-                        periodTotalResult
-                        periodTradeIndex
-                        periodTradingResult
-                        sessions {
-                            cumulativeResult
-                            date
-                            result
-                        }
-                    }
-                }
-            """,
-            "operationName": "SmartBatterySessions",
-            "variables": {
-                "deviceId": device_id,
-                "startDate": start_date.strftime('%Y-%m-%d'),
-                "endDate": end_date.strftime('%Y-%m-%d')
-            }
-        }
+    async def get_smart_battery_data(self, device_id, start_date, end_date, include_details=True, include_summary=None):
+        """Fetch sessions and optionally details for one battery, with both requests in parallel.
+
+        Returns the merged ``data`` of both responses, matching the per-battery
+        shape of get_smart_battery_batch.
+        """
+        if include_summary is None:
+            include_summary = include_details
+        calls = [self.get_smart_battery_sessions(device_id, start_date, end_date)]
+        if include_details:
+            # The SmartBattery query always carries the summary as well
+            calls.append(self.get_smart_battery_details(device_id))
+        elif include_summary:
+            calls.append(self.get_smart_battery_summary(device_id))
+        result = {}
+        for response in await asyncio.gather(*calls):
+            data = response.get('data') if isinstance(response, dict) else None
+            if isinstance(data, dict):
+                result.update(data)
+        return result
+
+    async def get_smart_battery_concurrent(self, device_ids, start_date, end_date, include_details=True,
+                                           max_concurrency=DEFAULT_MAX_CONCURRENCY, timeout=None,
+                                           include_summary=None):
+        """Fetch all batteries concurrently, with at most max_concurrency batteries in flight.
+
+        A battery that fails or exceeds the timeout yields an empty result so
+        only its own entities are affected. Authentication errors, an open
+        circuit and the failure of every battery are raised, as the whole
+        refresh failed then.
+        """
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def fetch_one(device_id):
+            async with semaphore:
+                return await asyncio.wait_for(
+                    self.get_smart_battery_data(device_id, start_date, end_date, include_details, include_summary),
+                    timeout
+                )
 
-        return self.query(query)
+        responses = await asyncio.gather(*(fetch_one(device_id) for device_id in device_ids), return_exceptions=True)
+        errors = [response for response in responses if isinstance(response, Exception)]
+        for error in errors:
+            if str(error) == "Authentication required" or isinstance(error, CircuitOpenError):
+                raise error
+        if errors and len(errors) == len(responses):
+            raise errors[0]
+        results = {}
+        for device_id, response in zip(device_ids, responses):
+            if isinstance(response, Exception):
+                _LOGGER.warning("Fetching data for battery %s failed: %r", device_id, response)
+                response = {}
+            results[device_id] = response
+        return results
 
     def is_authenticated(self):
-        return self.auth is not None
\ No newline at end of file
+        return self.auth is not None
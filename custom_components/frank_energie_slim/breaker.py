@@ -0,0 +1,129 @@
+import time
+from datetime import timedelta
+from .ratelimit import TransientError
+
+# Consecutive failed requests before the circuit opens
+FAILURE_THRESHOLD = 3
+# Wait before the first half-open probe; doubled after every failed probe
+OPEN_INTERVAL = timedelta(minutes=5)
+MAX_OPEN_INTERVAL = timedelta(hours=1)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised without doing a request while the circuit is open."""
+
+
+class CircuitBreaker:
+    """Stops calling the API after repeated transient failures.
+
+    While open, requests fail immediately with CircuitOpenError. After the
+    open interval a single half-open probe is let through: success closes the
+    circuit, failure opens it again for twice as long, up to max_open_interval.
+    Errors other than TransientError mean the API did answer and do not count.
+    """
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, open_interval=OPEN_INTERVAL,
+                 max_open_interval=MAX_OPEN_INTERVAL, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self._base_interval = open_interval.total_seconds()
+        self._max_interval = max_open_interval.total_seconds()
+        self._interval = self._base_interval
+        self._clock = clock
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    @property
+    def consecutive_failures(self):
+        return self._failures
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return STATE_CLOSED
+        if self._probing or self.retry_in() <= 0:
+            return STATE_HALF_OPEN
+        return STATE_OPEN
+
+    def retry_in(self):
+        """Seconds until the next request is allowed, 0 when it is allowed now."""
+        if self._opened_at is None:
+            return 0
+        return max(0, self._opened_at + self._interval - self._clock())
+
+    def before_request(self):
+        state = self.state
+        if state == STATE_OPEN or (state == STATE_HALF_OPEN and self._probing):
+            raise CircuitOpenError("Frank Energie API unavailable, circuit open")
+        if state == STATE_HALF_OPEN:
+            self._probing = True
+
+    def record_success(self):
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._interval = self._base_interval
+
+    def record_failure(self):
+        self._failures += 1
+        if self._probing:
+            # The probe failed: stay open, and wait longer before the next one
+            self._probing = False
+            self._interval = min(self._interval * 2, self._max_interval)
+            self._opened_at = self._clock()
+        elif self._opened_at is None and self._failures >= self.failure_threshold:
+            self._opened_at = self._clock()
+
+    async def async_call(self, func):
+        """Await func() unless the circuit is open, recording the outcome."""
+        self.before_request()
+        try:
+            result = await func()
+        except TransientError:
+            self.record_failure()
+            raise
+        except BaseException:
+            # Inconclusive, e.g. cancelled: let the next request probe again
+            self._probing = False
+            raise
+        self.record_success()
+        return result
+
+
+class RefreshStatus:
+    """Tracks refresh outcomes of an entry so entities can serve their last good values while stale."""
+
+    def __init__(self):
+        self.last_success = None
+        self.consecutive_failures = 0
+        self.last_error = None
+        # Seconds the last refresh took, successful or not
+        self.last_duration = None
+
+    @property
+    def stale(self):
+        return self.consecutive_failures > 0
+
+    def record_success(self, now):
+        self.last_success = now
+        self.consecutive_failures = 0
+        self.last_error = None
+
+    def record_failure(self, error):
+        self.consecutive_failures += 1
+        self.last_error = error
+
+    def attributes(self, now):
+        """Staleness attributes while stale, None while the data is fresh."""
+        if not self.stale:
+            return None
+        return {
+            "stale": True,
+            "last_success": self.last_success.isoformat() if self.last_success else None,
+            "data_age": int((now - self.last_success).total_seconds()) if self.last_success else None,
+            "consecutive_failures": self.consecutive_failures,
+        }
@@ -0,0 +1,40 @@
+import time
+from datetime import timedelta
+
+# Brand, capacity and settings rarely change; refetch them at most this often
+DETAILS_TTL = timedelta(hours=6)
+
+
+class BatteryDetailsCache:
+    """Cache of the slow-changing smartBattery part of the battery details.
+
+    Entries expire after the TTL or when invalidated, e.g. from the refresh
+    service; the hot smartBatterySummary part is never cached here.
+    """
+
+    def __init__(self, ttl=DETAILS_TTL):
+        self._ttl = ttl.total_seconds()
+        self._entries = {}
+
+    def get(self, device_id, allow_stale=False):
+        entry = self._entries.get(device_id)
+        if entry is None:
+            return None
+        fetched_at, details = entry
+        if not allow_stale and time.monotonic() - fetched_at >= self._ttl:
+            return None
+        return details
+
+    def set(self, device_id, details):
+        self._entries[device_id] = (time.monotonic(), details)
+
+    def stale_ids(self, device_ids):
+        """Return the device ids whose details are missing or expired."""
+        return [device_id for device_id in device_ids if self.get(device_id) is None]
+
+    def invalidate(self, device_id=None):
+        """Expire one battery's details, or all of them."""
+        if device_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(device_id, None)
@@ -1,26 +1,35 @@
 from homeassistant import config_entries
 import voluptuous as vol
 from homeassistant.const import CONF_USERNAME, CONF_PASSWORD
+from homeassistant.core import callback
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from .api import DEFAULT_MAX_CONCURRENCY
+from .tokens import get_token_store
 import logging
 
 _LOGGER = logging.getLogger(__name__)
 
 class FrankEnergieConfigFlow(config_entries.ConfigFlow, domain="frank_energie_slim"):
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry):
+        return FrankEnergieOptionsFlow()
+
     async def async_step_user(self, user_input=None):
         errors = {}
         if user_input is not None:
-            from .api import FrankEnergie
-            api = FrankEnergie()
+            from .api import AsyncFrankEnergie
+            api = AsyncFrankEnergie(async_get_clientsession(self.hass))
             try:
-                auth = await self.hass.async_add_executor_job(
-                    api.login, user_input[CONF_USERNAME], user_input[CONF_PASSWORD]
-                )
+                auth = await api.login(user_input[CONF_USERNAME], user_input[CONF_PASSWORD])
             except Exception as exc:
                 # Log the full exception for debugging
                 _LOGGER.error(f"Authentication/setup error: {exc}", exc_info=True)
                 # Provide a detailed error message to the user
                 errors["base"] = f"Loginfout: {str(exc)}"
             if not errors:
+                # Setup reuses these tokens instead of logging in again
+                await get_token_store(self.hass).async_set(user_input[CONF_USERNAME], auth)
                 return self.async_create_entry(title="Frank Energie Slim Handelen", data=user_input)
         return self.async_show_form(
             step_id="user",
@@ -29,4 +38,26 @@ class FrankEnergieConfigFlow(config_entries.ConfigFlow, domain="frank_energie_sl
                 vol.Required(CONF_PASSWORD): str,
             }),
             errors=errors,
-        )
\ No newline at end of file
+        )
+
+class FrankEnergieOptionsFlow(config_entries.OptionsFlow):
+    async def async_step_init(self, user_input=None):
+        if user_input is not None:
+            return self.async_create_entry(title="", data=user_input)
+        options = self.config_entry.options
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema({
+                vol.Optional("batch_requests", default=options.get("batch_requests", True)): bool,
+                vol.Optional("max_concurrency", default=options.get("max_concurrency", DEFAULT_MAX_CONCURRENCY)):
+                    vol.All(int, vol.Range(min=1, max=32)),
+                vol.Optional("soc_deadband", default=options.get("soc_deadband", 0)):
+                    vol.All(vol.Coerce(float), vol.Range(min=0, max=10)),
+                vol.Optional("result_deadband", default=options.get("result_deadband", 0)):
+                    vol.All(vol.Coerce(float), vol.Range(min=0, max=1)),
+                vol.Optional("fleet_mode", default=options.get("fleet_mode", False)): bool,
+                vol.Optional("diagnostic_sensors", default=options.get("diagnostic_sensors", False)): bool,
+                vol.Optional("period_sensors", default=options.get("period_sensors", False)): bool,
+                vol.Optional("get_requests", default=options.get("get_requests", False)): bool,
+            }),
+        )
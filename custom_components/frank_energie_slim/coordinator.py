@@ -0,0 +1,311 @@
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+import logging
+import time
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+from homeassistant.util import dt as dt_util
+from .api import DEFAULT_MAX_CONCURRENCY
+from .breaker import CircuitOpenError, RefreshStatus
+from .cache import BatteryDetailsCache
+from .models import RESULT_FIELDS, Battery, BatteryData, BatterySession, BatterySummary, parse_battery_results
+from .ratelimit import request_deadline
+
+_LOGGER: logging.Logger = logging.getLogger(__package__)
+
+# Upper bound for a single battery's requests when fetching concurrently
+BATTERY_FETCH_TIMEOUT = 30
+# Upper bound for all requests of one refresh cycle, including rate limiting and retries
+REFRESH_DEADLINE = 60
+
+
+def get_latest_last_update(battery_data):
+    """Return the most recent smartBatterySummary.lastUpdate across all batteries."""
+    last_updates = [data.summary.last_update for data in battery_data if data.summary and data.summary.last_update]
+    # ISO8601 strings, so max() gives the latest
+    return max(last_updates) if last_updates else None
+
+def calc_avg_soc_and_last_mode(battery_data):
+    """Calculate average state of charge and last mode across all batteries."""
+    socs = [data.summary.state_of_charge for data in battery_data if data.summary.state_of_charge is not None]
+    modes = [data.battery.settings.mode for data in battery_data]
+    avg_soc = sum(socs) / len(socs) if socs else None
+    last_mode = modes[-1] if modes else None
+    return avg_soc, last_mode
+
+def get_scheduler_state(battery_data):
+    """Return the values that matter for the poll scheduler (mode, SoC) as a hashable snapshot."""
+    return tuple((data.battery.settings.mode, data.summary.state_of_charge) for data in battery_data)
+
+
+@dataclass(frozen=True, slots=True)
+class EntrySnapshot:
+    """The data of one refresh cycle, from which every entity derives its state.
+
+    A refresh publishes a new snapshot instead of changing the previous one,
+    so all entities written in one dispatch see the same cycle.
+    """
+    batteries: tuple = ()
+    # Staleness attributes of the entry's entities, None while the data is fresh
+    attributes: dict | None = None
+    # Totals across the batteries: API result field -> sum
+    results: dict = field(default_factory=dict)
+    average_soc: float | None = None
+    last_mode: str | None = None
+    last_update: str | None = None
+    by_device: dict = field(default_factory=dict)
+    # (device_id, result_key) -> PeriodResults, device_id None for the totals; empty while not tracked
+    periods: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_battery_data(cls, battery_data, attributes=None, periods=None):
+        batteries = tuple(
+            BatteryData(
+                data.device_id,
+                data.session or BatterySession(device_id=data.device_id),
+                data.battery or Battery(),
+                data.summary or BatterySummary(),
+            )
+            for data in battery_data
+        )
+        average_soc, last_mode = calc_avg_soc_and_last_mode(batteries)
+        return cls(
+            batteries=batteries,
+            attributes=attributes,
+            results={key: sum(data.session.get_result(key) or 0 for data in batteries) for key in RESULT_FIELDS},
+            average_soc=average_soc,
+            last_mode=last_mode,
+            last_update=get_latest_last_update(batteries),
+            by_device={data.device_id: data for data in batteries},
+            periods=periods or {},
+        )
+
+    @property
+    def device_ids(self):
+        return [data.device_id for data in self.batteries]
+
+    def battery(self, device_id):
+        """Return the BatteryData of device_id, or None when it is not part of this snapshot."""
+        return self.by_device.get(device_id)
+
+
+async def async_fetch_battery_results(client, battery_ids, day, include_details, options, include_summary=None):
+    """Fetch per-battery results, batched by default or concurrently per battery.
+
+    When the batched request fails for another reason than authentication or an
+    open circuit, the concurrent path is used so one failing battery only
+    affects its own entities. Retries and rate limiting waits of both paths
+    share the REFRESH_DEADLINE.
+    """
+    max_concurrency = options.get("max_concurrency", DEFAULT_MAX_CONCURRENCY)
+    with request_deadline(REFRESH_DEADLINE):
+        if options.get("batch_requests", True):
+            try:
+                return await client.get_smart_battery_batch(
+                    battery_ids, day, day, include_details=include_details, include_summary=include_summary
+                )
+            except Exception as e:
+                if str(e) == "Authentication required" or isinstance(e, CircuitOpenError):
+                    raise
+                _LOGGER.warning("Batched battery request failed (%r), fetching batteries concurrently", e)
+        return await client.get_smart_battery_concurrent(
+            battery_ids, day, day, include_details=include_details, include_summary=include_summary,
+            max_concurrency=max_concurrency, timeout=BATTERY_FETCH_TIMEOUT,
+        )
+
+
+class FrankEnergieCoordinator(DataUpdateCoordinator):
+    """Fetches the batteries of one config entry and publishes them as one EntrySnapshot per cycle.
+
+    Refreshes are started by the entry's poll scheduler or the fleet cycle;
+    update_interval stays None. Requests from the homeassistant.update_entity
+    service go through the coordinator's debouncer, so updating many entities
+    at once results in a single fetch.
+    """
+
+    def __init__(self, hass, entry, client, snapshot_store=None, restored_data=(), saved_at=None):
+        super().__init__(hass, _LOGGER, name=f"Frank Energie {entry.entry_id}")
+        self.entry = entry
+        self.client = client
+        self.snapshot_store = snapshot_store
+        self.details_cache = BatteryDetailsCache()
+        self.refresh_status = RefreshStatus()
+        self.refresh_status.last_success = saved_at
+        self.discovered = False
+        # Set up by the sensor platform: local session history and the callbacks adding and removing battery entities
+        self.history = None
+        self.async_sync_history = None
+        self.batteries_added = None
+        self.battery_removed = None
+        # Set by the sensor platform when period sensors are enabled; the index is loaded on the first refresh
+        self.track_periods = False
+        self.result_index = None
+        self._indexed_devices = set()
+        self.data = EntrySnapshot.from_battery_data(data for data in restored_data if data.session is not None)
+
+    @property
+    def device_ids(self):
+        return self.data.device_ids
+
+    def scheduler_inputs(self):
+        """Return (last_update, state) of the last refresh for the poll scheduler; state is None after a failure."""
+        state = None if self.refresh_status.stale else get_scheduler_state(self.data.batteries)
+        return self.data.last_update, state
+
+    async def _async_update_data(self):
+        started = time.monotonic()
+        try:
+            return await self._async_fetch_snapshot()
+        finally:
+            # Set before the listeners run, so the diagnostic sensor shows this refresh
+            self.refresh_status.last_duration = time.monotonic() - started
+
+    async def _async_fetch_snapshot(self):
+        """Fetch all batteries; on failure the last snapshot is served again, marked stale.
+
+        Battery discovery is retried here until it succeeds. Only when there is
+        no data to serve at all does the refresh fail, making the entities
+        unavailable.
+        """
+        today = datetime.now()
+        try:
+            if not self.discovered:
+                await self._async_discover()
+            battery_data = await self._async_fetch_battery_data(today)
+        except Exception as e:
+            self.refresh_status.record_failure(e)
+            if isinstance(e, CircuitOpenError):
+                _LOGGER.debug("Frank Energie API circuit open, serving the last known values")
+            else:
+                _LOGGER.warning("Refreshing Frank Energie data failed (%r), serving the last known values", e)
+            if not self.data.batteries:
+                raise UpdateFailed(f"No Frank Energie data available: {e!r}") from e
+            return replace(self.data, attributes=self.refresh_status.attributes(dt_util.utcnow()))
+        self.refresh_status.record_success(dt_util.utcnow())
+        periods = None
+        if self.history is not None:
+            # Today's sessions come with every refresh; older unsettled days are synced in the background
+            await self.history.async_store_periods([data.session for data in battery_data])
+            if self.track_periods:
+                periods = await self._async_update_result_index(today.date(), battery_data)
+        snapshot = EntrySnapshot.from_battery_data(
+            battery_data, self.refresh_status.attributes(dt_util.utcnow()), periods
+        )
+        if self.snapshot_store is not None:
+            self.snapshot_store.async_save(snapshot.batteries)
+        if self.history is not None:
+            self.hass.async_create_task(self._async_sync_history())
+        return snapshot
+
+    async def _async_update_result_index(self, day, battery_data):
+        """Fold the day's results into the result index; returns the period results for the snapshot."""
+        device_ids = [data.device_id for data in battery_data]
+        if self.result_index is None or set(device_ids) != self._indexed_devices:
+            # (Re)load when the entry's batteries changed; the store also holds other entries' batteries
+            self.result_index = await self.history.async_load_result_index(device_ids)
+            self._indexed_devices = set(device_ids)
+        values = {}
+        for data in battery_data:
+            previous = self.data.battery(data.device_id)
+            if previous is not None and data.session is previous.session:
+                # Kept from the last refresh because this one failed for the battery; nothing new to index
+                continue
+            for result_key in RESULT_FIELDS:
+                value = data.session.get_result(result_key)
+                if value is not None:
+                    values[(data.device_id, result_key)] = value
+                    self.result_index.set(data.device_id, result_key, day, value)
+        await self.history.async_store_day_results(day, values)
+        return self.result_index.period_results(device_ids, RESULT_FIELDS, day)
+
+    async def async_fold_history(self, start):
+        """Fold the session days stored by a history sync from start on into the result index.
+
+        Frank corrects recent days after the fact; the corrected totals are in
+        the next snapshot.
+        """
+        if self.result_index is None:
+            # Not loaded yet; the first load reads the synced days
+            return
+        rows = await self.history.async_get_result_rows(start, self._indexed_devices)
+        for device_id, result_key, day, value in rows:
+            self.result_index.set(device_id, result_key, day, value)
+
+    async def _async_sync_history(self):
+        if self.async_sync_history is not None:
+            await self.async_sync_history(self.device_ids)
+
+    async def _async_discover(self):
+        """Log in and reconcile the known batteries with the batteries of the account."""
+        await self.client.async_ensure_authenticated()
+        response = await self.client.get_smart_batteries()
+        batteries = response['data']['smartBatteries']
+        # Log battery discovery summary and handle no-battery case
+        if not batteries:
+            _LOGGER.error("No smart batteries were found. No battery sensors will be created. Please verify your Frank Energie account and configuration.")
+        else:
+            _LOGGER.info("Discovered %d smart battery(ies)", len(batteries))
+        discovered_ids = [battery['id'] for battery in batteries]
+        known = [data for data in self.data.batteries if data.device_id in discovered_ids]
+        removed_ids = [device_id for device_id in self.device_ids if device_id not in discovered_ids]
+        new_ids = [device_id for device_id in discovered_ids if device_id not in self.data.by_device]
+        added = []
+        if new_ids:
+            # Fetch details and today's sessions for the new batteries at once
+            today = datetime.now()
+            _LOGGER.info("Queuing data retrieval for batteries %s for %s", new_ids, today.strftime('%Y-%m-%d'))
+            results = parse_battery_results(
+                await async_fetch_battery_results(self.client, new_ids, today, True, self.entry.options)
+            )
+            for device_id in new_ids:
+                data = results.get(device_id) or BatteryData(device_id)
+                # Ensure we always have session data for stable entity IDs
+                if data.session is None:
+                    _LOGGER.error("Missing 'smartBatterySessions' in response for battery %s, skipping this battery", device_id)
+                    continue
+                if data.battery is not None:
+                    self.details_cache.set(device_id, data.battery)
+                added.append(data)
+        if removed_ids or added:
+            # Published without notifying the listeners, so new entities find their battery when they are added
+            self.data = EntrySnapshot.from_battery_data(known + added, self.data.attributes)
+        for device_id in removed_ids:
+            _LOGGER.info("Battery %s is no longer part of the account, removing its entities", device_id)
+            if self.battery_removed is not None:
+                self.battery_removed(device_id)
+        if added and self.batteries_added is not None:
+            self.batteries_added([data.device_id for data in added])
+        self.discovered = True
+
+    async def _async_fetch_battery_data(self, today):
+        """Fetch and parse today's session, details and summary for all batteries.
+
+        The static smartBattery details are only refetched when the cache has expired.
+        A battery whose session or summary did not come back keeps its previous
+        values; its previous session only while it is still today's.
+        """
+        device_ids = self.device_ids
+        fetch_details = bool(self.details_cache.stale_ids(device_ids))
+        # The client renews expired tokens itself, shared across all concurrent requests
+        results = parse_battery_results(await async_fetch_battery_results(
+            self.client, device_ids, today, fetch_details, self.entry.options, include_summary=True
+        ))
+        today_iso = today.date().isoformat()
+        battery_data = []
+        for previous in self.data.batteries:
+            device_id = previous.device_id
+            data = results.get(device_id) or BatteryData(device_id)
+            if data.battery is not None:
+                self.details_cache.set(device_id, data.battery)
+            # The API may return null for a single battery, or its requests failed
+            if data.session is None or data.summary is None:
+                _LOGGER.warning("Missing data in response for battery %s, keeping its last known values", device_id)
+            session = data.session
+            if session is None and previous.session is not None and previous.session.period_start_date == today_iso:
+                session = previous.session
+            battery_data.append(BatteryData(
+                device_id,
+                session or BatterySession(device_id=device_id),
+                self.details_cache.get(device_id, allow_stale=True) or previous.battery,
+                data.summary or previous.summary or BatterySummary(),
+            ))
+        return battery_data
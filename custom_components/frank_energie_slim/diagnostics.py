@@ -0,0 +1,44 @@
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.util import dt as dt_util
+
+TO_REDACT = {"username", "password"}
+
+
+async def async_get_config_entry_diagnostics(hass, entry):
+    """Return API metrics and refresh state of a config entry for the diagnostics download."""
+    data = hass.data.get("frank_energie_slim", {}).get(entry.entry_id, {})
+    client = data.get("client")
+    coordinator = data.get("coordinator")
+    refresh_status = data.get("refresh_status")
+    scheduler = data.get("scheduler")
+    diagnostics = {
+        "entry": {
+            "data": async_redact_data(dict(entry.data), TO_REDACT),
+            "options": dict(entry.options),
+        },
+        "batteries": len(coordinator.device_ids) if coordinator is not None else 0,
+        "fleet_mode": data.get("fleet") is not None,
+    }
+    if refresh_status is not None:
+        last_success = refresh_status.last_success
+        diagnostics["refresh"] = {
+            "last_success": last_success.isoformat() if last_success else None,
+            "last_duration": refresh_status.last_duration,
+            "consecutive_failures": refresh_status.consecutive_failures,
+            "last_error": repr(refresh_status.last_error) if refresh_status.last_error else None,
+        }
+    if scheduler is not None:
+        diagnostics["scheduler"] = {
+            "last_publish": scheduler.last_publish.isoformat() if scheduler.last_publish else None,
+            "cadence": str(scheduler.cadence) if scheduler.cadence else None,
+            "next_delay": str(scheduler.next_delay(dt_util.utcnow())),
+        }
+    if client is not None:
+        breaker = client.circuit_breaker
+        diagnostics["circuit_breaker"] = {
+            "state": breaker.state,
+            "consecutive_failures": breaker.consecutive_failures,
+            "retry_in": breaker.retry_in(),
+        }
+        diagnostics["api"] = client.metrics.as_dict()
+    return diagnostics
@@ -1,254 +1,323 @@
-from homeassistant.helpers.entity import Entity, generate_entity_id
-import voluptuous as vol
-from homeassistant.const import CONF_USERNAME, CONF_PASSWORD
-
-ENTITY_NAMES = {
-    'periodEpexResult': 'EPEX-correctie vandaag',
-    'periodFrankSlim': 'Frank Slim vandaag',
-    'periodImbalanceResult': 'Handelsresultaat vandaag',
-    'periodTotalResult': 'Totaalresultaat vandaag',
-    'periodTradingResult': 'Brutoresultaat vandaag',
+from homeassistant.const import EntityCategory
+from homeassistant.core import callback
+from homeassistant.helpers.entity import generate_entity_id
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from .models import Battery
+
+RESULT_NAMES = {
+    'periodEpexResult': 'EPEX-correctie',
+    'periodFrankSlim': 'Frank Slim',
+    'periodImbalanceResult': 'Handelsresultaat',
+    'periodTotalResult': 'Totaalresultaat',
+    'periodTradingResult': 'Brutoresultaat',
 }
+ENTITY_NAMES = {result_key: f"{name} vandaag" for result_key, name in RESULT_NAMES.items()}
 
-class FrankEnergieBatterySessionResultSensor(Entity):
-    def __init__(self, hass, session, result_key, unique_id_suffix, details=None):
-        self.hass = hass
-        self._session = session
-        self._result_key = result_key
-        self._details = details or {}
-        device_id = session.get('deviceId')
-        self._attr_name = ENTITY_NAMES.get(result_key, result_key)
-        self._attr_unique_id = f"battery_{device_id}_{unique_id_suffix}"
-        self._attr_has_entity_name = True
-        self._state = session.get(result_key)
-        self._attr_device_class = "monetary"
-        self._attr_unit_of_measurement = "EUR"
+# PeriodResults field -> (unique id suffix, name suffix)
+PERIODS = {
+    'month': ('mtd', 'deze maand'),
+    'year': ('ytd', 'dit jaar'),
+    'all_time': ('all_time', 'sinds begin'),
+}
+
+_UNSET = object()
+
+def _battery_device_info(device_id, battery):
+    brand = battery.brand or 'Battery'
+    return {
+        "identifiers": {("frank_energie_slim", str(device_id))},
+        "name": f"{brand} ({device_id})",
+        "manufacturer": battery.provider or 'Frank Energie',
+        "model": brand,
+    }
+
+def total_unique_id(name, scope=None):
+    """Unique id of a totals sensor; scope keeps totals of different entries apart."""
+    return f"frank_energie_{scope}_{name}" if scope else f"frank_energie_{name}"
+
+def entry_totals_device_info(entry_id, account):
+    """Totals device of a single config entry."""
+    return {
+        "identifiers": {("frank_energie_slim", f"totals_{entry_id}")},
+        "name": f"Totaal batterijen ({account})",
+        "manufacturer": "Frank Energie",
+    }
+
+FLEET_DEVICE_INFO = {
+    "identifiers": {("frank_energie_slim", "fleet")},
+    "name": "Totaal alle accounts",
+    "manufacturer": "Frank Energie",
+}
+
+def _total_object_id(name, object_prefix):
+    return f"{object_prefix}_{name}" if object_prefix else name
+
+def _within_deadband(old, new, deadband):
+    """Return True if new does not differ meaningfully from old."""
+    if old == new:
+        return True
+    if not deadband or isinstance(old, bool) or isinstance(new, bool):
+        return False
+    try:
+        return abs(float(new) - float(old)) < deadband
+    except (TypeError, ValueError):
+        return False
+
+class FrankEnergieChangeDetectionMixin:
+    """Skip state machine writes when neither the state, the attributes nor the availability changed.
+
+    Numeric states are compared against the last written value, so small
+    movements accumulate until they exceed _deadband and are then written.
+    """
+    _deadband = 0
+    _written_state = _UNSET
+    _written_attributes = None
+    _written_available = None
+
+    def async_write_ha_state_if_changed(self):
+        state = self.state
+        attributes = self.extra_state_attributes
+        if (
+            self._written_state is not _UNSET
+            and self.available == self._written_available
+            and attributes == self._written_attributes
+            and _within_deadband(self._written_state, state, self._deadband)
+        ):
+            return False
+        self.async_write_ha_state()
+        return True
+
+    def async_write_ha_state(self):
+        super().async_write_ha_state()
+        # Track every write, including the initial one done by the entity platform
+        self._written_state = self.state
+        self._written_available = self.available
+        attributes = self.extra_state_attributes
+        self._written_attributes = dict(attributes) if attributes else attributes
+
+class FrankEnergieCoordinatorEntity(FrankEnergieChangeDetectionMixin, CoordinatorEntity):
+    """Sensor whose state is derived from the coordinator's current EntrySnapshot.
+
+    All entities of a coordinator are written in the dispatch that follows a
+    refresh, each only when its state or attributes changed.
+    """
+    _attr_has_entity_name = True
+
+    def __init__(self, coordinator, object_id):
+        super().__init__(coordinator)
+        hass = coordinator.hass
         if hass is not None:
-            self.entity_id = generate_entity_id(
-                'sensor.frank_slim_{}', f"{device_id}_{unique_id_suffix}", hass=hass
-            )
+            self.entity_id = generate_entity_id('sensor.frank_slim_{}', object_id, hass=hass)
         else:
-            self.entity_id = f"sensor.frank_slim_{device_id}_{unique_id_suffix}"
+            self.entity_id = f"sensor.frank_slim_{object_id}"
 
     @property
-    def state(self):
-        return self._state
+    def extra_state_attributes(self):
+        return self.coordinator.data.attributes
+
+    @callback
+    def _handle_coordinator_update(self):
+        self.async_write_ha_state_if_changed()
+
+class FrankEnergieBatteryEntity(FrankEnergieCoordinatorEntity):
+    """Sensor of one battery; unavailable while the snapshot has no data for it."""
+
+    def __init__(self, coordinator, device_id, object_id):
+        self._device_id = device_id
+        super().__init__(coordinator, object_id)
 
     @property
-    def device_info(self):
-        brand = self._details.get('smartBattery', {}).get('brand', 'Battery')
-        device_id = str(self._session['deviceId'])
-        return {
-            "identifiers": {("frank_energie_slim", device_id)},
-            "name": f"{brand} ({device_id})",
-            "manufacturer": self._details.get('smartBattery', {}).get('provider', 'Frank Energie'),
-            "model": brand,
-        }
-
-    async def async_update(self):
-        pass
-
-class FrankEnergieTotalAvgSocSensor(Entity):
-    """Sensor for average state of charge across all batteries (totals device)."""
-    def __init__(self, hass):
-        self.hass = hass
-        self._attr_name = "Gemiddelde SoC"
-        self._attr_unique_id = "frank_energie_average_soc"
-        self._attr_has_entity_name = True
-        self._attr_unit_of_measurement = "%"
-        self._state = None
-        if hass is not None:
-            self.entity_id = generate_entity_id(
-                'sensor.frank_slim_{}', 'average_soc', hass=hass
-            )
-        else:
-            self.entity_id = 'sensor.frank_slim_average_soc'
+    def battery_data(self):
+        return self.coordinator.data.battery(self._device_id)
 
     @property
-    def state(self):
-        return self._state
+    def available(self):
+        return super().available and self.battery_data is not None
 
     @property
     def device_info(self):
-        return FrankEnergieTotalResultSensor.TOTALS_DEVICE_INFO
+        data = self.battery_data
+        return _battery_device_info(self._device_id, data.battery if data is not None else Battery())
 
-    async def async_update(self):
-        pass
+class FrankEnergieBatterySessionResultSensor(FrankEnergieBatteryEntity):
+    _attr_device_class = "monetary"
+    _attr_unit_of_measurement = "EUR"
 
-class FrankEnergieTotalLastModeSensor(Entity):
-    """Sensor for last battery mode across all batteries (totals device)."""
-    def __init__(self, hass):
-        self.hass = hass
+    def __init__(self, coordinator, device_id, result_key, unique_id_suffix):
+        super().__init__(coordinator, device_id, f"{device_id}_{unique_id_suffix}")
+        self._result_key = result_key
+        self._attr_name = ENTITY_NAMES.get(result_key, result_key)
+        self._attr_unique_id = f"battery_{device_id}_{unique_id_suffix}"
+
+    @property
+    def state(self):
+        data = self.battery_data
+        return data.session.get_result(self._result_key) if data is not None and data.session else None
+
+class FrankEnergieBatteryPeriodResultSensor(FrankEnergieBatteryEntity):
+    """Month-to-date, year-to-date or all-time result of one battery, from the local result index."""
+    _attr_device_class = "monetary"
+    _attr_unit_of_measurement = "EUR"
+
+    def __init__(self, coordinator, device_id, result_key, unique_id_suffix, period):
+        period_suffix, period_name = PERIODS[period]
+        super().__init__(coordinator, device_id, f"{device_id}_{unique_id_suffix}_{period_suffix}")
+        self._result_key = result_key
+        self._period = period
+        self._attr_name = f"{RESULT_NAMES.get(result_key, result_key)} {period_name}"
+        self._attr_unique_id = f"battery_{device_id}_{unique_id_suffix}_{period_suffix}"
+
+    @property
+    def state(self):
+        periods = self.coordinator.data.periods.get((self._device_id, self._result_key))
+        return getattr(periods, self._period) if periods is not None else None
+
+class FrankEnergieBatteryModeSensor(FrankEnergieBatteryEntity):
+    def __init__(self, coordinator, device_id):
+        super().__init__(coordinator, device_id, f"{device_id}_mode")
         self._attr_name = "Batterijmodus"
-        self._attr_unique_id = "frank_energie_total_last_mode"
-        self._attr_has_entity_name = True
-        self._state = None
-        if hass is not None:
-            self.entity_id = generate_entity_id(
-                'sensor.frank_slim_{}', 'total_last_mode', hass=hass
-            )
-        else:
-            self.entity_id = 'sensor.frank_slim_total_last_mode'
+        self._attr_unique_id = f"frank_energie_battery_{device_id}_mode"
 
     @property
     def state(self):
-        return self._state
+        data = self.battery_data
+        return data.battery.settings.mode if data is not None else None
+
+class FrankEnergieBatteryStateOfChargeSensor(FrankEnergieBatteryEntity):
+    _attr_unit_of_measurement = "%"
+
+    def __init__(self, coordinator, device_id):
+        super().__init__(coordinator, device_id, f"{device_id}_soc")
+        self._attr_name = "State of Charge"
+        self._attr_unique_id = f"frank_energie_battery_{device_id}_soc"
+
+    @property
+    def state(self):
+        data = self.battery_data
+        return data.summary.state_of_charge if data is not None else None
+
+class FrankEnergieTotalEntity(FrankEnergieCoordinatorEntity):
+    """Sensor on a totals device, derived from the totals of the snapshot."""
+
+    def __init__(self, coordinator, name, scope=None, device_info=None, object_prefix=None):
+        super().__init__(coordinator, _total_object_id(name, object_prefix))
+        self._device_info = device_info or FrankEnergieTotalResultSensor.TOTALS_DEVICE_INFO
+        self._attr_unique_id = total_unique_id(name, scope)
 
     @property
     def device_info(self):
-        return FrankEnergieTotalResultSensor.TOTALS_DEVICE_INFO
+        return self._device_info
 
-    async def async_update(self):
-        pass
+class FrankEnergieTotalAvgSocSensor(FrankEnergieTotalEntity):
+    """Sensor for average state of charge across all batteries (totals device)."""
+    _attr_unit_of_measurement = "%"
 
-class FrankEnergieTotalLastUpdateSensor(Entity):
-    """Sensor for the most recent lastUpdate timestamp across all batteries (totals device)."""
-    def __init__(self, hass):
-        self.hass = hass
-        self._attr_name = "Laatste update"
-        self._attr_unique_id = "frank_energie_total_last_update"
-        self._attr_has_entity_name = True
-        self._attr_device_class = "timestamp"
-        self._state = None
-        if hass is not None:
-            self.entity_id = generate_entity_id(
-                'sensor.frank_slim_{}', 'total_last_update', hass=hass
-            )
-        else:
-            self.entity_id = 'sensor.frank_slim_total_last_update'
+    def __init__(self, coordinator, scope=None, device_info=None, object_prefix=None):
+        super().__init__(coordinator, 'average_soc', scope, device_info, object_prefix)
+        self._attr_name = "Gemiddelde SoC"
 
     @property
     def state(self):
-        return self._state
+        return self.coordinator.data.average_soc
+
+class FrankEnergieTotalLastModeSensor(FrankEnergieTotalEntity):
+    """Sensor for last battery mode across all batteries (totals device)."""
+
+    def __init__(self, coordinator, scope=None, device_info=None, object_prefix=None):
+        super().__init__(coordinator, 'total_last_mode', scope, device_info, object_prefix)
+        self._attr_name = "Batterijmodus"
 
     @property
-    def device_info(self):
-        return FrankEnergieTotalResultSensor.TOTALS_DEVICE_INFO
+    def state(self):
+        return self.coordinator.data.last_mode
 
-    async def async_update(self):
-        pass
+class FrankEnergieTotalLastUpdateSensor(FrankEnergieTotalEntity):
+    """Sensor for the most recent lastUpdate timestamp across all batteries (totals device)."""
+    _attr_device_class = "timestamp"
 
-class FrankEnergieTotalResultSensor(Entity):
+    def __init__(self, coordinator, scope=None, device_info=None, object_prefix=None):
+        super().__init__(coordinator, 'total_last_update', scope, device_info, object_prefix)
+        self._attr_name = "Laatste update"
+
+    @property
+    def state(self):
+        return self.coordinator.data.last_update
+
+class FrankEnergieTotalResultSensor(FrankEnergieTotalEntity):
     TOTALS_DEVICE_INFO = {
         "identifiers": {("frank_energie_slim", "totals")},
         "name": "Totaal batterijen",
         "manufacturer": "Frank Energie"
     }
-    def __init__(self, hass, result_key, unique_id_suffix=None):
-        self.hass = hass
-        self._result_key = result_key
-        self._attr_name = f"{ENTITY_NAMES.get(result_key, result_key)}"
+    _attr_device_class = "monetary"
+    _attr_unit_of_measurement = "EUR"
+
+    def __init__(self, coordinator, result_key, unique_id_suffix=None, scope=None, device_info=None, object_prefix=None):
         # Use unique_id_suffix for unique_id and entity_id if provided, else fallback to result_key
         suffix = unique_id_suffix if unique_id_suffix is not None else result_key
-        self._attr_unique_id = f"frank_energie_{suffix}_total"
-        self._attr_has_entity_name = True
-        self._state = None  # Start as None, not 0.0
-        self._attr_device_class = "monetary"
-        self._attr_unit_of_measurement = "EUR"
-        if hass is not None:
-            self.entity_id = generate_entity_id(
-                'sensor.frank_slim_{}', f"{suffix}_total", hass=hass
-            )
-        else:
-            self.entity_id = f"sensor.frank_slim_{suffix}_total"
+        super().__init__(coordinator, f"{suffix}_total", scope, device_info, object_prefix)
+        self._result_key = result_key
+        self._attr_name = f"{ENTITY_NAMES.get(result_key, result_key)}"
 
     @property
     def state(self):
-        return self._state
+        return self.coordinator.data.results.get(self._result_key)
+
+class FrankEnergieTotalPeriodResultSensor(FrankEnergieTotalEntity):
+    """Month-to-date, year-to-date or all-time result across all batteries (totals device)."""
+    _attr_device_class = "monetary"
+    _attr_unit_of_measurement = "EUR"
+
+    def __init__(self, coordinator, result_key, unique_id_suffix, period, scope=None, device_info=None, object_prefix=None):
+        period_suffix, period_name = PERIODS[period]
+        super().__init__(coordinator, f"{unique_id_suffix}_{period_suffix}_total", scope, device_info, object_prefix)
+        self._result_key = result_key
+        self._period = period
+        self._attr_name = f"{RESULT_NAMES.get(result_key, result_key)} {period_name}"
 
     @property
-    def device_info(self):
-        return self.TOTALS_DEVICE_INFO
+    def state(self):
+        periods = self.coordinator.data.periods.get((None, self._result_key))
+        return getattr(periods, self._period) if periods is not None else None
 
-    async def async_update(self):
-        pass
+class FrankEnergieDiagnosticSensor(FrankEnergieCoordinatorEntity):
+    """Diagnostic sensor of a config entry, on its totals device."""
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
 
-class FrankEnergieBatteryModeSensor(Entity):
-    def __init__(self, hass, device_id, mode, details=None):
-        self.hass = hass
-        self._device_id = device_id
-        self._details = details or {}
-        self._state = mode
-        self._attr_name = f"Batterijmodus"
-        self._attr_unique_id = f"frank_energie_battery_{device_id}_mode"
-        self._attr_has_entity_name = True
-        if hass is not None:
-            self.entity_id = generate_entity_id(
-                'sensor.frank_slim_{}', f"{device_id}_mode", hass=hass
-            )
-        else:
-            self.entity_id = f"sensor.frank_slim_{device_id}_mode"
+    def __init__(self, coordinator, name, key, scope=None, device_info=None):
+        super().__init__(coordinator, key)
+        self._device_info = device_info
+        self._attr_name = name
+        self._attr_unique_id = total_unique_id(key, scope)
 
     @property
-    def state(self):
-        return self._state
+    def extra_state_attributes(self):
+        # Not marked stale; they describe the refreshes themselves
+        return None
 
     @property
     def device_info(self):
-        brand = self._details.get('smartBattery', {}).get('brand', 'Battery')
-        return {
-            "identifiers": {("frank_energie_slim", str(self._device_id))},
-            "name": f"{brand} ({self._device_id})",
-            "manufacturer": self._details.get('smartBattery', {}).get('provider', 'Frank Energie'),
-            "model": brand,
-        }
-
-    async def async_update(self):
-        pass
-
-class FrankEnergieBatteryStateOfChargeSensor(Entity):
-    def __init__(self, hass, device_id, state_of_charge, details=None):
-        self.hass = hass
-        self._device_id = device_id
-        self._details = details or {}
-        self._state = state_of_charge
-        self._attr_name = f"State of Charge"
-        self._attr_unique_id = f"frank_energie_battery_{device_id}_soc"
-        self._attr_has_entity_name = True
-        self._attr_unit_of_measurement = "%"
-        if hass is not None:
-            self.entity_id = generate_entity_id(
-                'sensor.frank_slim_{}', f"{device_id}_soc", hass=hass
-            )
-        else:
-            self.entity_id = f"sensor.frank_slim_{device_id}_soc"
+        return self._device_info
+
+class FrankEnergieRefreshDurationSensor(FrankEnergieDiagnosticSensor):
+    """Duration of the last refresh of the entry, in seconds."""
+    _attr_device_class = "duration"
+    _attr_unit_of_measurement = "s"
+
+    def __init__(self, coordinator, scope=None, device_info=None):
+        super().__init__(coordinator, "Laatste verversingsduur", 'refresh_duration', scope, device_info)
 
     @property
     def state(self):
-        return self._state
+        duration = self.coordinator.refresh_status.last_duration
+        return round(duration, 2) if duration is not None else None
+
+class FrankEnergieApiCallsTodaySensor(FrankEnergieDiagnosticSensor):
+    """Requests sent to the Frank Energie API today by the entry's client, including retries."""
+
+    def __init__(self, coordinator, scope=None, device_info=None):
+        super().__init__(coordinator, "API-verzoeken vandaag", 'api_calls_today', scope, device_info)
 
     @property
-    def device_info(self):
-        brand = self._details.get('smartBattery', {}).get('brand', 'Battery')
-        return {
-            "identifiers": {("frank_energie_slim", str(self._device_id))},
-            "name": f"{brand} ({self._device_id})",
-            "manufacturer": self._details.get('smartBattery', {}).get('provider', 'Frank Energie'),
-            "model": brand,
-        }
-
-    async def async_update(self):
-        pass
-
-class FrankEnergieConfigFlow:
-    async def async_step_user(self, user_input=None):
-        errors = {}
-        if user_input is not None:
-            from .api import FrankEnergie
-            api = FrankEnergie()
-            try:
-                await self.hass.async_add_executor_job(
-                    api.login, user_input[CONF_USERNAME].strip, user_input[CONF_PASSWORD]
-                )
-            except Exception:
-                errors["base"] = "auth"
-            if not errors:
-                return self.async_create_entry(title="Frank Energie", data=user_input)
-        return self.async_show_form(
-            step_id="user",
-            data_schema=vol.Schema({
-                vol.Required(CONF_USERNAME): str,
-                vol.Required(CONF_PASSWORD): str,
-            }),
-            errors=errors,
-        )
+    def state(self):
+        return self.coordinator.client.metrics.calls_today
@@ -0,0 +1,183 @@
+import asyncio
+import logging
+from homeassistant.helpers.event import async_call_later
+from homeassistant.util import dt as dt_util
+from .api import AsyncFrankEnergie
+from .scheduler import AdaptivePollScheduler
+
+_LOGGER: logging.Logger = logging.getLogger(__package__)
+
+FLEET_DATA_KEY = "frank_energie_slim_fleet"
+
+
+class ClientPool:
+    """AsyncFrankEnergie clients shared across config entries, one per account.
+
+    All clients use the same aiohttp session, so connections are pooled
+    process-wide; entries for the same account also share their tokens.
+    """
+
+    def __init__(self, session):
+        self._session = session
+        self._clients = {}
+
+    def __len__(self):
+        return len(self._clients)
+
+    def acquire(self, username, password, tokens=None, token_listener=None, get_requests=False):
+        """Return the client for username, creating it on first use.
+
+        A new client starts from the stored tokens and logs in with the
+        password on its first request when there are none.
+        """
+        entry = self._clients.get(username)
+        if entry is None:
+            tokens = tokens or {}
+            client = AsyncFrankEnergie(self._session, tokens.get('authToken'), tokens.get('refreshToken'),
+                                       get_requests=get_requests)
+            client.set_credentials(username, password)
+            client.token_listener = token_listener
+            entry = self._clients[username] = [client, 0]
+        entry[1] += 1
+        return entry[0]
+
+    def release(self, username):
+        entry = self._clients.get(username)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del self._clients[username]
+
+
+class FrankEnergieFleet:
+    """Config entries in fleet mode refresh together in one scheduled cycle.
+
+    Each member registers a refresh coroutine returning its
+    (last_update, state) and the coordinator holding its current snapshot. The
+    first entry to claim them owns the fleet-level totals.
+    """
+
+    def __init__(self, hass, session):
+        self._hass = hass
+        self.clients = ClientPool(session)
+        self.scheduler = AdaptivePollScheduler()
+        self._members = {}
+        self._owner = None
+        self._update_totals = None
+        self._cancel_next_cycle = None
+
+    @property
+    def owner(self):
+        return self._owner
+
+    @property
+    def members(self):
+        return list(self._members)
+
+    def claim_totals(self, entry_id):
+        """Return True when entry_id owns, or now takes, the fleet totals."""
+        if self._owner is None:
+            self._owner = entry_id
+        return self._owner == entry_id
+
+    def join(self, entry_id, refresh, coordinator):
+        """Add an entry to the shared refresh cycle."""
+        self._members[entry_id] = (refresh, coordinator)
+        if self._cancel_next_cycle is None:
+            self._schedule_next_cycle()
+
+    def leave(self, entry_id):
+        """Remove an entry; returns the entry that should take over the fleet totals, if any."""
+        self._members.pop(entry_id, None)
+        if not self._members:
+            self._cancel_cycle()
+        if self._owner != entry_id:
+            return None
+        self._owner = None
+        self._update_totals = None
+        return next(iter(self._members), None)
+
+    def set_totals_updater(self, update_totals):
+        """Register the owner's callback that writes the fleet totals from all BatteryData."""
+        self._update_totals = update_totals
+
+    def all_battery_data(self):
+        """Return the BatteryData of every battery in the fleet, once per battery.
+
+        Two entries for the same account both hold its batteries; the first
+        entry's data is used.
+        """
+        by_device = {}
+        for _, coordinator in self._members.values():
+            for data in coordinator.data.batteries:
+                by_device.setdefault(data.device_id, data)
+        return list(by_device.values())
+
+    def period_totals(self):
+        """Return the period results of all batteries summed per result field, keyed like EntrySnapshot.periods.
+
+        The totals are summed over the batteries rather than the entries, so a
+        battery shared by two entries is only counted once.
+        """
+        by_device = {}
+        for _, coordinator in self._members.values():
+            for (device_id, result_key), periods in coordinator.data.periods.items():
+                if device_id is not None:
+                    by_device[(device_id, result_key)] = periods
+        totals = {}
+        for (_, result_key), periods in by_device.items():
+            key = (None, result_key)
+            totals[key] = totals[key] + periods if key in totals else periods
+        return totals
+
+    def update_totals(self):
+        if self._update_totals is not None:
+            self._update_totals(self.all_battery_data())
+
+    async def async_refresh(self):
+        """Refresh all members concurrently and update the fleet totals."""
+        entry_ids = list(self._members)
+        results = await asyncio.gather(
+            *(self._members[entry_id][0]() for entry_id in entry_ids), return_exceptions=True
+        )
+        last_updates = []
+        states = []
+        for entry_id, result in zip(entry_ids, results):
+            if isinstance(result, Exception):
+                _LOGGER.warning("Refreshing entry %s failed: %r", entry_id, result)
+                continue
+            last_update, state = result
+            if last_update:
+                last_updates.append(last_update)
+            states.append(state)
+        self.update_totals()
+        self.scheduler.record(max(last_updates) if last_updates else None, tuple(states))
+
+    def _schedule_next_cycle(self):
+        self._cancel_cycle()
+        if not self._members:
+            return
+        delay = self.scheduler.next_delay(dt_util.utcnow())
+        _LOGGER.debug("Next Frank Energie fleet refresh in %s", delay)
+        self._cancel_next_cycle = async_call_later(self._hass, delay, self._async_run_cycle)
+
+    def _cancel_cycle(self):
+        if self._cancel_next_cycle is not None:
+            self._cancel_next_cycle()
+            self._cancel_next_cycle = None
+
+    async def _async_run_cycle(self, now):
+        self._cancel_next_cycle = None
+        try:
+            await self.async_refresh()
+        finally:
+            self._schedule_next_cycle()
+
+
+def get_fleet(hass, session):
+    """Return the process-wide fleet, creating it on first use."""
+    fleet = hass.data.get(FLEET_DATA_KEY)
+    if fleet is None:
+        fleet = hass.data[FLEET_DATA_KEY] = FrankEnergieFleet(hass, session)
+    return fleet
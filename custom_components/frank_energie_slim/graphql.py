@@ -0,0 +1,105 @@
+import hashlib
+import json
+import re
+from urllib.parse import urlencode
+
+# Apollo's Automatic Persisted Queries: the server answers a hash it has not seen with this error
+PERSISTED_QUERY_NOT_FOUND = ("PersistedQueryNotFound", "PERSISTED_QUERY_NOT_FOUND")
+PERSISTED_QUERY_NOT_SUPPORTED = ("PersistedQueryNotSupported", "PERSISTED_QUERY_NOT_SUPPORTED")
+# How GraphQL servers without persisted queries reject a request that has no document
+_MISSING_QUERY = re.compile(r"must provide (a )?query|non-empty .?query|query (string )?(is )?(missing|required)", re.I)
+
+# Leave GET urls well below the limits of proxies and CDNs; longer requests are posted
+MAX_GET_URL_LENGTH = 2000
+
+_WHITESPACE = re.compile(r"\s+")
+_PUNCTUATOR_SPACE = re.compile(r" ?([{}():,!$=\[\]]) ?")
+
+_encode = json.JSONEncoder(separators=(',', ':')).encode
+
+
+def minify_query(document):
+    """Strip the insignificant whitespace of a GraphQL document without string literals."""
+    return _PUNCTUATOR_SPACE.sub(r"\1", _WHITESPACE.sub(" ", document)).strip()
+
+
+class CompiledQuery:
+    """A minified GraphQL document with its persisted query hash and pre-encoded request bodies.
+
+    The constant parts of every body are JSON encoded once, so a request only
+    encodes its variables.
+    """
+    __slots__ = ('operation', 'document', 'sha256', 'mutation', '_plain', '_register', '_persisted', '_extensions')
+
+    def __init__(self, operation, document):
+        self.operation = operation
+        self.document = minify_query(document)
+        self.sha256 = hashlib.sha256(self.document.encode()).hexdigest()
+        self.mutation = self.document.startswith("mutation")
+        self._extensions = _encode({"persistedQuery": {"version": 1, "sha256Hash": self.sha256}})
+        name, query = _encode(operation), _encode(self.document)
+        self._plain = f'{{"operationName":{name},"query":{query},"variables":'.encode()
+        self._register = f'{{"operationName":{name},"query":{query},"extensions":{self._extensions},"variables":'.encode()
+        self._persisted = f'{{"operationName":{name},"extensions":{self._extensions},"variables":'.encode()
+
+    def body(self, variables, persisted=False, register=False):
+        """Return the JSON body: the full document, the document with its hash, or the hash alone."""
+        prefix = self._persisted if persisted else self._register if register else self._plain
+        return prefix + _encode(variables or {}).encode() + b"}"
+
+    def get_url(self, url, variables):
+        """Return the url of a hash-only GET request, or None when it would be too long."""
+        get_url = url + "?" + urlencode({
+            "operationName": self.operation,
+            "variables": _encode(variables or {}),
+            "extensions": self._extensions,
+        })
+        return get_url if len(get_url) <= MAX_GET_URL_LENGTH else None
+
+    def payload(self, variables=None):
+        """The request as a GraphQL payload dict, as built by the query functions in api.py."""
+        payload = {"query": self.document, "operationName": self.operation}
+        if variables is not None:
+            payload["variables"] = variables
+        return payload
+
+
+_COMPILED = {}
+
+
+def compile_query(operation, document):
+    """Compile a document once; later calls with the same document return the same CompiledQuery."""
+    compiled = _COMPILED.get(document)
+    if compiled is None:
+        compiled = CompiledQuery(operation, document)
+        # Keyed by both the source and the minified text, so payloads built from either are found
+        _COMPILED[document] = _COMPILED[compiled.document] = compiled
+    return compiled
+
+
+def compiled_for(query_data):
+    """Return the CompiledQuery of a GraphQL payload dict."""
+    return compile_query(query_data.get('operationName'), query_data['query'])
+
+
+def persisted_query_error(data):
+    """Classify the response to a hash-only request.
+
+    Returns "not_found" when the server does not know the hash yet,
+    "unsupported" when it cannot serve queries by hash at all, or None when the
+    response is a regular answer (including GraphQL errors) to hand to the caller.
+    """
+    errors = data.get('errors') if isinstance(data, dict) else None
+    if not errors or data.get('data'):
+        return None
+    for error in errors:
+        if not isinstance(error, dict):
+            continue
+        message = error.get('message') or ''
+        code = (error.get('extensions') or {}).get('code')
+        if message in PERSISTED_QUERY_NOT_FOUND or code in PERSISTED_QUERY_NOT_FOUND:
+            return "not_found"
+        if (message in PERSISTED_QUERY_NOT_SUPPORTED or code in PERSISTED_QUERY_NOT_SUPPORTED
+                or _MISSING_QUERY.search(message)):
+            return "unsupported"
+    return None
@@ -0,0 +1,325 @@
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+import logging
+
+from .models import SessionResult
+from .range_planner import async_fetch_session_ranges, plan_ranges
+from .result_index import ResultIndex
+
+_LOGGER: logging.Logger = logging.getLogger(__package__)
+
+HISTORY_DB_FILENAME = "frank_energie_slim_history.db"
+# Days this far back are no longer corrected by Frank and are treated as immutable
+SETTLE_DAYS = 2
+# How far back the first sync looks for sessions
+BACKFILL_DAYS = 365
+# Recent, unsettled days are re-synced at most this often; today is also updated from every refresh
+HISTORY_SYNC_INTERVAL = timedelta(hours=1)
+# The result of a session day is the day's trading (gross) result, not the net total result;
+# the other result fields, including the total result, are kept in day_results
+SESSION_RESULT_KEY = 'periodTradingResult'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    device_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    result REAL,
+    cumulative_result REAL,
+    settled INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (device_id, date)
+);
+CREATE TABLE IF NOT EXISTS day_results (
+    device_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    result_key TEXT NOT NULL,
+    value REAL,
+    PRIMARY KEY (device_id, date, result_key)
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    device_id TEXT PRIMARY KEY,
+    settled_through TEXT NOT NULL
+);
+"""
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+class SessionHistoryStore:
+    """SQLite store with one row per battery per day.
+
+    All methods block on disk I/O; call them from the executor.
+    """
+
+    def __init__(self, path):
+        self._path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self._path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def get_settled_through(self, device_id):
+        """Return the last day that is stored and settled for device_id, or None."""
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT settled_through FROM sync_state WHERE device_id = ?", (device_id,)
+            ).fetchone()
+        return date.fromisoformat(row['settled_through']) if row else None
+
+    def upsert_sessions(self, device_id, sessions, settled_through=None, synced_through=None):
+        """Store per-day sessions; settled days are never overwritten.
+
+        sessions are SessionResult models or raw API session dicts. When
+        settled_through is given, all days up to and including it are marked
+        settled and later syncs start after it. A partial sync passes the day
+        before its first gap as synced_through: later syncs start after that
+        day, and only the given sessions up to settled_through are settled.
+        """
+        rows = []
+        for session in sessions or []:
+            if isinstance(session, dict):
+                if not session.get('date'):
+                    continue
+                session = SessionResult.from_dict(session)
+            rows.append((device_id, _as_date(session.date).isoformat(), session.result, session.cumulative_result))
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    """
+                    INSERT INTO sessions (device_id, date, result, cumulative_result) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (device_id, date) DO UPDATE SET
+                        result = excluded.result,
+                        cumulative_result = excluded.cumulative_result
+                    WHERE settled = 0
+                    """,
+                    rows,
+                )
+                if settled_through is not None:
+                    settled = _as_date(settled_through).isoformat()
+                    synced = min(settled, _as_date(synced_through).isoformat()) if synced_through else settled
+                    conn.execute(
+                        "UPDATE sessions SET settled = 1 WHERE device_id = ? AND date <= ?", (device_id, synced)
+                    )
+                    # Fetched days after a gap are settled as well, so the next sync skips them
+                    conn.executemany(
+                        "UPDATE sessions SET settled = 1 WHERE device_id = ? AND date = ?",
+                        [(device_id, row[1]) for row in rows if synced < row[1] <= settled],
+                    )
+                    conn.execute(
+                        """
+                        INSERT INTO sync_state (device_id, settled_through) VALUES (?, ?)
+                        ON CONFLICT (device_id) DO UPDATE SET settled_through = MAX(settled_through, excluded.settled_through)
+                        """,
+                        (device_id, synced),
+                    )
+        return len(rows)
+
+    def get_settled_days(self, device_id, start, end):
+        """Return the set of stored and settled days of device_id from start through end."""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT date FROM sessions WHERE device_id = ? AND settled = 1 AND date >= ? AND date <= ?",
+                (device_id, _as_date(start).isoformat(), _as_date(end).isoformat()),
+            ).fetchall()
+        return {date.fromisoformat(row['date']) for row in rows}
+
+    def get_sessions(self, device_id=None, start=None, end=None):
+        """Return stored sessions ordered by date, optionally limited to a device and date range."""
+        query = "SELECT device_id, date, result, cumulative_result, settled FROM sessions WHERE 1 = 1"
+        params = []
+        if device_id is not None:
+            query += " AND device_id = ?"
+            params.append(device_id)
+        if start is not None:
+            query += " AND date >= ?"
+            params.append(_as_date(start).isoformat())
+        if end is not None:
+            query += " AND date <= ?"
+            params.append(_as_date(end).isoformat())
+        query += " ORDER BY date, device_id"
+        with self._lock:
+            rows = self._connection().execute(query, params).fetchall()
+        return [
+            {
+                'deviceId': row['device_id'],
+                'date': row['date'],
+                'result': row['result'],
+                'cumulativeResult': row['cumulative_result'],
+                'settled': bool(row['settled']),
+            }
+            for row in rows
+        ]
+
+    def get_daily_results(self, device_id=None, start=None, end=None):
+        """Return (date, result) per day in the range, summed over all batteries when device_id is None."""
+        query = "SELECT date, SUM(result) AS result FROM sessions WHERE 1 = 1"
+        params = []
+        if device_id is not None:
+            query += " AND device_id = ?"
+            params.append(device_id)
+        if start is not None:
+            query += " AND date >= ?"
+            params.append(_as_date(start).isoformat())
+        if end is not None:
+            query += " AND date <= ?"
+            params.append(_as_date(end).isoformat())
+        query += " GROUP BY date ORDER BY date"
+        with self._lock:
+            rows = self._connection().execute(query, params).fetchall()
+        return [(date.fromisoformat(row['date']), row['result'] or 0.0) for row in rows]
+
+    def get_total(self, device_id=None, start=None, end=None):
+        """Return the summed result over the stored sessions in the range."""
+        return sum(session['result'] or 0 for session in self.get_sessions(device_id, start, end))
+
+    def upsert_day_results(self, day, values):
+        """Store the results of one day, given as {(device_id, result_key): value}.
+
+        The trading result is skipped; it is stored with the day's session.
+        """
+        day = _as_date(day).isoformat()
+        rows = [
+            (device_id, day, result_key, value)
+            for (device_id, result_key), value in values.items()
+            if result_key != SESSION_RESULT_KEY
+        ]
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    """
+                    INSERT INTO day_results (device_id, date, result_key, value) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (device_id, date, result_key) DO UPDATE SET value = excluded.value
+                    """,
+                    rows,
+                )
+        return len(rows)
+
+    def load_result_index(self, device_ids):
+        """Build a ResultIndex from the stored sessions and day results of device_ids.
+
+        The database is shared by all config entries, so only the entry's own
+        batteries are loaded. Rows are folded in date order, so every update
+        extends the series at their last day.
+        """
+        index = ResultIndex()
+        device_ids = list(device_ids)
+        if not device_ids:
+            return index
+        placeholders = ", ".join("?" * len(device_ids))
+        with self._lock:
+            rows = self._connection().execute(
+                f"""
+                SELECT device_id, date, ? AS result_key, result AS value FROM sessions
+                WHERE device_id IN ({placeholders})
+                UNION ALL
+                SELECT device_id, date, result_key, value FROM day_results
+                WHERE device_id IN ({placeholders})
+                ORDER BY date
+                """,
+                (SESSION_RESULT_KEY, *device_ids, *device_ids),
+            ).fetchall()
+        for row in rows:
+            index.set(row['device_id'], row['result_key'], date.fromisoformat(row['date']), row['value'])
+        return index
+
+
+class SessionHistorySync:
+    """Backfills a battery's session history once and then syncs only unsettled days.
+
+    The days to sync are fetched through the range planner: in chunks that the
+    API answers quickly, batched across batteries and run concurrently.
+    """
+
+    def __init__(self, hass, client, store):
+        self._hass = hass
+        self._client = client
+        self._store = store
+        self._last_sync = None
+
+    def _plan_device(self, device_id, today):
+        """Return the first day to sync and the ranges to fetch for device_id; runs in the executor."""
+        settled_through = self._store.get_settled_through(device_id)
+        start = settled_through + timedelta(days=1) if settled_through else today - timedelta(days=BACKFILL_DAYS)
+        return start, plan_ranges(start, today, self._store.get_settled_days(device_id, start, today))
+
+    async def async_sync(self, device_ids, today=None):
+        """Sync all batteries; days that failed are logged and retried on the next sync.
+
+        Returns the first day that was synced, or None when no battery was.
+        """
+        self._last_sync = datetime.now()
+        today = _as_date(today or datetime.now())
+        starts = {}
+        ranges_by_device = {}
+        for device_id in device_ids:
+            starts[device_id], ranges_by_device[device_id] = await self._hass.async_add_executor_job(
+                self._plan_device, device_id, today
+            )
+        fetched = await async_fetch_session_ranges(self._client, ranges_by_device)
+        settled_through = today - timedelta(days=SETTLE_DAYS)
+        synced_from = None
+        for device_id in device_ids:
+            result = fetched[device_id]
+            first_gap = result.first_gap
+            stored = await self._hass.async_add_executor_job(
+                self._store.upsert_sessions, device_id, result.sessions, settled_through,
+                first_gap - timedelta(days=1) if first_gap else None,
+            )
+            if first_gap is not None:
+                _LOGGER.warning("Syncing session history for battery %s failed from %s: %r",
+                                device_id, first_gap, result.error)
+            else:
+                _LOGGER.debug("Synced %d session day(s) for battery %s from %s", stored, device_id, starts[device_id])
+            if first_gap != starts[device_id] and (synced_from is None or starts[device_id] < synced_from):
+                synced_from = starts[device_id]
+        return synced_from
+
+    async def async_sync_if_due(self, device_ids, now=None):
+        """Sync when the last sync is HISTORY_SYNC_INTERVAL ago; returns the first synced day or None."""
+        now = now or datetime.now()
+        if self._last_sync is not None and now - self._last_sync < HISTORY_SYNC_INTERVAL:
+            return None
+        return await self.async_sync(device_ids, now)
+
+    async def async_store_periods(self, periods):
+        """Store the per-day sessions contained in already fetched BatterySession models."""
+        for period in periods:
+            if period is not None and period.device_id and period.sessions:
+                await self._hass.async_add_executor_job(
+                    self._store.upsert_sessions, period.device_id, period.sessions
+                )
+
+    async def async_store_day_results(self, day, values):
+        await self._hass.async_add_executor_job(self._store.upsert_day_results, day, values)
+
+    async def async_load_result_index(self, device_ids):
+        return await self._hass.async_add_executor_job(self._store.load_result_index, device_ids)
+
+    async def async_get_result_rows(self, start, device_ids):
+        """Return (device_id, result_key, day, value) of the stored session days of device_ids from start on."""
+        sessions = await self._hass.async_add_executor_job(self._store.get_sessions, None, start)
+        device_ids = set(device_ids)
+        return [
+            (session['deviceId'], SESSION_RESULT_KEY, date.fromisoformat(session['date']), session['result'])
+            for session in sessions
+            if session['deviceId'] in device_ids
+        ]
@@ -0,0 +1,77 @@
+from datetime import timedelta
+import logging
+
+from homeassistant.util import dt as dt_util, slugify
+
+from .history import SETTLE_DAYS
+
+_LOGGER: logging.Logger = logging.getLogger(__package__)
+
+DOMAIN = "frank_energie_slim"
+TOTAL_STATISTIC_ID = f"{DOMAIN}:total_result"
+
+
+def get_battery_statistic_id(device_id):
+    return f"{DOMAIN}:battery_{slugify(str(device_id))}_result"
+
+
+def build_statistics(daily_results, base_sum=0.0):
+    """Turn (date, result) pairs into statistic rows starting at local midnight with a running sum."""
+    rows = []
+    total = base_sum
+    for day, result in daily_results:
+        total += result
+        rows.append({
+            "start": dt_util.start_of_local_day(day),
+            "state": result,
+            "sum": total,
+        })
+    return rows
+
+
+async def _async_import_series(hass, store, statistic_id, name, device_id):
+    # The recorder is an optional dependency, so only import it when statistics are written
+    from homeassistant.components.recorder import get_instance
+    from homeassistant.components.recorder.statistics import async_add_external_statistics, get_last_statistics
+
+    last = await get_instance(hass).async_add_executor_job(
+        get_last_statistics, hass, 1, statistic_id, True, {"sum"}
+    )
+    resume_from = None
+    base_sum = 0.0
+    if last.get(statistic_id):
+        last_start = dt_util.as_local(dt_util.utc_from_timestamp(last[statistic_id][0]["start"])).date()
+        # Days that were not settled yet when last imported are imported again
+        resume_from = last_start - timedelta(days=SETTLE_DAYS)
+        base_sum = await hass.async_add_executor_job(
+            store.get_total, device_id, None, resume_from - timedelta(days=1)
+        )
+    daily_results = await hass.async_add_executor_job(store.get_daily_results, device_id, resume_from)
+    if not daily_results:
+        return 0
+    metadata = {
+        "has_mean": False,
+        "has_sum": True,
+        "name": name,
+        "source": DOMAIN,
+        "statistic_id": statistic_id,
+        "unit_of_measurement": "EUR",
+    }
+    async_add_external_statistics(hass, metadata, build_statistics(daily_results, base_sum))
+    return len(daily_results)
+
+
+async def async_import_statistics(hass, store, device_ids):
+    """Import the stored per-day results as external statistics, per battery and in total.
+
+    The first import covers the full backfill; later imports only resend the
+    days that could still change since the previous import.
+    """
+    if "recorder" not in hass.config.components:
+        return
+    for device_id in device_ids:
+        imported = await _async_import_series(
+            hass, store, get_battery_statistic_id(device_id), f"Frank Slim {device_id} resultaat", device_id
+        )
+        _LOGGER.debug("Imported %d day(s) of statistics for battery %s", imported, device_id)
+    await _async_import_series(hass, store, TOTAL_STATISTIC_ID, "Frank Slim totaalresultaat", None)
@@ -0,0 +1,132 @@
+import time
+from bisect import bisect_left
+from datetime import date
+
+# Upper bounds of the latency histogram buckets in milliseconds; the last bucket is unbounded
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram with count, sum and max."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, duration_ms):
+        self.counts[bisect_left(self.buckets, duration_ms)] += 1
+        self.count += 1
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+
+    def as_dict(self):
+        labels = [f"<={bound}" for bound in self.buckets] + [f">{self.buckets[-1]}"]
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 1) if self.count else None,
+            "max_ms": round(self.max_ms, 1),
+            "buckets_ms": dict(zip(labels, self.counts)),
+        }
+
+
+class OperationStats:
+    """Counters of a single GraphQL operation, per attempt sent to the API."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.latency = LatencyHistogram()
+        self.last_error = None
+
+    def as_dict(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.retries,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "latency": self.latency.as_dict(),
+            "last_error": self.last_error,
+        }
+
+
+class ApiMetrics:
+    """Per-operation call counts, latencies and payload sizes of one API client.
+
+    Every attempt that reaches the network is recorded, so a request that
+    succeeded after two retries counts as three calls and two retries.
+    """
+
+    def __init__(self, clock=time.monotonic, today=date.today):
+        self._clock = clock
+        self._today = today
+        self.operations = {}
+        self.logins = 0
+        self.token_renewals = 0
+        self.circuit_open_rejections = 0
+        # Hash-only requests the server answered by asking for the full document
+        self.persisted_query_misses = 0
+        # Queries answered by an identical request in flight or a fresh response, without a request of their own
+        self.coalesced_requests = 0
+        self._day = None
+        self._calls_today = 0
+
+    def _operation(self, operation):
+        stats = self.operations.get(operation)
+        if stats is None:
+            stats = self.operations[operation] = OperationStats()
+        return stats
+
+    def start(self):
+        """Return the start time to pass to record()."""
+        return self._clock()
+
+    def record(self, operation, started, bytes_sent=0, bytes_received=0, error=None):
+        """Record one attempt that was sent to the API."""
+        stats = self._operation(operation)
+        stats.calls += 1
+        stats.bytes_sent += bytes_sent
+        stats.bytes_received += bytes_received
+        stats.latency.record((self._clock() - started) * 1000)
+        if error is not None:
+            self.record_error(operation, error)
+        today = self._today()
+        if today != self._day:
+            self._day = today
+            self._calls_today = 0
+        self._calls_today += 1
+
+    def record_error(self, operation, error):
+        """Record a failed attempt, including GraphQL errors in an otherwise successful response."""
+        stats = self._operation(operation)
+        stats.errors += 1
+        stats.last_error = repr(error)
+
+    def record_retry(self, operation):
+        self._operation(operation).retries += 1
+
+    @property
+    def calls_today(self):
+        return self._calls_today if self._day == self._today() else 0
+
+    @property
+    def total_calls(self):
+        return sum(stats.calls for stats in self.operations.values())
+
+    def as_dict(self):
+        return {
+            "calls_today": self.calls_today,
+            "total_calls": self.total_calls,
+            "logins": self.logins,
+            "token_renewals": self.token_renewals,
+            "circuit_open_rejections": self.circuit_open_rejections,
+            "persisted_query_misses": self.persisted_query_misses,
+            "coalesced_requests": self.coalesced_requests,
+            "operations": {operation: stats.as_dict() for operation, stats in sorted(self.operations.items())},
+        }
@@ -1,27 +1,234 @@
-from datetime import datetime
+from dataclasses import dataclass
 
+# API result field on smartBatterySessions -> BatterySession attribute
+RESULT_FIELDS = {
+    'periodEpexResult': 'period_epex_result',
+    'periodFrankSlim': 'period_frank_slim',
+    'periodImbalanceResult': 'period_imbalance_result',
+    'periodTotalResult': 'period_total_result',
+    'periodTradingResult': 'period_trading_result',
+}
+
+
+def _float(value):
+    """Validate a numeric field once; missing or malformed values become None."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _dict(value):
+    return value if isinstance(value, dict) else {}
+
+
+def battery_mode_from_settings(battery_mode, strategy, self_consumption):
+    """Return a normalized mode string based on battery settings."""
+    battery_mode = (battery_mode or '').upper()
+    strategy = (strategy or '').upper()
+    if battery_mode == 'IMBALANCE_TRADING':
+        if strategy == 'AGGRESSIVE':
+            return 'imbalance_aggressive'
+        else:
+            return 'imbalance'
+    elif self_consumption:
+        return 'self_consumption_plus'
+    return battery_mode.lower() if battery_mode else None
+
+
+@dataclass(frozen=True, slots=True)
+class BatterySettings:
+    battery_mode: str | None = None
+    imbalance_trading_strategy: str | None = None
+    self_consumption_trading_allowed: bool | None = None
+
+    @classmethod
+    def from_dict(cls, data):
+        data = _dict(data)
+        return cls(
+            battery_mode=data.get('batteryMode'),
+            imbalance_trading_strategy=data.get('imbalanceTradingStrategy'),
+            self_consumption_trading_allowed=data.get('selfConsumptionTradingAllowed'),
+        )
+
+    def to_dict(self):
+        return {
+            'batteryMode': self.battery_mode,
+            'imbalanceTradingStrategy': self.imbalance_trading_strategy,
+            'selfConsumptionTradingAllowed': self.self_consumption_trading_allowed,
+        }
+
+    @property
+    def mode(self):
+        return battery_mode_from_settings(
+            self.battery_mode, self.imbalance_trading_strategy, self.self_consumption_trading_allowed
+        )
+
+
+@dataclass(frozen=True, slots=True)
 class Battery:
-    def __init__(self, brand, capacity, created_at, external_reference, id, max_charge_power, max_discharge_power, provider, updated_at):
-        self.brand = brand
-        self.capacity = capacity
-        self.created_at = datetime.fromisoformat(created_at)
-        self.external_reference = external_reference
-        self.id = id
-        self.max_charge_power = max_charge_power
-        self.max_discharge_power = max_discharge_power
-        self.provider = provider
-        self.updated_at = datetime.fromisoformat(updated_at)
+    """Slow-changing smartBattery details."""
+    id: str | None = None
+    brand: str | None = None
+    capacity: float | None = None
+    provider: str | None = None
+    settings: BatterySettings = BatterySettings()
+
+    @classmethod
+    def from_dict(cls, data):
+        data = _dict(data)
+        return cls(
+            id=data.get('id'),
+            brand=data.get('brand'),
+            capacity=_float(data.get('capacity')),
+            provider=data.get('provider'),
+            settings=BatterySettings.from_dict(data.get('settings')),
+        )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'brand': self.brand,
+            'capacity': self.capacity,
+            'provider': self.provider,
+            'settings': self.settings.to_dict(),
+        }
+
+
+@dataclass(frozen=True, slots=True)
+class BatterySummary:
+    """Frequently changing smartBatterySummary values."""
+    state_of_charge: float | None = None
+    status: str | None = None
+    last_update: str | None = None
+    total_result: float | None = None
 
+    @classmethod
+    def from_dict(cls, data):
+        data = _dict(data)
+        return cls(
+            state_of_charge=_float(data.get('lastKnownStateOfCharge')),
+            status=data.get('lastKnownStatus'),
+            last_update=data.get('lastUpdate'),
+            total_result=_float(data.get('totalResult')),
+        )
+
+    def to_dict(self):
+        return {
+            'lastKnownStateOfCharge': self.state_of_charge,
+            'lastKnownStatus': self.status,
+            'lastUpdate': self.last_update,
+            'totalResult': self.total_result,
+        }
+
+
+@dataclass(frozen=True, slots=True)
+class SessionResult:
+    """Result of a single day within smartBatterySessions."""
+    date: str
+    result: float | None = None
+    cumulative_result: float | None = None
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            date=str(data['date'])[:10],
+            result=_float(data.get('result')),
+            cumulative_result=_float(data.get('cumulativeResult')),
+        )
+
+    def to_dict(self):
+        return {'date': self.date, 'result': self.result, 'cumulativeResult': self.cumulative_result}
+
+
+@dataclass(frozen=True, slots=True)
 class BatterySession:
-    def __init__(self, device_id, period_start_date, period_end_date, period_epex_result, period_frank_slim, period_imbalance_result, period_total_result, period_trade_index, period_trading_result, sessions, total_trading_result):
-        self.device_id = device_id
-        self.period_start_date = datetime.fromisoformat(period_start_date)
-        self.period_end_date = datetime.fromisoformat(period_end_date)
-        self.period_epex_result = period_epex_result
-        self.period_frank_slim = period_frank_slim
-        self.period_imbalance_result = period_imbalance_result
-        self.period_total_result = period_total_result
-        self.period_trade_index = period_trade_index
-        self.period_trading_result = period_trading_result
-        self.sessions = sessions
-        self.total_trading_result = total_trading_result
\ No newline at end of file
+    """smartBatterySessions results of one battery over the requested period."""
+    device_id: str | None = None
+    period_start_date: str | None = None
+    period_end_date: str | None = None
+    period_epex_result: float | None = None
+    period_frank_slim: float | None = None
+    period_imbalance_result: float | None = None
+    period_total_result: float | None = None
+    period_trade_index: float | None = None
+    period_trading_result: float | None = None
+    sessions: tuple = ()
+
+    @classmethod
+    def from_dict(cls, data, device_id=None):
+        data = _dict(data)
+        return cls(
+            device_id=data.get('deviceId') or device_id,
+            period_start_date=data.get('periodStartDate'),
+            period_end_date=data.get('periodEndDate'),
+            period_epex_result=_float(data.get('periodEpexResult')),
+            period_frank_slim=_float(data.get('periodFrankSlim')),
+            period_imbalance_result=_float(data.get('periodImbalanceResult')),
+            period_total_result=_float(data.get('periodTotalResult')),
+            period_trade_index=_float(data.get('periodTradeIndex')),
+            period_trading_result=_float(data.get('periodTradingResult')),
+            sessions=tuple(
+                SessionResult.from_dict(session)
+                for session in data.get('sessions') or ()
+                if isinstance(session, dict) and session.get('date')
+            ),
+        )
+
+    def to_dict(self):
+        """Return the smartBatterySessions shape that from_dict parses."""
+        data = {
+            'deviceId': self.device_id,
+            'periodStartDate': self.period_start_date,
+            'periodEndDate': self.period_end_date,
+            'periodTradeIndex': self.period_trade_index,
+            'sessions': [session.to_dict() for session in self.sessions],
+        }
+        for result_key, attribute in RESULT_FIELDS.items():
+            data[result_key] = getattr(self, attribute)
+        return data
+
+    def get_result(self, result_key):
+        """Return a period result by its API field name, e.g. 'periodTotalResult'."""
+        attribute = RESULT_FIELDS.get(result_key)
+        return getattr(self, attribute) if attribute else None
+
+
+@dataclass(frozen=True, slots=True)
+class BatteryData:
+    """Everything fetched for one battery in one refresh; parts that were not fetched are None."""
+    device_id: str
+    session: BatterySession | None = None
+    battery: Battery | None = None
+    summary: BatterySummary | None = None
+
+    def to_dict(self):
+        """Return the per-battery result shape that parse_battery_result parses."""
+        return {
+            'smartBatterySessions': self.session.to_dict() if self.session is not None else None,
+            'smartBattery': self.battery.to_dict() if self.battery is not None else None,
+            'smartBatterySummary': self.summary.to_dict() if self.summary is not None else None,
+        }
+
+
+def parse_battery_result(device_id, result):
+    """Parse the per-battery ``data`` of a batched or concurrent fetch in one pass."""
+    result = _dict(result)
+    session = result.get('smartBatterySessions')
+    battery = result.get('smartBattery')
+    summary = result.get('smartBatterySummary')
+    return BatteryData(
+        device_id=device_id,
+        session=BatterySession.from_dict(session, device_id) if isinstance(session, dict) else None,
+        battery=Battery.from_dict(battery) if isinstance(battery, dict) else None,
+        summary=BatterySummary.from_dict(summary) if isinstance(summary, dict) else None,
+    )
+
+
+def parse_battery_results(results):
+    """Parse the per-battery results keyed by device id into BatteryData models."""
+    return {device_id: parse_battery_result(device_id, result) for device_id, result in (results or {}).items()}
@@ -0,0 +1,80 @@
+import cProfile
+import io
+import os
+import pstats
+import time
+import tracemalloc
+import logging
+from homeassistant.util import dt as dt_util
+
+_LOGGER: logging.Logger = logging.getLogger(__package__)
+
+PROFILE_DIR = "frank_energie_slim_profiles"
+# Frames kept per traced allocation; enough to see which of our calls allocated
+TRACEMALLOC_FRAMES = 10
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 25
+
+
+def _write_report(base_path, profiler, allocations, summary):
+    """Write the raw profile and a readable report; runs in the executor."""
+    os.makedirs(os.path.dirname(base_path), exist_ok=True)
+    profiler.dump_stats(f"{base_path}.prof")
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(TOP_FUNCTIONS)
+    with open(f"{base_path}.txt", "w") as f:
+        f.write("Frank Energie refresh profile\n")
+        for key, value in summary.items():
+            f.write(f"{key}: {value}\n")
+        f.write(f"\nTop {TOP_ALLOCATIONS} allocations during the refresh\n")
+        for stat in allocations:
+            f.write(f"{stat}\n")
+        f.write(f"\nTop {TOP_FUNCTIONS} functions by cumulative time\n")
+        f.write(stream.getvalue())
+
+
+async def async_profile_refresh(hass, entry_id, refresh):
+    """Run refresh() under cProfile and tracemalloc and write the results to the config dir.
+
+    The profile covers the event loop thread while the refresh runs, so other
+    work on the loop in that time shows up as well. Returns a summary with the
+    paths of the written .prof and .txt files.
+    """
+    base_path = hass.config.path(
+        PROFILE_DIR, f"refresh-{entry_id}-{dt_util.utcnow().strftime('%Y%m%dT%H%M%SZ')}"
+    )
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    tracemalloc.reset_peak()
+    before = tracemalloc.take_snapshot()
+    profiler = cProfile.Profile()
+    error = None
+    started = time.perf_counter()
+    profiler.enable()
+    try:
+        await refresh()
+    except Exception as e:
+        error = e
+    finally:
+        profiler.disable()
+        duration = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        after = tracemalloc.take_snapshot()
+        if not was_tracing:
+            tracemalloc.stop()
+    allocations = after.compare_to(before, "lineno")[:TOP_ALLOCATIONS]
+    summary = {
+        "entry_id": entry_id,
+        "duration": round(duration, 3),
+        "peak_memory_kib": round(peak / 1024, 1),
+        "allocated_kib": round(sum(stat.size_diff for stat in allocations if stat.size_diff > 0) / 1024, 1),
+        "function_calls": sum(stat[1] for stat in pstats.Stats(profiler).stats.values()),
+        "error": repr(error) if error is not None else None,
+        "profile": f"{base_path}.prof",
+        "report": f"{base_path}.txt",
+    }
+    await hass.async_add_executor_job(_write_report, base_path, profiler, allocations, summary)
+    _LOGGER.info("Profiled refresh of entry %s in %.2fs, report written to %s", entry_id, duration, summary["report"])
+    return summary
@@ -0,0 +1,128 @@
+import asyncio
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+import logging
+
+from .api import DEFAULT_MAX_CONCURRENCY
+from .models import BatterySession
+
+_LOGGER: logging.Logger = logging.getLogger(__package__)
+
+# Longest date range of one sessions request; a year in one response is slow and can time out
+MAX_RANGE_DAYS = 31
+# Battery-days per batched request, e.g. a month for four batteries or a week for seventeen
+MAX_BATCH_BATTERY_DAYS = 124
+# Upper bound for a single range request, including rate limiting and retries
+RANGE_FETCH_TIMEOUT = 30
+
+
+@dataclass(frozen=True, slots=True)
+class RangeRequest:
+    """One sessions request: a date range for one or more batteries."""
+    start: date
+    end: date
+    device_ids: tuple
+
+
+@dataclass(slots=True)
+class DeviceSessions:
+    """The merged per-day sessions of one battery, ordered by date, and the ranges that failed."""
+    device_id: str
+    sessions: list = field(default_factory=list)
+    failed_ranges: list = field(default_factory=list)
+    error: Exception | None = None
+
+    @property
+    def first_gap(self):
+        """Return the first day that could not be fetched, or None."""
+        return min(start for start, _ in self.failed_ranges) if self.failed_ranges else None
+
+
+def plan_ranges(start, end, held_days=(), max_days=MAX_RANGE_DAYS):
+    """Split start through end into ranges of at most max_days days, leaving out held_days."""
+    ranges = []
+    range_start = None
+    day = start
+    while day <= end:
+        if day in held_days:
+            if range_start is not None:
+                ranges.append((range_start, day - timedelta(days=1)))
+                range_start = None
+        elif range_start is None:
+            range_start = day
+        elif (day - range_start).days >= max_days:
+            ranges.append((range_start, day - timedelta(days=1)))
+            range_start = day
+        day += timedelta(days=1)
+    if range_start is not None:
+        ranges.append((range_start, end))
+    return ranges
+
+
+def plan_requests(ranges_by_device, max_battery_days=MAX_BATCH_BATTERY_DAYS):
+    """Group the batteries that need the same range into batched requests.
+
+    A request holds as many batteries as fit in max_battery_days, so a long
+    range is fetched per battery and a short one for many batteries at once.
+    """
+    by_range = {}
+    for device_id, ranges in ranges_by_device.items():
+        for date_range in ranges:
+            by_range.setdefault(date_range, []).append(device_id)
+    requests = []
+    for (start, end), device_ids in sorted(by_range.items()):
+        per_request = max(1, max_battery_days // ((end - start).days + 1))
+        for index in range(0, len(device_ids), per_request):
+            requests.append(RangeRequest(start, end, tuple(device_ids[index:index + per_request])))
+    return requests
+
+
+async def _async_fetch_request(client, request):
+    """Return the smartBatterySessions per battery of one request; None for a battery that failed server-side."""
+    if len(request.device_ids) == 1:
+        device_id = request.device_ids[0]
+        response = await client.get_smart_battery_sessions(device_id, request.start, request.end)
+        data = response.get('data') if isinstance(response, dict) else None
+        return {device_id: (data or {}).get('smartBatterySessions')}
+    results = await client.get_smart_battery_batch(
+        list(request.device_ids), request.start, request.end, include_details=False, include_summary=False
+    )
+    return {device_id: (results.get(device_id) or {}).get('smartBatterySessions') for device_id in request.device_ids}
+
+
+async def async_fetch_session_ranges(client, ranges_by_device, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                                     timeout=RANGE_FETCH_TIMEOUT, max_battery_days=MAX_BATCH_BATTERY_DAYS):
+    """Fetch the ranges of every battery with at most max_concurrency requests in flight.
+
+    Every request still passes the client's rate limiter. Returns a
+    DeviceSessions per battery with the sessions of all its ranges merged in
+    date order. A failed request only marks its own ranges as failed;
+    authentication errors are raised.
+    """
+    requests = plan_requests(ranges_by_device, max_battery_days)
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def fetch(request):
+        async with semaphore:
+            return await asyncio.wait_for(_async_fetch_request(client, request), timeout)
+
+    responses = await asyncio.gather(*(fetch(request) for request in requests), return_exceptions=True)
+    results = {device_id: DeviceSessions(device_id) for device_id in ranges_by_device}
+    for request, response in zip(requests, responses):
+        if isinstance(response, Exception) and str(response) == "Authentication required":
+            raise response
+        for device_id in request.device_ids:
+            result = results[device_id]
+            sessions = None if isinstance(response, Exception) else response.get(device_id)
+            if not isinstance(sessions, dict):
+                result.failed_ranges.append((request.start, request.end))
+                result.error = response if isinstance(response, Exception) else Exception("No sessions returned")
+                continue
+            result.sessions.extend(BatterySession.from_dict(sessions, device_id).sessions)
+    for result in results.values():
+        # Ranges do not overlap, so ordering by day is enough to merge them
+        result.sessions.sort(key=lambda session: session.date)
+        if result.failed_ranges:
+            _LOGGER.debug("Fetching %d range(s) of battery %s failed: %r",
+                          len(result.failed_ranges), result.device_id, result.error)
+    return results
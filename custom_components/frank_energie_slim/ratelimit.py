@@ -0,0 +1,142 @@
+import asyncio
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+import logging
+
+_LOGGER: logging.Logger = logging.getLogger(__package__)
+
+# Requests per second and burst size shared by all clients of the GraphQL endpoint
+DEFAULT_RATE = 10.0
+DEFAULT_BURST = 20
+# HTTP statuses worth retrying: rate limited by the CDN or a transient server error
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+RETRY_ATTEMPTS = 4
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 8.0
+
+# Monotonic deadline of the current refresh cycle, see request_deadline()
+_deadline = ContextVar("frank_energie_slim_deadline", default=None)
+
+
+class TransientError(Exception):
+    """A request failure that is worth retrying, e.g. HTTP 429/5xx or a dropped connection."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value):
+    """Return the Retry-After header in seconds; HTTP dates are ignored."""
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+@contextmanager
+def request_deadline(seconds):
+    """Limit rate limiting waits, retries and request timeouts in this context to seconds from now.
+
+    The deadline follows the context into tasks created within it; a nested
+    deadline never extends an outer one.
+    """
+    deadline = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(deadline if outer is None else min(outer, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_time():
+    """Seconds left until the current deadline, or None without a deadline."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def _fits_deadline(wait):
+    remaining = remaining_time()
+    return remaining is None or wait < remaining
+
+
+class TokenBucket:
+    """Token bucket rate limiter, shared by all clients on the event loop."""
+
+    def __init__(self, rate=DEFAULT_RATE, capacity=DEFAULT_BURST, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = float(capacity)
+        self._updated = clock()
+
+    def reserve(self):
+        """Take a token and return the seconds to wait before it may be used."""
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self._tokens -= 1
+        return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def refund(self):
+        self._tokens = min(self.capacity, self._tokens + 1)
+
+    def _reserve_within_deadline(self):
+        wait = self.reserve()
+        if not _fits_deadline(wait):
+            self.refund()
+            raise asyncio.TimeoutError("Refresh deadline exceeded while rate limited")
+        return wait
+
+    async def acquire(self):
+        wait = self._reserve_within_deadline()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter for transient errors."""
+
+    def __init__(self, attempts=RETRY_ATTEMPTS, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, retry, retry_after=None):
+        """Return the delay before the given retry (0-based), honouring a Retry-After hint."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** retry)))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def _next_delay(self, retry, error):
+        """Return the delay before retrying error, or None when it should be raised."""
+        if retry + 1 >= self.attempts:
+            return None
+        delay = self.backoff(retry, error.retry_after)
+        if not _fits_deadline(delay):
+            return None
+        _LOGGER.debug("Transient error %r, retrying in %.1fs", error, delay)
+        return delay
+
+    async def async_call(self, func, limiter=None):
+        """Await func(), rate limited and retried on TransientError."""
+        retry = 0
+        while True:
+            if limiter is not None:
+                await limiter.acquire()
+            try:
+                return await func()
+            except TransientError as e:
+                delay = self._next_delay(retry, e)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            retry += 1
+
+
+# Shared by every client in the process, so restarts with several entries stay under the CDN's limits
+GRAPHQL_RATE_LIMITER = TokenBucket()
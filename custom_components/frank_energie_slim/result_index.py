@@ -0,0 +1,126 @@
+from array import array
+from dataclasses import dataclass
+from datetime import date
+
+# Period results are sums of many floats; rounding hides the accumulated float noise
+PERIOD_DIGITS = 4
+
+
+@dataclass(frozen=True, slots=True)
+class PeriodResults:
+    """Month-to-date, year-to-date and all-time sum of one result field."""
+    month: float = 0.0
+    year: float = 0.0
+    all_time: float = 0.0
+
+    def __add__(self, other):
+        return PeriodResults(
+            round(self.month + other.month, PERIOD_DIGITS),
+            round(self.year + other.year, PERIOD_DIGITS),
+            round(self.all_time + other.all_time, PERIOD_DIGITS),
+        )
+
+
+class PrefixSumSeries:
+    """Per-day values of one series, stored as running sums from its first day.
+
+    Changing the last day, which is what every refresh does, is O(1); an
+    earlier day costs one pass over the days after it. The sum over any range
+    of days is the difference of two running sums. Days without a value count
+    as 0.
+    """
+    __slots__ = ('first', 'sums')
+
+    def __init__(self):
+        # Ordinal of the first day; sums[i] is the sum of all days up to and including first + i
+        self.first = None
+        self.sums = array('d')
+
+    def __len__(self):
+        return len(self.sums)
+
+    def get(self, day):
+        if self.first is None:
+            return 0.0
+        index = day.toordinal() - self.first
+        if index < 0 or index >= len(self.sums):
+            return 0.0
+        return self.sums[index] - (self.sums[index - 1] if index else 0.0)
+
+    def add(self, day, delta):
+        ordinal = day.toordinal()
+        if self.first is None:
+            self.first = ordinal
+        elif ordinal < self.first:
+            # Earlier days are only added by a backfill; they start at 0
+            self.sums = array('d', bytes(8 * (self.first - ordinal))) + self.sums
+            self.first = ordinal
+        index = ordinal - self.first
+        sums = self.sums
+        if index >= len(sums):
+            sums.extend([sums[-1] if sums else 0.0] * (index + 1 - len(sums)))
+        for i in range(index, len(sums)):
+            sums[i] += delta
+
+    def set(self, day, value):
+        """Set the value of day; returns the change of the series' sums."""
+        delta = value - self.get(day)
+        if delta:
+            self.add(day, delta)
+        return delta
+
+    def sum(self, start=None, end=None):
+        """Return the sum over the days from start through end, both optional and inclusive."""
+        if self.first is None:
+            return 0.0
+        last = len(self.sums) - 1
+        end_index = last if end is None else min(last, end.toordinal() - self.first)
+        start_index = 0 if start is None else max(0, start.toordinal() - self.first)
+        if end_index < 0 or start_index > end_index:
+            return 0.0
+        return self.sums[end_index] - (self.sums[start_index - 1] if start_index else 0.0)
+
+
+class ResultIndex:
+    """Per-day results of each battery and result field, with a running total per field.
+
+    Setting a battery's value also moves the total of its field by the same
+    difference, so the totals never have to be summed over the batteries.
+    """
+
+    def __init__(self):
+        # (device_id, result_key) -> PrefixSumSeries; device_id None holds the totals
+        self._series = {}
+
+    def __len__(self):
+        return len(self._series)
+
+    def _get_series(self, device_id, result_key):
+        series = self._series.get((device_id, result_key))
+        if series is None:
+            series = self._series[(device_id, result_key)] = PrefixSumSeries()
+        return series
+
+    def set(self, device_id, result_key, day, value):
+        delta = self._get_series(device_id, result_key).set(day, value or 0.0)
+        if delta:
+            self._get_series(None, result_key).add(day, delta)
+
+    def periods(self, device_id, result_key, today):
+        """Return the PeriodResults through today of a battery, or of the totals when device_id is None."""
+        series = self._series.get((device_id, result_key))
+        if series is None:
+            return PeriodResults()
+        return PeriodResults(
+            round(series.sum(date(today.year, today.month, 1), today), PERIOD_DIGITS),
+            round(series.sum(date(today.year, 1, 1), today), PERIOD_DIGITS),
+            round(series.sum(None, today), PERIOD_DIGITS),
+        )
+
+    def period_results(self, device_ids, result_keys, today):
+        """Return {(device_id, result_key): PeriodResults} for the batteries and the totals."""
+        return {
+            (device_id, result_key): self.periods(device_id, result_key, today)
+            for device_id in [*device_ids, None]
+            for result_key in result_keys
+        }
@@ -0,0 +1,97 @@
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from statistics import median
+
+DEFAULT_INTERVAL = timedelta(minutes=5)
+MIN_INTERVAL = timedelta(minutes=1)
+MAX_INTERVAL = timedelta(minutes=30)
+# Delay after the predicted publish time, to allow for clock skew and processing on Frank's side
+PUBLISH_GRACE = timedelta(seconds=30)
+# Number of consecutive polls with flat mode and SoC before backing off
+QUIET_THRESHOLD = 3
+# Cap on the backoff exponent; the delay is clamped to max_interval anyway
+MAX_BACKOFF_EXPONENT = 10
+
+
+def parse_last_update(value):
+    """Parse an ISO8601 lastUpdate string into an aware datetime, or None."""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        try:
+            parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+class AdaptivePollScheduler:
+    """Learns Frank's publishing cadence from lastUpdate changes and picks the next poll time.
+
+    Polls land just after the predicted next publish. When a predicted publish
+    does not show up, or mode and state of charge stay flat, the interval backs
+    off exponentially up to max_interval.
+    """
+
+    def __init__(self, default_interval=DEFAULT_INTERVAL, min_interval=MIN_INTERVAL,
+                 max_interval=MAX_INTERVAL, grace=PUBLISH_GRACE, history_size=24):
+        self.default_interval = default_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.grace = grace
+        self._publishes = deque(maxlen=history_size)
+        self._last_state = None
+        self._missed_polls = 0
+        self._quiet_polls = 0
+
+    @property
+    def last_publish(self):
+        return self._publishes[-1] if self._publishes else None
+
+    @property
+    def cadence(self):
+        """Median interval between observed publishes, or None without enough history."""
+        intervals = [
+            later - earlier
+            for earlier, later in zip(self._publishes, list(self._publishes)[1:])
+            if later > earlier
+        ]
+        return median(intervals) if intervals else None
+
+    def record(self, last_update, state=None):
+        """Record the outcome of a poll.
+
+        last_update is the most recent smartBatterySummary.lastUpdate across all
+        batteries, state a hashable snapshot of the values that matter (mode, SoC).
+        """
+        published = parse_last_update(last_update)
+        if published is not None and (self.last_publish is None or published > self.last_publish):
+            self._publishes.append(published)
+            self._missed_polls = 0
+        else:
+            self._missed_polls += 1
+        if state is not None and state == self._last_state:
+            self._quiet_polls += 1
+        else:
+            self._quiet_polls = 0
+        self._last_state = state
+
+    def next_delay(self, now):
+        """Return the timedelta to wait before the next poll."""
+        cadence = self.cadence
+        if cadence is None:
+            delay = self.default_interval
+        elif self._missed_polls:
+            # The predicted publish did not happen: Frank is quiet, back off
+            delay = self.min_interval * (2 ** min(self._missed_polls, MAX_BACKOFF_EXPONENT))
+        else:
+            predicted = self.last_publish + cadence
+            while predicted + self.grace <= now:
+                predicted += cadence
+            delay = predicted + self.grace - now
+        if self._quiet_polls >= QUIET_THRESHOLD:
+            backoff = (cadence or self.default_interval) * (2 ** min(self._quiet_polls - QUIET_THRESHOLD + 1, MAX_BACKOFF_EXPONENT))
+            delay = max(delay, backoff)
+        return max(self.min_interval, min(delay, self.max_interval))
@@ -1,19 +1,35 @@
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.core import HomeAssistant
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.helpers.event import async_track_time_interval
-from .api import FrankEnergie
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+from homeassistant.util import dt as dt_util
+from homeassistant.helpers.aiohttp_client import async_create_clientsession, async_get_clientsession
+from homeassistant.helpers import device_registry as dr, entity_registry as er
+from .api import AsyncFrankEnergie
+from .tokens import get_token_store
+from .snapshot import SnapshotStore
+from .scheduler import AdaptivePollScheduler
+from .coordinator import EntrySnapshot, FrankEnergieCoordinator
+from .models import battery_mode_from_settings
 from .entities import (
     FrankEnergieBatterySessionResultSensor,
+    FrankEnergieBatteryPeriodResultSensor,
     FrankEnergieTotalResultSensor,
+    FrankEnergieTotalPeriodResultSensor,
     FrankEnergieBatteryModeSensor,
     FrankEnergieBatteryStateOfChargeSensor,
     FrankEnergieTotalAvgSocSensor,
     FrankEnergieTotalLastModeSensor,
     FrankEnergieTotalLastUpdateSensor,
+    FrankEnergieApiCallsTodaySensor,
+    FrankEnergieRefreshDurationSensor,
+    FLEET_DEVICE_INFO,
+    PERIODS,
+    entry_totals_device_info,
+    total_unique_id,
 )
-from datetime import datetime, timedelta
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import logging
 
 _LOGGER: logging.Logger = logging.getLogger(__package__)
@@ -26,251 +42,336 @@ RESULT_SENSOR_MAP = {
     'periodTradingResult': 'brutoresultaat',
     'periodTotalResult': 'nettoresultaat',
 }
-SESSION_RESULT_KEYS = list(RESULT_SENSOR_MAP.keys())
+# Totals unique ids that were not yet scoped to their config entry and collided between accounts
+LEGACY_TOTAL_NAMES = [f"{suffix}_total" for suffix in RESULT_SENSOR_MAP.values()] + [
+    'average_soc', 'total_last_mode', 'total_last_update',
+]
 
 @dataclass
 class BatteryEntityGroup:
     mode_sensor: object
     soc_sensor: object
     result_sensors: list
+    period_sensors: list = field(default_factory=list)
+
+    @property
+    def entities(self):
+        return [self.mode_sensor, self.soc_sensor] + self.result_sensors + self.period_sensors
+
+@dataclass
+class TotalEntityGroup:
+    result_sensors: list
+    avg_soc_sensor: object
+    last_mode_sensor: object
+    last_update_sensor: object
+    period_sensors: list = field(default_factory=list)
+
+    @property
+    def entities(self):
+        return self.result_sensors + [self.avg_soc_sensor, self.last_mode_sensor, self.last_update_sensor] + self.period_sensors
+
+def create_battery_entity_group(coordinator, device_id, period_sensors=False):
+    """Create the mode, state of charge and result sensors of one battery, optionally with period results."""
+    return BatteryEntityGroup(
+        FrankEnergieBatteryModeSensor(coordinator, device_id),
+        FrankEnergieBatteryStateOfChargeSensor(coordinator, device_id),
+        [
+            FrankEnergieBatterySessionResultSensor(coordinator, device_id, result_key, suffix)
+            for result_key, suffix in RESULT_SENSOR_MAP.items()
+        ],
+        [
+            FrankEnergieBatteryPeriodResultSensor(coordinator, device_id, result_key, suffix, period)
+            for result_key, suffix in RESULT_SENSOR_MAP.items()
+            for period in PERIODS
+        ] if period_sensors else [],
+    )
+
+def create_total_entity_group(coordinator, scope=None, device_info=None, object_prefix=None, period_sensors=False):
+    """Create the result totals and avg soc/last mode/last update sensors of one totals device."""
+    return TotalEntityGroup(
+        [
+            FrankEnergieTotalResultSensor(coordinator, result_key, suffix, scope, device_info, object_prefix)
+            for result_key, suffix in RESULT_SENSOR_MAP.items()
+        ],
+        FrankEnergieTotalAvgSocSensor(coordinator, scope, device_info, object_prefix),
+        FrankEnergieTotalLastModeSensor(coordinator, scope, device_info, object_prefix),
+        FrankEnergieTotalLastUpdateSensor(coordinator, scope, device_info, object_prefix),
+        [
+            FrankEnergieTotalPeriodResultSensor(coordinator, result_key, suffix, period, scope, device_info, object_prefix)
+            for result_key, suffix in RESULT_SENSOR_MAP.items()
+            for period in PERIODS
+        ] if period_sensors else [],
+    )
+
+def migrate_total_unique_id(unique_id, entry_id):
+    """Return the entry-scoped unique id for a legacy totals unique id, or None."""
+    for name in LEGACY_TOTAL_NAMES:
+        if unique_id == total_unique_id(name):
+            return total_unique_id(name, entry_id)
+    return None
+
+async def async_migrate_total_unique_ids(hass, entry):
+    """Move this entry's legacy totals entities and device to entry-scoped ids."""
+    def _migrate(entity_entry):
+        new_unique_id = migrate_total_unique_id(entity_entry.unique_id, entry.entry_id)
+        return {"new_unique_id": new_unique_id} if new_unique_id else None
+
+    await er.async_migrate_entries(hass, entry.entry_id, _migrate)
+    device_registry = dr.async_get(hass)
+    legacy_device = device_registry.async_get_device(identifiers=FrankEnergieTotalResultSensor.TOTALS_DEVICE_INFO["identifiers"])
+    if legacy_device is not None and entry.entry_id in legacy_device.config_entries:
+        device_registry.async_update_device(legacy_device.id, remove_config_entry_id=entry.entry_id)
 
 def get_battery_mode_from_settings(settings):
-    """Return a normalized mode string based on battery settings."""
-    battery_mode = (settings.get('batteryMode') or '').upper()
-    strategy = (settings.get('imbalanceTradingStrategy') or '').upper()
-    self_consumption = settings.get('selfConsumptionTradingAllowed')
-    if battery_mode == 'IMBALANCE_TRADING':
-        if strategy == 'AGGRESSIVE':
-            return 'imbalance_aggressive'
-        else:
-            return 'imbalance'
-    elif self_consumption:
-        return 'self_consumption_plus'
-    return battery_mode.lower() if battery_mode else None
+    """Return a normalized mode string based on a raw battery settings dict."""
+    return battery_mode_from_settings(
+        settings.get('batteryMode'),
+        settings.get('imbalanceTradingStrategy'),
+        settings.get('selfConsumptionTradingAllowed'),
+    )
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback):
-    """Set up the Frank Energie integration and sensors."""
+    """Set up the Frank Energie integration and sensors.
+
+    Entities are registered right away from the snapshot of the previous run;
+    login, battery discovery and the first refresh run in the background, so
+    Home Assistant's startup does not wait for the Frank Energie API.
+    """
     _LOGGER.info("Setting up Frank Energie entry")
     username = entry.data.get("username")
     password = entry.data.get("password")
-    client = FrankEnergie()
-    await hass.async_add_executor_job(client.login, username, password)
-    data = await hass.async_add_executor_job(client.get_smart_batteries)
-    batteries = data['data']['smartBatteries']
-    # Log battery discovery summary and handle no-battery case
-    if not batteries:
-        _LOGGER.error("No smart batteries were found. No battery sensors will be created. Please verify your Frank Energie account and configuration.")
+    await async_migrate_total_unique_ids(hass, entry)
+    # Reuse the tokens of the config flow or the previous run; the password is only used when they are rejected
+    token_store = get_token_store(hass)
+    tokens = await token_store.async_get(username) or {}
+
+    def _save_tokens(auth):
+        token_store.async_update(username, auth)
+
+    get_requests = entry.options.get("get_requests", False)
+    fleet = None
+    if entry.options.get("fleet_mode", False):
+        # Fleet mode: clients come from a process-wide pool on Home Assistant's shared session
+        from .fleet import get_fleet
+        fleet = get_fleet(hass, async_get_clientsession(hass))
+        client = fleet.clients.acquire(username, password, tokens, _save_tokens, get_requests)
+
+        def _leave_fleet():
+            fleet.clients.release(username)
+            successor = fleet.leave(entry.entry_id)
+            if successor is not None:
+                # Reload the next entry so it takes over the fleet totals
+                hass.async_create_task(hass.config_entries.async_reload(successor))
+
+        entry.async_on_unload(_leave_fleet)
     else:
-        _LOGGER.info("Discovered %d smart battery(ies)", len(batteries))
+        # One pooled keep-alive session per config entry, closed when the entry unloads
+        client = AsyncFrankEnergie(async_create_clientsession(hass), tokens.get('authToken'), tokens.get('refreshToken'),
+                                   get_requests=get_requests)
+        client.set_credentials(username, password)
+        client.token_listener = _save_tokens
+
+    # Warm start: the batteries and values of the previous run
+    snapshot = SnapshotStore(hass, entry.entry_id)
+    saved_at, restored_data = await snapshot.async_load()
+    coordinator = FrankEnergieCoordinator(hass, entry, client, snapshot, restored_data, saved_at)
+    if restored_data:
+        _LOGGER.info("Restored %d smart battery(ies) from the last snapshot", len(coordinator.device_ids))
     entities = []
-    battery_ids = []
-    battery_details = []
-    battery_entity_groups = []
-
-    # Create total result sensors only once (not per battery)
-    total_entities = [
-        FrankEnergieTotalResultSensor(hass, result_key, suffix)
-        for result_key, suffix in RESULT_SENSOR_MAP.items()
-    ]
-
-    for battery in batteries:
-        battery_ids.append(battery['id'])
-        # Fetch battery details
-        details_data = await hass.async_add_executor_job(client.get_smart_battery_details, battery['id'])
-        details = details_data['data']
-        battery_details.append(details)
-        today = datetime.now()
-        _LOGGER.info("Discovered battery with id: %s, queuing data retrieval for %s", battery.get('id'), today.strftime('%Y-%m-%d'))
-        session_data = await hass.async_add_executor_job(
-            client.get_smart_battery_sessions, battery['id'], today, today
-        )
-        # Safely parse session data; API may return data=None
-        data_field = session_data.get('data') if isinstance(session_data, dict) else None
-        session = (data_field or {}).get('smartBatterySessions') or {}
-        if not session:
-            _LOGGER.warning("Missing 'smartBatterySessions' in response: %s", session_data)
-        # Ensure we always have a deviceId for stable entity IDs
-        if not session.get('deviceId'):
-            _LOGGER.error("Session data missing 'deviceId', skipping this battery")
-            continue
-        # Extract mode and stateOfCharge
-        smart_battery = details.get('smartBattery', {})
-        summary = details.get('smartBatterySummary', {})
-        settings = smart_battery.get('settings', {})
-        # Determine mode using helper function
-        mode = get_battery_mode_from_settings(settings)
-        state_of_charge = summary.get('lastKnownStateOfCharge')
-        # Create sensors
-        mode_sensor = FrankEnergieBatteryModeSensor(hass, battery['id'], mode, details)
-        soc_sensor = FrankEnergieBatteryStateOfChargeSensor(hass, battery['id'], state_of_charge, details)
-        result_sensors = [
-            FrankEnergieBatterySessionResultSensor(hass, session, result_key, suffix, details)
-            for result_key, suffix in RESULT_SENSOR_MAP.items()
-        ]
-        group = BatteryEntityGroup(mode_sensor, soc_sensor, result_sensors)
-        battery_entity_groups.append(group)
-        entities.extend([mode_sensor, soc_sensor] + result_sensors)
+    battery_entity_groups = {}
+    # Optional month-to-date, year-to-date and all-time results from the local result index
+    period_sensors = entry.options.get("period_sensors", False)
+    coordinator.track_periods = period_sensors
+
+    # Create total sensors only once per entry (not per battery)
+    totals_device_info = entry_totals_device_info(entry.entry_id, username)
+    totals = create_total_entity_group(coordinator, entry.entry_id, totals_device_info, period_sensors=period_sensors)
 
-    # Add total result sensors only once
-    entities.extend(total_entities)
+    # Optional deadbands: smaller movements are not written to the state machine
+    soc_deadband = entry.options.get("soc_deadband", 0)
+    result_deadband = entry.options.get("result_deadband", 0)
 
-    # Add total avg soc, last mode, and last update sensors
-    total_avg_soc_entity = FrankEnergieTotalAvgSocSensor(hass)
-    total_last_mode_entity = FrankEnergieTotalLastModeSensor(hass)
-    total_last_update_entity = FrankEnergieTotalLastUpdateSensor(hass)
-    entities.extend([total_avg_soc_entity, total_last_mode_entity, total_last_update_entity])
+    def apply_deadbands(new_entities):
+        for entity in new_entities:
+            if isinstance(entity, (FrankEnergieBatteryStateOfChargeSensor, FrankEnergieTotalAvgSocSensor)):
+                entity._deadband = soc_deadband
+            elif isinstance(entity, (
+                FrankEnergieBatterySessionResultSensor, FrankEnergieTotalResultSensor,
+                FrankEnergieBatteryPeriodResultSensor, FrankEnergieTotalPeriodResultSensor,
+            )):
+                entity._deadband = result_deadband
+
+    def add_battery(device_id):
+        """Create the entities of one battery in the coordinator's snapshot; returns the new entities."""
+        group = battery_entity_groups[device_id] = create_battery_entity_group(coordinator, device_id, period_sensors)
+        apply_deadbands(group.entities)
+        return group.entities
+
+    for device_id in coordinator.device_ids:
+        entities.extend(add_battery(device_id))
+
+    # Add total sensors only once
+    entities.extend(totals.entities)
+    # Optional diagnostic sensors of the refreshes themselves
+    if entry.options.get("diagnostic_sensors", False):
+        entities.extend([
+            FrankEnergieRefreshDurationSensor(coordinator, entry.entry_id, totals_device_info),
+            FrankEnergieApiCallsTodaySensor(coordinator, entry.entry_id, totals_device_info),
+        ])
+
+    # One entry in the fleet also carries the totals across all accounts
+    fleet_coordinator = None
+    if fleet is not None and fleet.claim_totals(entry.entry_id):
+        def fleet_snapshot(battery_data):
+            return EntrySnapshot.from_battery_data(battery_data, periods=fleet.period_totals())
+
+        async def async_update_fleet():
+            """Refresh the whole fleet, e.g. when a fleet total is updated on request."""
+            await fleet.async_refresh()
+            return fleet_snapshot(fleet.all_battery_data())
+
+        fleet_coordinator = DataUpdateCoordinator(
+            hass, _LOGGER, name="Frank Energie fleet", update_method=async_update_fleet
+        )
+        fleet_coordinator.data = EntrySnapshot.from_battery_data(fleet.all_battery_data())
+        fleet_totals = create_total_entity_group(
+            fleet_coordinator, "fleet", FLEET_DEVICE_INFO, "fleet", period_sensors=period_sensors
+        )
+        entities.extend(fleet_totals.entities)
+    apply_deadbands(entities)
 
     for entity in entities:
         unique_id = getattr(entity, '_attr_unique_id', None)
         _LOGGER.info(f"Registered entity with unique_id: {unique_id} and entity_id: {getattr(entity, 'entity_id', None)}")
 
-    async_add_entities(entities, update_before_add=True)
+    async_add_entities(entities)
+
+    def batteries_added(device_ids):
+        """Add the entities of batteries found by discovery."""
+        new_entities = []
+        for device_id in device_ids:
+            new_entities.extend(add_battery(device_id))
+        entities.extend(new_entities)
+        async_add_entities(new_entities)
+
+    def battery_removed(device_id):
+        """Remove the entities of a battery that is no longer part of the account."""
+        group = battery_entity_groups.pop(device_id, None)
+        if group is None:
+            return
+        registry = er.async_get(hass)
+        for entity in group.entities:
+            if entity in entities:
+                entities.remove(entity)
+            if registry.async_get(entity.entity_id) is not None:
+                registry.async_remove(entity.entity_id)
+
+    coordinator.batteries_added = batteries_added
+    coordinator.battery_removed = battery_removed
+
+    # Local per-day session history: backfilled once, then only unsettled days are synced.
+    # Imported here so sqlite3 and the recorder helpers stay out of the platform's import path.
+    from .history import HISTORY_DB_FILENAME, SessionHistoryStore, SessionHistorySync
+    from .long_term_statistics import async_import_statistics
+    history_store = SessionHistoryStore(hass.config.path(HISTORY_DB_FILENAME))
+    history = SessionHistorySync(hass, client, history_store)
+
+    async def _async_close_history():
+        await hass.async_add_executor_job(history_store.close)
+
+    entry.async_on_unload(_async_close_history)
+
+    async def _async_sync_history(device_ids):
+        """Sync the session history when due and push new days to long-term statistics."""
+        synced_from = await history.async_sync_if_due(device_ids)
+        if synced_from is not None:
+            if coordinator.track_periods:
+                await coordinator.async_fold_history(synced_from)
+            await async_import_statistics(hass, history_store, device_ids)
+
+    coordinator.history = history
+    coordinator.async_sync_history = _async_sync_history
 
     # Store for periodic update
     hass.data.setdefault("frank_energie_slim", {})[entry.entry_id] = {
         "client": client,
-        "battery_ids": battery_ids,
+        "coordinator": coordinator,
         "entities": entities,
-        "total_entities": total_entities,
-        "battery_details": battery_details,
-        "username": username,
-        "password": password,
+        "total_entities": totals.result_sensors,
+        "history": history_store,
+        "fleet": fleet,
+        "refresh_status": coordinator.refresh_status,
+        "details_cache": coordinator.details_cache,
     }
 
-    def calc_avg_soc_and_last_mode(socs, modes):
-        """Calculate average state of charge and last mode from lists."""
-        avg_soc = sum([s for s in socs if s is not None]) / len([s for s in socs if s is not None]) if socs else None
-        last_mode = modes[-1] if modes else None
-        return avg_soc, last_mode
-
-    async def fetch_battery_data(fetch_details=True):
-        """Fetch session, mode, and state of charge for all batteries."""
-        sessions, modes, socs = [], [], []
-        new_battery_details = []  # Collect fresh details if fetch_details is True
-        for i, battery_id in enumerate(battery_ids):
-            today = datetime.now()
-            try:
-                session_data = await hass.async_add_executor_job(
-                    client.get_smart_battery_sessions, battery_id, today, today
-                )
-                if fetch_details:
-                    details_data = await hass.async_add_executor_job(client.get_smart_battery_details, battery_id)
-                    details = details_data['data']
-                    new_battery_details.append(details)
-                else:
-                    details = battery_details[i]
-            except Exception as e:
-                if str(e) == "Authentication required":
-                    _LOGGER.info("Authentication token expired, attempting to re-authenticate")
-                    # Get credentials from stored data
-                    for entry_id, data in hass.data["frank_energie_slim"].items():
-                        if data.get("client") == client:
-                            username = data.get("username")
-                            password = data.get("password")
-                            break
-                    else:
-                        _LOGGER.error("Could not find credentials for re-authentication")
-                        raise
-
-                    # Re-authenticate
-                    await hass.async_add_executor_job(client.login, username, password)
-
-                    # Retry the operation
-                    session_data = await hass.async_add_executor_job(
-                        client.get_smart_battery_sessions, battery_id, today, today
-                    )
-                    if fetch_details:
-                        details_data = await hass.async_add_executor_job(client.get_smart_battery_details, battery_id)
-                        details = details_data['data']
-                        new_battery_details.append(details)
-                    else:
-                        details = battery_details[i]
-                else:
-                    # Re-raise if it's not an authentication error
-                    raise
-            smart_battery = details.get('smartBattery', {})
-            summary = details.get('smartBatterySummary', {})
-            settings = smart_battery.get('settings', {})
-            # Determine mode using helper function
-            mode = get_battery_mode_from_settings(settings)
-            state_of_charge = summary.get('lastKnownStateOfCharge')
-            modes.append(mode)
-            socs.append(state_of_charge)
-            # Safely parse session data; API may return data=None
-            data_field = session_data.get('data') if isinstance(session_data, dict) else None
-            if not isinstance(data_field, dict) or 'smartBatterySessions' not in data_field or data_field.get('smartBatterySessions') is None:
-                _LOGGER.warning(f"Missing 'smartBatterySessions' in response for battery {battery_id}: {session_data}")
-                session = {}
-            else:
-                session = data_field.get('smartBatterySessions') or {}
-            if 'deviceId' not in session:
-                session['deviceId'] = battery_id
-            sessions.append(session)
-        # If we fetched new details, update battery_details in-place
-        if fetch_details and new_battery_details:
-            battery_details.clear()
-            battery_details.extend(new_battery_details)
-        return sessions, modes, socs
-
-    def update_battery_entities(battery_entity_groups, sessions, modes, socs):
-        """Update all battery-related sensor entities with new data."""
-        for i, group in enumerate(battery_entity_groups):
-            session = sessions[i] if i < len(sessions) else {}
-            if session is None or not isinstance(session, dict):
-                session = {}
-            mode = modes[i] if i < len(modes) else None
-            state_of_charge = socs[i] if i < len(socs) else None
-            group.mode_sensor._state = mode
-            group.soc_sensor._state = state_of_charge
-            for idx, key in enumerate(SESSION_RESULT_KEYS):
-                group.result_sensors[idx]._session = session
-                group.result_sensors[idx]._state = (session or {}).get(key)
-                group.result_sensors[idx]._attr_extra_state_attributes = {}
-            for entity in [group.mode_sensor, group.soc_sensor] + group.result_sensors:
-                if getattr(entity, 'hass', None) is not None:
-                    entity.async_write_ha_state()
-
-    def update_total_entities(total_entities, sessions, modes, socs):
-        """Update all total result sensor entities with aggregated data, and update avg soc/mode sensors."""
-        avg_soc, last_mode = calc_avg_soc_and_last_mode(socs, modes)
-        for idx, key in enumerate(SESSION_RESULT_KEYS):
-            total = sum(float((session or {}).get(key, 0) or 0) for session in sessions)
-            total_entities[idx]._state = total
-            if getattr(total_entities[idx], 'hass', None) is not None:
-                total_entities[idx].async_write_ha_state()
-        total_avg_soc_entity._state = avg_soc
-        if getattr(total_avg_soc_entity, 'hass', None) is not None:
-            total_avg_soc_entity.async_write_ha_state()
-        total_last_mode_entity._state = last_mode
-        if getattr(total_last_mode_entity, 'hass', None) is not None:
-            total_last_mode_entity.async_write_ha_state()
-        # Set the most recent lastUpdate from all battery_details
-        last_updates = [
-            details.get('smartBatterySummary', {}).get('lastUpdate')
-            for details in battery_details
-            if details.get('smartBatterySummary', {}).get('lastUpdate')
-        ]
-        if last_updates:
-            # ISO8601 strings, so max() gives the latest
-            total_last_update_entity._state = max(last_updates)
-        else:
-            total_last_update_entity._state = None
-        if getattr(total_last_update_entity, 'hass', None) is not None:
-            total_last_update_entity.async_write_ha_state()
-
-    async def update_totals():
-        """Update total sensors immediately after setup using cached battery details."""
-        sessions, modes, socs = await fetch_battery_data(fetch_details=False)
-        update_total_entities(total_entities, sessions, modes, socs)
-
-    # Immediately update totals after setup
-    hass.async_create_task(update_totals())
+    async def async_refresh_entry():
+        """Refresh this entry; returns (last_update, state) for the scheduler."""
+        await coordinator.async_refresh()
+        return coordinator.scheduler_inputs()
+
+    if fleet is not None:
+        # All fleet entries refresh in the fleet's single scheduled cycle
+        if fleet_coordinator is not None:
+            fleet.set_totals_updater(
+                lambda battery_data: fleet_coordinator.async_set_updated_data(fleet_snapshot(battery_data))
+            )
+        fleet.join(entry.entry_id, async_refresh_entry, coordinator)
+
+        async def async_refresh(refresh_details=False):
+            """Refresh now, optionally refetching the cached battery details as well."""
+            if refresh_details:
+                coordinator.details_cache.invalidate()
+            await async_refresh_entry()
+            fleet.update_totals()
+
+        hass.data["frank_energie_slim"][entry.entry_id].update({
+            "scheduler": fleet.scheduler,
+            "refresh": async_refresh,
+        })
+        # First refresh in the background, later ones in the fleet cycle
+        hass.async_create_task(async_refresh())
+        return
+
+    # Poll just after Frank is expected to publish new data instead of on a fixed interval
+    scheduler = AdaptivePollScheduler()
+    scheduler.record(coordinator.data.last_update)
+    cancel_next_refresh = None
+    unloaded = False
+
+    def _schedule_next_refresh():
+        nonlocal cancel_next_refresh
+        if cancel_next_refresh is not None:
+            cancel_next_refresh()
+            cancel_next_refresh = None
+        if unloaded:
+            return
+        delay = scheduler.next_delay(dt_util.utcnow())
+        _LOGGER.debug("Next Frank Energie refresh in %s", delay)
+        cancel_next_refresh = async_call_later(hass, delay, _refresh_sensors)
+
+    def _cancel_next_refresh():
+        nonlocal unloaded
+        unloaded = True
+        if cancel_next_refresh is not None:
+            cancel_next_refresh()
 
     async def _refresh_sensors(now):
         """Periodic update of all battery and total sensors."""
-        sessions, modes, socs = await fetch_battery_data(fetch_details=True)
-        _LOGGER.info(f"All sessions collected for totals: {sessions}")
-        update_battery_entities(battery_entity_groups, sessions, modes, socs)
-        update_total_entities(total_entities, sessions, modes, socs)
+        try:
+            scheduler.record(*await async_refresh_entry())
+        finally:
+            _schedule_next_refresh()
+
+    async def async_refresh(refresh_details=False):
+        """Refresh now, optionally refetching the cached battery details as well."""
+        if refresh_details:
+            coordinator.details_cache.invalidate()
+        await _refresh_sensors(dt_util.utcnow())
 
-    async_track_time_interval(hass, _refresh_sensors, timedelta(minutes=5))
+    hass.data["frank_energie_slim"][entry.entry_id].update({
+        "scheduler": scheduler,
+        "refresh": async_refresh,
+    })
+    entry.async_on_unload(_cancel_next_refresh)
+    # The first refresh runs in the background and schedules the next ones
+    hass.async_create_task(_refresh_sensors(dt_util.utcnow()))
@@ -0,0 +1,51 @@
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
+from .models import parse_battery_result
+
+STORAGE_VERSION = 1
+# Values change every few minutes; writing them at most this often is plenty for a warm start
+SAVE_DELAY = 300
+
+
+class SnapshotStore:
+    """Last known batteries and values of an entry, used to register entities before the API answers."""
+
+    def __init__(self, hass, entry_id):
+        self._store = Store(hass, STORAGE_VERSION, f"frank_energie_slim.snapshot.{entry_id}")
+        self._data = None
+        self._save_pending = False
+
+    async def async_load(self):
+        """Return (saved_at, [BatteryData]) of the last snapshot; (None, []) without one."""
+        data = await self._store.async_load()
+        if not isinstance(data, dict):
+            return None, []
+        battery_data = [
+            parse_battery_result(battery['deviceId'], battery)
+            for battery in data.get('batteries') or []
+            if isinstance(battery, dict) and battery.get('deviceId')
+        ]
+        saved_at = dt_util.parse_datetime(data['saved_at']) if data.get('saved_at') else None
+        return saved_at, battery_data
+
+    def async_save(self, battery_data):
+        """Schedule a write of the current values; Home Assistant flushes pending writes on shutdown.
+
+        async_delay_save restarts its timer on every call, and refreshes come
+        more often than SAVE_DELAY, so a write is only scheduled when none is
+        pending. The pending write picks up the latest values.
+        """
+        self._data = {
+            'saved_at': dt_util.utcnow().isoformat(),
+            'batteries': [{'deviceId': data.device_id, **data.to_dict()} for data in battery_data],
+        }
+        if not self._save_pending:
+            self._save_pending = True
+            self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    def _data_to_save(self):
+        self._save_pending = False
+        return self._data
+
+    async def async_remove(self):
+        await self._store.async_remove()
@@ -0,0 +1,52 @@
+from homeassistant.helpers.storage import Store
+
+STORAGE_KEY = "frank_energie_slim.tokens"
+STORAGE_VERSION = 1
+# Coalesce the writes of token renewals that happen close together
+SAVE_DELAY = 10
+
+TOKEN_STORE_DATA_KEY = "frank_energie_slim_tokens"
+
+
+class TokenStore:
+    """Auth and refresh tokens per Frank Energie account, persisted across restarts."""
+
+    def __init__(self, hass):
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY, private=True)
+        self._data = None
+
+    async def _async_data(self):
+        if self._data is None:
+            self._data = await self._store.async_load() or {}
+        return self._data
+
+    async def async_get(self, username):
+        """Return the stored tokens for username, or None."""
+        tokens = (await self._async_data()).get(username)
+        if not tokens or not (tokens.get('authToken') or tokens.get('refreshToken')):
+            return None
+        return tokens
+
+    async def async_set(self, username, auth):
+        await self._async_data()
+        self.async_update(username, auth)
+
+    def async_update(self, username, auth):
+        """Store renewed tokens from the event loop; the store must already be loaded."""
+        if self._data is None or not auth:
+            return
+        self._data[username] = {'authToken': auth.get('authToken'), 'refreshToken': auth.get('refreshToken')}
+        self._store.async_delay_save(lambda: self._data, SAVE_DELAY)
+
+    async def async_remove(self, username):
+        data = await self._async_data()
+        if data.pop(username, None) is not None:
+            self._store.async_delay_save(lambda: self._data, SAVE_DELAY)
+
+
+def get_token_store(hass):
+    """Return the token store shared by all entries and the config flow."""
+    store = hass.data.get(TOKEN_STORE_DATA_KEY)
+    if store is None:
+        store = hass.data[TOKEN_STORE_DATA_KEY] = TokenStore(hass)
+    return store
@@ -1,116 +1,509 @@
+import asyncio
+import base64
+import gc
+import json
+from json import loads
+import time
 import unittest
-from unittest.mock import patch
 from datetime import datetime
-from custom_components.frank_energie_slim.api import FrankEnergie
-
-class TestFrankEnergie(unittest.TestCase):
-
-    def setUp(self):
-        # Patch the FrankEnergie class at the correct import location
-        self.patcher = patch('custom_components.frank_energie_slim.api.FrankEnergie')
-        self.MockFrankEnergie = self.patcher.start()
-        self.addCleanup(self.patcher.stop)
-        self.MockFrankEnergie.return_value.auth = {'authToken': 'test_auth_token'}
-
-    @patch('custom_components.frank_energie_slim.api.requests.post')
-    def test_login_and_lookup(self, mock_post):
-        # Placeholder JSON response for login
-        mock_post.return_value.json.side_effect = [
-            {
-                "data": {
-                    "login": {
-                        "authToken": "test_auth_token",
-                        "refreshToken": "test_refresh_token"
-                    }
-                }
+from custom_components.frank_energie_slim.api import (
+    AsyncFrankEnergie,
+    build_battery_batch_query,
+    get_token_expiry,
+    split_battery_batch_response,
+)
+from custom_components.frank_energie_slim.ratelimit import RetryPolicy, TokenBucket, TransientError
+
+class TestBatteryBatchQuery(unittest.TestCase):
+
+    def test_build_uses_aliases_per_battery(self):
+        query = build_battery_batch_query(["Battery1", "Battery2"], datetime(2025, 4, 1), datetime(2025, 4, 1))
+        self.assertEqual(query['operationName'], "SmartBatteryBatch")
+        self.assertEqual(query['variables'], {
+            "startDate": "2025-04-01", "endDate": "2025-04-01", "d0": "Battery1", "d1": "Battery2",
+        })
+        for alias in ["b0_sessions", "b0_battery", "b0_summary", "b1_sessions", "b1_battery", "b1_summary"]:
+            self.assertIn(f"{alias}:", query['query'])
+
+    def test_build_without_details(self):
+        query = build_battery_batch_query(["Battery1"], datetime(2025, 4, 1), datetime(2025, 4, 1), include_details=False)
+        self.assertIn("b0_sessions:", query['query'])
+        self.assertNotIn("smartBattery(", query['query'])
+        self.assertNotIn("smartBatterySummary(", query['query'])
+
+    def test_build_summary_without_static_details(self):
+        query = build_battery_batch_query(
+            ["Battery1"], datetime(2025, 4, 1), datetime(2025, 4, 1), include_details=False, include_summary=True
+        )
+        self.assertIn("b0_summary:", query['query'])
+        self.assertNotIn("b0_battery:", query['query'])
+
+    def test_split_maps_aliases_back_to_batteries(self):
+        response = {
+            "data": {
+                "b0_sessions": {"deviceId": "Battery1", "periodTotalResult": 1.0},
+                "b0_battery": {"brand": "SolarEdge"},
+                "b0_summary": {"lastKnownStateOfCharge": 72},
+                "b1_sessions": None,
+                "b1_battery": {"brand": "Sessy"},
+                "b1_summary": {"lastKnownStateOfCharge": 40},
             }
-        ]
+        }
+        results = split_battery_batch_response(response, ["Battery1", "Battery2"])
+        self.assertEqual(results["Battery1"]["smartBatterySessions"]["periodTotalResult"], 1.0)
+        self.assertEqual(results["Battery1"]["smartBattery"]["brand"], "SolarEdge")
+        self.assertIsNone(results["Battery2"]["smartBatterySessions"])
+        self.assertEqual(results["Battery2"]["smartBatterySummary"]["lastKnownStateOfCharge"], 40)
+
+    def test_split_handles_null_data(self):
+        results = split_battery_batch_response({"data": None}, ["Battery1"])
+        self.assertEqual(results, {"Battery1": {}})
+
+class FakeResponse:
+    """Minimal stand-in for an aiohttp response used as an async context manager."""
+    def __init__(self, payload, status=200, headers=None):
+        self._payload = payload
+        self.status = status
+        self.headers = headers or {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    async def json(self):
+        return self._payload
+
+    async def read(self):
+        return json.dumps(self._payload).encode()
+
+class FakeSession:
+    """Records posted requests and replays canned responses in order."""
+    def __init__(self, payloads):
+        self._payloads = list(payloads)
+        self.calls = []
+
+    def post(self, url, json=None, data=None, headers=None, **kwargs):
+        if data is not None:
+            json = loads(data)
+        self.calls.append({"url": url, "json": json, "headers": headers})
+        payload = self._payloads.pop(0)
+        return payload if isinstance(payload, FakeResponse) else FakeResponse(payload)
+
+    def get(self, url, headers=None, **kwargs):
+        self.calls.append({"url": url, "json": None, "headers": headers})
+        payload = self._payloads.pop(0)
+        return payload if isinstance(payload, FakeResponse) else FakeResponse(payload)
+
+def make_token(expires_in):
+    """Build an unsigned JWT that expires expires_in seconds from now."""
+    def encode(part):
+        return base64.urlsafe_b64encode(json.dumps(part).encode()).rstrip(b'=').decode()
+    return f"{encode({'alg': 'none'})}.{encode({'exp': int(time.time() + expires_in)})}.signature"
 
-        # Initialize the API client
-        client = FrankEnergie()
+class TestAsyncFrankEnergie(unittest.IsolatedAsyncioTestCase):
 
-        # Test login
-        auth = client.login("test_user", "test_password")
+    async def test_login_reuses_session_for_subsequent_calls(self):
+        session = FakeSession([
+            {"data": {"login": {"authToken": "test_auth_token", "refreshToken": "test_refresh_token"}}},
+            {"data": {"smartBatteries": [{"id": "Battery1"}]}},
+            {"data": {"smartBatterySessions": {"deviceId": "Battery1"}}},
+        ])
+        client = AsyncFrankEnergie(session)
+
+        auth = await client.login("test_user", "test_password")
         self.assertEqual(auth['authToken'], "test_auth_token")
-        self.assertEqual(auth['refreshToken'], "test_refresh_token")
-
-    @patch('custom_components.frank_energie_slim.api.requests.post')
-    def test_login_error_message_from_server(self, mock_post):
-        # Simulate server error response
-        mock_post.return_value.json.return_value = {
-            "data": None,
-            "errors": [
-                {
-                    "message": "user-error:user-not-found",
-                    "locations": [{"line": 2, "column": 3}],
-                    "path": ["login"]
-                }
-            ]
-        }
-        client = FrankEnergie()
+
+        batteries = await client.get_smart_batteries()
+        self.assertEqual(batteries['data']['smartBatteries'][0]['id'], "Battery1")
+
+        sessions = await client.get_smart_battery_sessions("Battery1", datetime(2025, 4, 1), datetime(2025, 4, 10))
+        self.assertEqual(sessions['data']['smartBatterySessions']['deviceId'], "Battery1")
+
+        self.assertEqual(len(session.calls), 3)
+        self.assertNotIn('Authorization', session.calls[0]['headers'])
+        self.assertEqual(session.calls[1]['headers']['Authorization'], "Bearer test_auth_token")
+        self.assertEqual(session.calls[2]['json']['variables']['startDate'], "2025-04-01")
+
+    async def test_login_error_message_from_server(self):
+        session = FakeSession([
+            {"data": None, "errors": [{"message": "user-error:user-not-found", "path": ["login"]}]}
+        ])
+        client = AsyncFrankEnergie(session)
         with self.assertRaises(Exception) as context:
-            client.login("wrong_user", "wrong_password")
+            await client.login("wrong_user", "wrong_password")
         self.assertIn("user-error:user-not-found", str(context.exception))
 
-    @patch('custom_components.frank_energie_slim.api.requests.post')
-    def test_battery_and_session_lookup(self, mock_post):
-        # Placeholder JSON response for battery lookup
-        mock_post.return_value.json.side_effect = [
-            {
-                "data": {
-                    "smartBatteries": [
-                        {
-                            "brand": "TestBrand",
-                            "capacity": 100,
-                            "createdAt": "2025-04-01T00:00:00Z",
-                            "externalReference": "Ref123",
-                            "id": "Battery1",
-                            "maxChargePower": 50,
-                            "maxDischargePower": 50,
-                            "provider": "TestProvider",
-                            "updatedAt": "2025-04-10T00:00:00Z"
-                        }
-                    ]
-                }
-            },
-            {
-                "data": {
-                    "smartBatterySessions": {
-                        "deviceId": "Battery1",
-                        "periodStartDate": "2025-04-01",
-                        "periodEndDate": "2025-04-10",
-                        "periodEpexResult": 10.0,
-                        "periodFrankSlim": 5.0,
-                        "periodImbalanceResult": 2.0,
-                        "periodTotalResult": 17.0,
-                        "periodTradeIndex": 1.0,
-                        "periodTradingResult": 3.0,
-                        "sessions": [
-                            {
-                                "cumulativeResult": 3.0,
-                                "date": "2025-04-01",
-                                "result": 3.0
-                            }
-                        ]
-                    }
-                }
+    async def test_auth_error_raises_authentication_required(self):
+        session = FakeSession([{"data": None, "errors": [{"message": "user-error:auth-not-authorised"}]}])
+        client = AsyncFrankEnergie(session, auth_token="expired")
+        with self.assertRaises(Exception) as context:
+            await client.get_smart_battery_details("Battery1")
+        self.assertEqual(str(context.exception), "Authentication required")
+
+    async def test_batch_is_a_single_request(self):
+        session = FakeSession([{
+            "data": {
+                "b0_sessions": {"deviceId": "Battery1"},
+                "b1_sessions": {"deviceId": "Battery2"},
             }
-        ]
+        }])
+        client = AsyncFrankEnergie(session, auth_token="test_auth_token")
+        results = await client.get_smart_battery_batch(
+            ["Battery1", "Battery2"], datetime(2025, 4, 1), datetime(2025, 4, 1), include_details=False
+        )
+        self.assertEqual(len(session.calls), 1)
+        self.assertEqual(results["Battery2"]["smartBatterySessions"]["deviceId"], "Battery2")
 
-        # Initialize the API client
-        client = FrankEnergie(auth_token="test_auth_token")
-        client.auth = {'authToken': 'test_auth_token'}  # Ensure authToken is present
+class TestPersistedQueries(unittest.IsolatedAsyncioTestCase):
+    NOT_FOUND = {"data": None, "errors": [{"message": "PersistedQueryNotFound"}]}
+    BATTERIES = {"data": {"smartBatteries": [{"id": "Battery1"}]}}
 
-        # Test battery lookup
-        batteries = client.get_smart_batteries()
-        self.assertEqual(len(batteries['data']['smartBatteries']), 1)
-        self.assertEqual(batteries['data']['smartBatteries'][0]['brand'], "TestBrand")
+    async def test_hash_first_then_full_document(self):
+        session = FakeSession([self.NOT_FOUND, self.BATTERIES, self.BATTERIES])
+        client = AsyncFrankEnergie(session, auth_token="test_auth_token")
+        for _ in range(2):
+            response = await client.get_smart_batteries()
+            self.assertEqual(response, self.BATTERIES)
+        hash_only, registration, known = (call["json"] for call in session.calls)
+        self.assertNotIn("query", hash_only)
+        self.assertEqual(registration["extensions"], hash_only["extensions"])
+        self.assertEqual(registration["query"], "query SmartBatteries{smartBatteries{id}}")
+        self.assertEqual(known, hash_only)
+        self.assertEqual(client.metrics.persisted_query_misses, 1)
+        self.assertTrue(client.persisted_queries)
 
-        # Test battery session lookup
-        start_date = datetime(2025, 4, 1)
-        end_date = datetime(2025, 4, 10)
-        sessions = client.get_smart_battery_sessions("Battery1", start_date, end_date)
-        self.assertEqual(sessions['data']['smartBatterySessions']['deviceId'], "Battery1")
+    async def test_unsupported_server_gets_full_documents(self):
+        session = FakeSession([
+            {"data": None, "errors": [{"message": "Must provide query string."}]}, self.BATTERIES, self.BATTERIES,
+        ])
+        client = AsyncFrankEnergie(session, auth_token="test_auth_token")
+        await client.get_smart_batteries()
+        await client.get_smart_batteries()
+        self.assertFalse(client.persisted_queries)
+        self.assertNotIn("extensions", session.calls[2]["json"])
+        self.assertIn("query", session.calls[2]["json"])
+
+    async def test_bare_rejection_only_affects_its_request(self):
+        session = FakeSession([FakeResponse({}, status=404), self.BATTERIES, self.BATTERIES])
+        client = AsyncFrankEnergie(session, auth_token="test_auth_token")
+        self.assertEqual(await client.get_smart_batteries(), self.BATTERIES)
+        self.assertIn("query", session.calls[1]["json"])
+        self.assertTrue(client.persisted_queries)
+        await client.get_smart_batteries()
+        self.assertNotIn("query", session.calls[2]["json"])
+
+    async def test_rejection_reporting_no_support_disables_persisted_queries(self):
+        unsupported = {"data": None, "errors": [{"message": "PersistedQueryNotSupported"}]}
+        session = FakeSession([FakeResponse(unsupported, status=400), self.BATTERIES])
+        client = AsyncFrankEnergie(session, auth_token="test_auth_token")
+        self.assertEqual(await client.get_smart_batteries(), self.BATTERIES)
+        self.assertFalse(client.persisted_queries)
+
+    async def test_auth_error_on_hash_is_not_a_miss(self):
+        session = FakeSession([{"data": None, "errors": [{"message": "user-error:auth-not-authorised"}]}])
+        client = AsyncFrankEnergie(session, auth_token="expired")
+        with self.assertRaises(Exception) as context:
+            await client.get_smart_batteries()
+        self.assertEqual(str(context.exception), "Authentication required")
+        self.assertEqual(len(session.calls), 1)
+
+    async def test_get_requests(self):
+        session = FakeSession([FakeResponse({}, status=405), self.BATTERIES, self.BATTERIES])
+        client = AsyncFrankEnergie(session, auth_token="test_auth_token", get_requests=True)
+        await client.get_smart_batteries()
+        self.assertTrue(session.calls[0]["url"].startswith(client.DATA_URL + "?operationName=SmartBatteries"))
+        # The rejected GET is repeated as a hash-only POST
+        self.assertNotIn("query", session.calls[1]["json"])
+        self.assertFalse(client.get_requests)
+        await client.get_smart_batteries()
+        self.assertIsNotNone(session.calls[2]["json"])
+
+    async def test_login_is_never_a_get_request(self):
+        session = FakeSession([{"data": {"login": {"authToken": "a", "refreshToken": "r"}}}])
+        client = AsyncFrankEnergie(session, get_requests=True)
+        await client.login("user", "password")
+        self.assertIsNotNone(session.calls[0]["json"])
+
+class TestSingleFlight(unittest.IsolatedAsyncioTestCase):
+    BATTERIES = {"data": {"smartBatteries": [{"id": "Battery1"}]}}
+
+    async def test_identical_queries_in_flight_share_one_request(self):
+        session = FakeSession([self.BATTERIES, self.BATTERIES])
+        client = AsyncFrankEnergie(session, auth_token="test_auth_token")
+        responses = await asyncio.gather(*(client.get_smart_batteries() for _ in range(3)))
+        self.assertEqual(responses, [self.BATTERIES] * 3)
+        self.assertEqual(len(session.calls), 1)
+        self.assertEqual(client.metrics.coalesced_requests, 2)
+        # Once completed, the next query is sent again
+        await client.get_smart_batteries()
+        self.assertEqual(len(session.calls), 2)
+
+    async def test_different_variables_are_separate_requests(self):
+        session = FakeSession([{"data": {"smartBatterySummary": {}}}] * 2)
+        client = AsyncFrankEnergie(session, auth_token="test_auth_token")
+        await asyncio.gather(client.get_smart_battery_summary("Battery1"), client.get_smart_battery_summary("Battery2"))
+        self.assertEqual(len(session.calls), 2)
+
+    async def test_errors_are_shared(self):
+        session = FakeSession([{"data": None, "errors": [{"message": "user-error:auth-not-authorised"}]}])
+        client = AsyncFrankEnergie(session, auth_token="expired")
+        results = await asyncio.gather(
+            client.get_smart_batteries(), client.get_smart_batteries(), return_exceptions=True
+        )
+        self.assertEqual([str(result) for result in results], ["Authentication required"] * 2)
+        self.assertEqual(len(session.calls), 1)
+
+    async def test_cancelled_caller_does_not_cancel_the_others(self):
+        session = FakeSession([self.BATTERIES])
+        client = AsyncFrankEnergie(session, auth_token="test_auth_token")
+        first = asyncio.ensure_future(client.get_smart_batteries())
+        second = asyncio.ensure_future(client.get_smart_batteries())
+        await asyncio.sleep(0)
+        first.cancel()
+        self.assertEqual(await second, self.BATTERIES)
+
+    async def test_failure_after_every_caller_left_is_retrieved(self):
+        client = AsyncFrankEnergie(None, auth_token="test_auth_token")
+
+        async def fail(query_data):
+            await asyncio.sleep(0.01)
+            raise TransientError("HTTP 503")
+
+        client._query = fail
+        loop = asyncio.get_running_loop()
+        unhandled = []
+        loop.set_exception_handler(lambda loop, context: unhandled.append(context))
+        self.addCleanup(loop.set_exception_handler, None)
+        caller = asyncio.ensure_future(client.get_smart_batteries())
+        await asyncio.sleep(0)
+        caller.cancel()
+        await asyncio.sleep(0.02)
+        del caller
+        gc.collect()
+        self.assertEqual(unhandled, [])
+
+    async def test_freshness_window(self):
+        session = FakeSession([self.BATTERIES, self.BATTERIES])
+        client = AsyncFrankEnergie(session, auth_token="test_auth_token", freshness_window=0.05)
+        await client.get_smart_batteries()
+        await client.get_smart_batteries()
+        self.assertEqual(len(session.calls), 1)
+        self.assertEqual(client.metrics.coalesced_requests, 1)
+        await asyncio.sleep(0.06)
+        await client.get_smart_batteries()
+        self.assertEqual(len(session.calls), 2)
+
+    async def test_mutations_are_never_shared(self):
+        login = {"data": {"login": {"authToken": "a", "refreshToken": "r"}}}
+        session = FakeSession([login, login])
+        client = AsyncFrankEnergie(session)
+        login_query = {
+            "operationName": "Login",
+            "query": "mutation Login($email: String!, $password: String!) { login(email: $email, password: $password) { authToken } }",
+            "variables": {"email": "user", "password": "password"},
+        }
+        await asyncio.gather(client.query(login_query), client.query(login_query))
+        self.assertEqual(len(session.calls), 2)
+
+class TestConcurrentBatteryFetch(unittest.IsolatedAsyncioTestCase):
+
+    def _client(self, fail=(), delay=0.01, slow=()):
+        client = AsyncFrankEnergie(None, auth_token="test_auth_token")
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+        async def get_smart_battery_data(device_id, start_date, end_date, include_details=True, include_summary=None):
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            try:
+                await asyncio.sleep(1 if device_id in slow else delay)
+                if device_id in fail:
+                    raise fail[device_id]
+                return {"smartBatterySessions": {"deviceId": device_id}}
+            finally:
+                self.in_flight -= 1
+
+        client.get_smart_battery_data = get_smart_battery_data
+        return client
+
+    async def test_respects_concurrency_limit(self):
+        client = self._client()
+        device_ids = [f"Battery{i}" for i in range(10)]
+        results = await client.get_smart_battery_concurrent(
+            device_ids, datetime(2025, 4, 1), datetime(2025, 4, 1), max_concurrency=3
+        )
+        self.assertEqual(list(results), device_ids)
+        self.assertEqual(self.max_in_flight, 3)
+
+    async def test_failing_battery_only_affects_itself(self):
+        client = self._client(fail={"Battery2": Exception("boom")})
+        results = await client.get_smart_battery_concurrent(
+            ["Battery1", "Battery2"], datetime(2025, 4, 1), datetime(2025, 4, 1)
+        )
+        self.assertEqual(results["Battery1"]["smartBatterySessions"]["deviceId"], "Battery1")
+        self.assertEqual(results["Battery2"], {})
+
+    async def test_slow_battery_times_out(self):
+        client = self._client(slow={"Battery2"})
+        results = await client.get_smart_battery_concurrent(
+            ["Battery1", "Battery2"], datetime(2025, 4, 1), datetime(2025, 4, 1), timeout=0.1
+        )
+        self.assertEqual(results["Battery2"], {})
+
+    async def test_every_battery_failing_is_raised(self):
+        client = self._client(slow={"Battery1"})
+        with self.assertRaises(asyncio.TimeoutError):
+            await client.get_smart_battery_concurrent(
+                ["Battery1"], datetime(2025, 4, 1), datetime(2025, 4, 1), timeout=0.01
+            )
+
+    async def test_transient_error_only_affects_its_battery(self):
+        client = self._client(fail={"Battery3": TransientError("HTTP 503")})
+        results = await client.get_smart_battery_concurrent(
+            ["Battery1", "Battery2", "Battery3"], datetime(2025, 4, 1), datetime(2025, 4, 1)
+        )
+        self.assertEqual(results["Battery1"]["smartBatterySessions"]["deviceId"], "Battery1")
+        self.assertEqual(results["Battery2"]["smartBatterySessions"]["deviceId"], "Battery2")
+        self.assertEqual(results["Battery3"], {})
+
+    async def test_open_circuit_is_raised(self):
+        from custom_components.frank_energie_slim.breaker import CircuitOpenError
+        client = self._client(fail={"Battery2": CircuitOpenError("circuit open")})
+        with self.assertRaises(CircuitOpenError):
+            await client.get_smart_battery_concurrent(
+                ["Battery1", "Battery2"], datetime(2025, 4, 1), datetime(2025, 4, 1)
+            )
+
+    async def test_authentication_error_is_raised(self):
+        client = self._client(fail={"Battery1": Exception("Authentication required")})
+        with self.assertRaises(Exception) as context:
+            await client.get_smart_battery_concurrent(["Battery1"], datetime(2025, 4, 1), datetime(2025, 4, 1))
+        self.assertEqual(str(context.exception), "Authentication required")
+
+    async def test_battery_data_merges_sessions_and_details(self):
+        session = FakeSession([
+            {"data": {"smartBatterySessions": {"deviceId": "Battery1"}}},
+            {"data": {"smartBattery": {"brand": "SolarEdge"}, "smartBatterySummary": {"lastKnownStateOfCharge": 72}}},
+        ])
+        client = AsyncFrankEnergie(session, auth_token="test_auth_token")
+        result = await client.get_smart_battery_data("Battery1", datetime(2025, 4, 1), datetime(2025, 4, 1))
+        self.assertEqual(set(result), {"smartBatterySessions", "smartBattery", "smartBatterySummary"})
+
+class TestRetries(unittest.IsolatedAsyncioTestCase):
+
+    async def test_transient_http_errors_are_retried(self):
+        session = FakeSession([
+            FakeResponse({}, status=429, headers={"Retry-After": "0"}),
+            FakeResponse({}, status=502),
+            {"data": {"smartBatteries": []}},
+        ])
+        limiter = TokenBucket(rate=1000, capacity=10)
+        client = AsyncFrankEnergie(session, auth_token="token", rate_limiter=limiter, retry_policy=RetryPolicy(base_delay=0))
+        response = await client.get_smart_batteries()
+        self.assertEqual(response, {"data": {"smartBatteries": []}})
+        self.assertEqual(len(session.calls), 3)
+        # Every attempt is counted, with the bytes of the successful response
+        stats = client.metrics.as_dict()["operations"]["SmartBatteries"]
+        self.assertEqual((stats["calls"], stats["errors"], stats["retries"]), (3, 2, 2))
+        self.assertEqual(stats["bytes_received"], len(b'{"data": {"smartBatteries": []}}'))
+        self.assertGreater(stats["bytes_sent"], 0)
+        self.assertEqual(client.metrics.calls_today, 3)
+
+    async def test_gives_up_after_the_last_attempt(self):
+        session = FakeSession([FakeResponse({}, status=503)] * 2)
+        client = AsyncFrankEnergie(session, auth_token="token", rate_limiter=None,
+                                   retry_policy=RetryPolicy(attempts=2, base_delay=0))
+        with self.assertRaises(TransientError):
+            await client.get_smart_batteries()
+        self.assertEqual(len(session.calls), 2)
+
+class TestTokenRefresh(unittest.IsolatedAsyncioTestCase):
+
+    def test_token_expiry(self):
+        token = make_token(60)
+        self.assertAlmostEqual(get_token_expiry(token), time.time() + 60, delta=2)
+        self.assertIsNone(get_token_expiry("not-a-jwt"))
+
+    async def test_renews_token_ahead_of_expiry(self):
+        fresh = make_token(3600)
+        session = FakeSession([
+            {"data": {"renewToken": {"authToken": fresh, "refreshToken": "new_refresh"}}},
+            {"data": {"smartBatteries": []}},
+        ])
+        client = AsyncFrankEnergie(session, auth_token=make_token(60), refresh_token="old_refresh")
+        await client.get_smart_batteries()
+        self.assertEqual(session.calls[0]['json']['operationName'], "RenewToken")
+        self.assertEqual(session.calls[0]['json']['variables']['refreshToken'], "old_refresh")
+        self.assertEqual(session.calls[1]['headers']['Authorization'], f"Bearer {fresh}")
+
+    async def test_valid_token_is_not_renewed(self):
+        session = FakeSession([{"data": {"smartBatteries": []}}])
+        client = AsyncFrankEnergie(session, auth_token=make_token(3600), refresh_token="refresh")
+        await client.get_smart_batteries()
+        self.assertEqual(len(session.calls), 1)
+
+    async def test_concurrent_callers_share_one_renewal(self):
+        session = FakeSession(
+            [{"data": {"renewToken": {"authToken": make_token(3600), "refreshToken": "new_refresh"}}}]
+            + [{"data": {"smartBatterySummary": {}}}] * 3
+        )
+        client = AsyncFrankEnergie(session, auth_token=make_token(60), refresh_token="old_refresh")
+        # Different batteries, so the queries are not coalesced
+        await asyncio.gather(*(client.get_smart_battery_summary(f"Battery{index}") for index in range(3)))
+        operations = [c['json']['operationName'] for c in session.calls]
+        self.assertEqual(operations.count("RenewToken"), 1)
+        self.assertEqual(operations.count("SmartBatterySummary"), 3)
+
+    async def test_rejected_token_is_renewed_and_request_retried(self):
+        session = FakeSession([
+            {"data": None, "errors": [{"message": "user-error:auth-not-authorised"}]},
+            {"data": {"renewToken": {"authToken": "renewed", "refreshToken": "new_refresh"}}},
+            {"data": {"smartBatteries": [{"id": "Battery1"}]}},
+        ])
+        client = AsyncFrankEnergie(session, auth_token="opaque", refresh_token="refresh")
+        batteries = await client.get_smart_batteries()
+        self.assertEqual(batteries['data']['smartBatteries'][0]['id'], "Battery1")
+        self.assertEqual(session.calls[2]['headers']['Authorization'], "Bearer renewed")
+        self.assertEqual(client.metrics.token_renewals, 1)
+        self.assertEqual(client.metrics.operations["SmartBatteries"].errors, 1)
+
+    async def test_falls_back_to_password_login_when_renewal_fails(self):
+        session = FakeSession([
+            {"data": {"login": {"authToken": "expired", "refreshToken": "refresh"}}},
+            {"data": None, "errors": [{"message": "user-error:auth-not-authorised"}]},
+            {"data": None, "errors": [{"message": "user-error:auth-not-authorised"}]},
+            {"data": {"login": {"authToken": "relogged", "refreshToken": "refresh2"}}},
+            {"data": {"smartBatteries": []}},
+        ])
+        client = AsyncFrankEnergie(session)
+        await client.login("test_user", "test_password")
+        await client.get_smart_batteries()
+        operations = [c['json']['operationName'] for c in session.calls]
+        self.assertEqual(operations, ["Login", "SmartBatteries", "RenewToken", "Login", "SmartBatteries"])
+        self.assertEqual(session.calls[3]['json']['variables']['email'], "test_user")
+        self.assertEqual(client.auth['authToken'], "relogged")
+        self.assertEqual((client.metrics.logins, client.metrics.token_renewals), (2, 0))
+
+    async def test_stored_tokens_are_used_without_login(self):
+        session = FakeSession([
+            {"data": None, "errors": [{"message": "user-error:auth-not-authorised"}]},
+            {"data": {"renewToken": {"authToken": "renewed", "refreshToken": "refresh2"}}},
+            {"data": {"smartBatteries": []}},
+        ])
+        saved = []
+        client = AsyncFrankEnergie(session, auth_token="stored", refresh_token="refresh")
+        client.set_credentials("test_user", "test_password")
+        client.token_listener = saved.append
+        await client.get_smart_batteries()
+        operations = [c['json']['operationName'] for c in session.calls]
+        self.assertEqual(operations, ["SmartBatteries", "RenewToken", "SmartBatteries"])
+        self.assertEqual(session.calls[0]['headers']['Authorization'], "Bearer stored")
+        self.assertEqual(saved, [{"authToken": "renewed", "refreshToken": "refresh2"}])
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,34 @@
+import unittest
+from benchmarks.refresh import find_regressions, run_scenario
+from benchmarks.simulated_api import SimulatedAccount
+
+class TestRefreshBenchmark(unittest.IsolatedAsyncioTestCase):
+    async def test_small_scenario(self):
+        result = await run_scenario(batteries=3, cycles=2, changed_fraction=1.0)
+        self.assertEqual(result["entities"], 3 * 7 + 8)
+        # Login, battery list, discovery batch and the first refresh, each sent by hash and then registered
+        self.assertEqual(result["first_cycle_requests"], 8)
+        self.assertEqual(result["requests_per_cycle"], 1)
+        self.assertLess(result["upload_bytes_per_cycle"], 300)
+        # Only the battery and total mode sensors keep their state
+        self.assertEqual(result["writes_per_cycle"], 3 * 6 + 7)
+        self.assertIsNotNone(result["alloc_peak_kib"])
+
+    def test_find_regressions(self):
+        baseline = {"a": {"cycle_ms": 100, "requests_per_cycle": 1}}
+        self.assertEqual(find_regressions({"a": {"cycle_ms": 110, "requests_per_cycle": 1, "setup_ms": 5}}, baseline), [])
+        regressions = find_regressions({"a": {"cycle_ms": 200, "requests_per_cycle": 2, "setup_ms": 5}}, baseline)
+        self.assertEqual(len(regressions), 2)
+
+class TestSimulatedAccount(unittest.TestCase):
+    def test_unknown_battery_is_null(self):
+        from datetime import date
+        from custom_components.frank_energie_slim.api import build_battery_batch_query, split_battery_batch_response
+        account = SimulatedAccount(batteries=1)
+        query = build_battery_batch_query(["battery0000", "missing"], date(2025, 4, 20), date(2025, 4, 20))
+        results = split_battery_batch_response(account.execute(query), ["battery0000", "missing"])
+        self.assertEqual(results["battery0000"]["smartBatterySessions"]["deviceId"], "battery0000")
+        self.assertIsNone(results["missing"]["smartBattery"])
+
+if __name__ == "__main__":
+    unittest.main()
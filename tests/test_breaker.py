@@ -0,0 +1,75 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock
+from custom_components.frank_energie_slim.breaker import (
+    STATE_CLOSED,
+    STATE_HALF_OPEN,
+    STATE_OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+    RefreshStatus,
+)
+from custom_components.frank_energie_slim.ratelimit import TransientError
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestCircuitBreaker(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(failure_threshold=2, open_interval=timedelta(minutes=5),
+                                      max_open_interval=timedelta(minutes=15), clock=self.clock)
+        self.failing = AsyncMock(side_effect=TransientError("HTTP 502"))
+
+    async def _fail(self, exception=TransientError):
+        with self.assertRaises(exception):
+            await self.breaker.async_call(self.failing)
+
+    async def test_opens_after_threshold_and_fails_fast(self):
+        await self._fail()
+        self.assertEqual(self.breaker.state, STATE_CLOSED)
+        await self._fail()
+        self.assertEqual(self.breaker.state, STATE_OPEN)
+        await self._fail(CircuitOpenError)
+        self.assertEqual(self.failing.await_count, 2)
+
+    async def test_half_open_probe_backs_off_and_recovers(self):
+        await self._fail()
+        await self._fail()
+        self.clock.now = 300
+        self.assertEqual(self.breaker.state, STATE_HALF_OPEN)
+        await self._fail()
+        # The failed probe doubles the wait before the next one
+        self.assertEqual(self.breaker.retry_in(), 600)
+        self.clock.now = 900
+        await self.breaker.async_call(AsyncMock(return_value="ok"))
+        self.assertEqual(self.breaker.state, STATE_CLOSED)
+        self.assertEqual(self.breaker.consecutive_failures, 0)
+
+    async def test_other_errors_do_not_count(self):
+        for _ in range(3):
+            with self.assertRaises(Exception):
+                await self.breaker.async_call(AsyncMock(side_effect=Exception("user-error:user-not-found")))
+        self.assertEqual(self.breaker.state, STATE_CLOSED)
+
+class TestRefreshStatus(unittest.TestCase):
+    def test_attributes_only_while_stale(self):
+        status = RefreshStatus()
+        now = datetime(2025, 4, 20, 12, 0, tzinfo=timezone.utc)
+        status.record_success(now)
+        self.assertIsNone(status.attributes(now))
+        status.record_failure(Exception("HTTP 502"))
+        status.record_failure(Exception("HTTP 502"))
+        self.assertEqual(status.attributes(now + timedelta(minutes=10)), {
+            "stale": True,
+            "last_success": "2025-04-20T12:00:00+00:00",
+            "data_age": 600,
+            "consecutive_failures": 2,
+        })
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,28 @@
+import unittest
+from datetime import timedelta
+from unittest.mock import patch
+from custom_components.frank_energie_slim.cache import BatteryDetailsCache
+
+class TestBatteryDetailsCache(unittest.TestCase):
+    def test_entries_expire_after_ttl(self):
+        cache = BatteryDetailsCache(ttl=timedelta(minutes=10))
+        with patch('custom_components.frank_energie_slim.cache.time.monotonic', return_value=1000):
+            cache.set("id123", {"brand": "SolarEdge"})
+            self.assertEqual(cache.get("id123"), {"brand": "SolarEdge"})
+            self.assertEqual(cache.stale_ids(["id123", "id456"]), ["id456"])
+        with patch('custom_components.frank_energie_slim.cache.time.monotonic', return_value=1600):
+            self.assertIsNone(cache.get("id123"))
+            self.assertEqual(cache.get("id123", allow_stale=True), {"brand": "SolarEdge"})
+            self.assertEqual(cache.stale_ids(["id123"]), ["id123"])
+
+    def test_invalidate(self):
+        cache = BatteryDetailsCache()
+        cache.set("id123", {})
+        cache.set("id456", {})
+        cache.invalidate("id123")
+        self.assertEqual(cache.stale_ids(["id123", "id456"]), ["id123"])
+        cache.invalidate()
+        self.assertEqual(cache.stale_ids(["id123", "id456"]), ["id123", "id456"])
+
+if __name__ == "__main__":
+    unittest.main()
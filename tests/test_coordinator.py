@@ -0,0 +1,251 @@
+import json
+import os
+import tempfile
+import unittest
+from datetime import date, datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+from custom_components.frank_energie_slim.coordinator import EntrySnapshot, FrankEnergieCoordinator
+from custom_components.frank_energie_slim.entities import (
+    FrankEnergieBatteryPeriodResultSensor,
+    FrankEnergieTotalAvgSocSensor,
+    FrankEnergieTotalPeriodResultSensor,
+)
+from custom_components.frank_energie_slim.history import SessionHistoryStore, SessionHistorySync
+from custom_components.frank_energie_slim.models import parse_battery_results
+from custom_components.frank_energie_slim.ratelimit import TransientError
+
+RESULTS = {
+    "battery1": {
+        "smartBatterySessions": {"deviceId": "battery1", "periodTotalResult": 1.5},
+        "smartBattery": {"settings": {"batteryMode": "IMBALANCE_TRADING"}},
+        "smartBatterySummary": {"lastKnownStateOfCharge": 40, "lastUpdate": "2025-04-20T11:00:00.000Z"},
+    },
+    "battery2": {
+        "smartBatterySessions": {"deviceId": "battery2", "periodTotalResult": 2.0},
+        "smartBatterySummary": {"lastKnownStateOfCharge": 60, "lastUpdate": "2025-04-20T11:15:00.000Z"},
+    },
+}
+
+def on_day(results, day):
+    """Return results with the sessions of each battery dated day."""
+    return {
+        device_id: {**data, "smartBatterySessions": {**data["smartBatterySessions"], "periodStartDate": day}}
+        for device_id, data in results.items()
+    }
+
+class TestEntrySnapshot(unittest.TestCase):
+    def test_totals(self):
+        snapshot = EntrySnapshot.from_battery_data(parse_battery_results(RESULTS).values())
+        self.assertEqual(snapshot.device_ids, ["battery1", "battery2"])
+        self.assertEqual(snapshot.results["periodTotalResult"], 3.5)
+        self.assertEqual(snapshot.results["periodEpexResult"], 0)
+        self.assertEqual(snapshot.average_soc, 50)
+        self.assertEqual(snapshot.last_update, "2025-04-20T11:15:00.000Z")
+        self.assertEqual(snapshot.battery("battery1").summary.state_of_charge, 40)
+        self.assertIsNone(snapshot.battery("missing"))
+
+class TestFrankEnergieCoordinator(unittest.IsolatedAsyncioTestCase):
+    def _coordinator(self, restored=()):
+        client = MagicMock()
+        client.async_ensure_authenticated = AsyncMock(side_effect=Exception("502 Bad Gateway"))
+        entry = MagicMock()
+        entry.entry_id = "entry1"
+        entry.options = {}
+        return FrankEnergieCoordinator(MagicMock(), entry, client, restored_data=restored)
+
+    async def test_unavailable_without_data_to_serve(self):
+        coordinator = self._coordinator()
+        sensor = FrankEnergieTotalAvgSocSensor(coordinator, "entry1")
+        with patch("homeassistant.helpers.entity.Entity.async_write_ha_state") as write_ha_state:
+            # The initial write by the entity platform, while still available
+            sensor.async_write_ha_state()
+            await coordinator.async_refresh()
+            self.assertFalse(coordinator.last_update_success)
+            self.assertFalse(sensor.available)
+            # Only the availability changed; it is still written
+            sensor._handle_coordinator_update()
+            self.assertEqual(write_ha_state.call_count, 2)
+            sensor._handle_coordinator_update()
+            self.assertEqual(write_ha_state.call_count, 2)
+
+    async def test_stale_snapshot_when_data_is_known(self):
+        coordinator = self._coordinator(list(parse_battery_results(RESULTS).values()))
+        previous = coordinator.data
+        sensor = FrankEnergieTotalAvgSocSensor(coordinator, "entry1")
+        await coordinator.async_refresh()
+        self.assertTrue(sensor.available)
+        self.assertEqual(sensor.state, 50)
+        self.assertEqual(sensor.extra_state_attributes["consecutive_failures"], 1)
+        # A new snapshot was published; the previous one is unchanged
+        self.assertIsNone(previous.attributes)
+        self.assertIsNotNone(coordinator.refresh_status.last_duration)
+        self.assertEqual(coordinator.scheduler_inputs(), ("2025-04-20T11:15:00.000Z", None))
+
+    async def test_failed_battery_keeps_its_last_values(self):
+        coordinator = self._coordinator(list(parse_battery_results(on_day(RESULTS, "2025-04-20")).values()))
+        coordinator.client.async_ensure_authenticated = AsyncMock()
+        coordinator.client.get_smart_batteries = AsyncMock(
+            return_value={"data": {"smartBatteries": [{"id": "battery1"}, {"id": "battery2"}]}}
+        )
+        # The batch failed and only battery1 came back from the concurrent requests
+        coordinator.client.get_smart_battery_batch = AsyncMock(side_effect=TransientError("HTTP 503"))
+        coordinator.client.get_smart_battery_concurrent = AsyncMock(return_value={"battery1": {
+            "smartBatterySessions": {"deviceId": "battery1", "periodTotalResult": 3.0},
+            "smartBatterySummary": {"lastKnownStateOfCharge": 50},
+        }, "battery2": {}})
+        with patch("custom_components.frank_energie_slim.coordinator.datetime") as mock_datetime:
+            mock_datetime.now.return_value = datetime(2025, 4, 20, 12, 0)
+            await coordinator.async_refresh()
+        self.assertTrue(coordinator.last_update_success)
+        self.assertEqual(coordinator.data.battery("battery1").session.period_total_result, 3.0)
+        self.assertEqual(coordinator.data.battery("battery2").session.period_total_result, 2.0)
+        self.assertEqual(coordinator.data.battery("battery2").summary.state_of_charge, 60)
+
+    async def test_yesterdays_session_is_not_kept_after_midnight(self):
+        coordinator = self._coordinator(list(parse_battery_results(on_day(RESULTS, "2025-04-20")).values()))
+        coordinator.client.async_ensure_authenticated = AsyncMock()
+        coordinator.client.get_smart_batteries = AsyncMock(
+            return_value={"data": {"smartBatteries": [{"id": "battery1"}, {"id": "battery2"}]}}
+        )
+        coordinator.client.get_smart_battery_batch = AsyncMock(return_value={
+            "battery1": RESULTS["battery1"], "battery2": {},
+        })
+        with patch("custom_components.frank_energie_slim.coordinator.datetime") as mock_datetime:
+            mock_datetime.now.return_value = datetime(2025, 4, 21, 0, 30)
+            await coordinator.async_refresh()
+        self.assertIsNone(coordinator.data.battery("battery2").session.period_total_result)
+        # The summary is not tied to a day and is still kept
+        self.assertEqual(coordinator.data.battery("battery2").summary.state_of_charge, 60)
+
+class TestPeriodResults(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        self.store = SessionHistoryStore(self.path)
+        self.addCleanup(os.remove, self.path)
+        self.addCleanup(self.store.close)
+
+    def _coordinator(self, entry_id="entry1", device_id="battery1"):
+        hass = MagicMock()
+
+        async def async_add_executor_job(func, *args):
+            return func(*args)
+
+        hass.async_add_executor_job.side_effect = async_add_executor_job
+        hass.async_create_task.side_effect = lambda coro: coro.close()
+        client = MagicMock()
+        client.async_ensure_authenticated = AsyncMock()
+        client.get_smart_batteries = AsyncMock(return_value={"data": {"smartBatteries": [{"id": device_id}]}})
+        client.get_smart_battery_batch = AsyncMock(return_value={device_id: RESULTS[device_id]})
+        entry = MagicMock()
+        entry.entry_id = entry_id
+        entry.options = {}
+        coordinator = FrankEnergieCoordinator(hass, entry, client)
+        coordinator.history = SessionHistorySync(hass, client, self.store)
+        coordinator.track_periods = True
+        return coordinator
+
+    async def test_refresh_folds_today_into_the_periods(self):
+        # Earlier days of the month, from the history backfill and an earlier run
+        self.store.upsert_sessions("battery1", [{"date": "2025-04-19", "result": 2.5}])
+        self.store.upsert_day_results(date(2025, 4, 19), {
+            ("battery1", "periodEpexResult"): 0.5, ("battery1", "periodTotalResult"): 2.0,
+        })
+        coordinator = self._coordinator()
+        total = FrankEnergieTotalPeriodResultSensor(coordinator, "periodTotalResult", "nettoresultaat", "month", "entry1")
+        battery = FrankEnergieBatteryPeriodResultSensor(coordinator, "battery1", "periodTotalResult", "nettoresultaat", "year")
+        self.assertIsNone(total.state)
+
+        with patch("custom_components.frank_energie_slim.coordinator.datetime") as mock_datetime:
+            mock_datetime.now.return_value = datetime(2025, 4, 20, 12, 0)
+            await coordinator.async_refresh()
+            self.assertEqual(total.state, 3.5)
+            self.assertEqual(battery.state, 3.5)
+            self.assertEqual(battery._attr_unique_id, "battery_battery1_nettoresultaat_ytd")
+            # A later refresh on the same day replaces today's value
+            coordinator.client.get_smart_battery_batch.return_value = {"battery1": {
+                "smartBatterySessions": {"deviceId": "battery1", "periodTotalResult": 2.0, "periodEpexResult": 0.25},
+            }}
+            await coordinator.async_refresh()
+        self.assertEqual(total.state, 4.0)
+        self.assertEqual(coordinator.data.periods[(None, "periodEpexResult")].month, 0.75)
+        # Today's results are stored for the next start
+        index = self.store.load_result_index(["battery1"])
+        self.assertEqual(index.periods(None, "periodEpexResult", date(2025, 4, 20)).all_time, 0.75)
+        self.assertEqual(index.periods(None, "periodTotalResult", date(2025, 4, 20)).all_time, 4.0)
+
+    async def test_kept_session_is_not_indexed_again(self):
+        coordinator = self._coordinator()
+        coordinator.client.get_smart_batteries.return_value = {
+            "data": {"smartBatteries": [{"id": "battery1"}, {"id": "battery2"}]}
+        }
+        today = on_day(RESULTS, "2025-04-20")
+        coordinator.client.get_smart_battery_batch.return_value = today
+        with patch("custom_components.frank_energie_slim.coordinator.datetime") as mock_datetime:
+            mock_datetime.now.return_value = datetime(2025, 4, 20, 12, 0)
+            await coordinator.async_refresh()
+            # The second refresh misses battery2; its session of today is kept but not indexed
+            coordinator.client.get_smart_battery_batch.return_value = {"battery1": today["battery1"], "battery2": {}}
+            with patch.object(coordinator.result_index, "set", wraps=coordinator.result_index.set) as set_result:
+                await coordinator.async_refresh()
+        self.assertEqual(coordinator.data.battery("battery2").session.period_total_result, 2.0)
+        self.assertEqual({call.args[0] for call in set_result.call_args_list}, {"battery1"})
+        self.assertEqual(coordinator.data.periods[("battery2", "periodTotalResult")].month, 2.0)
+
+    async def test_reload_gives_the_same_periods(self):
+        with open(os.path.join(os.path.dirname(__file__), "batterysessions.response.json")) as fixture:
+            sessions = json.load(fixture)["data"]["smartBatterySessions"]
+        coordinator = self._coordinator()
+        coordinator.client.get_smart_battery_batch.return_value = {"battery1": {
+            "smartBatterySessions": {**sessions, "deviceId": "battery1"},
+        }}
+        with patch("custom_components.frank_energie_slim.coordinator.datetime") as mock_datetime:
+            mock_datetime.now.return_value = datetime(2025, 4, 18, 12, 0)
+            await coordinator.async_refresh()
+            # The session's result is the gross trading result, not the net total result
+            self.assertEqual(self.store.get_total("battery1"), sessions["periodTradingResult"])
+            # After a restart the next day, the 18th comes from the stored history only
+            restarted = self._coordinator()
+            restarted.client.get_smart_battery_batch.return_value = {"battery1": {"smartBatterySessions": {
+                "deviceId": "battery1", "periodStartDate": "2025-04-19", "periodEndDate": "2025-04-19",
+                "periodTotalResult": 0.0, "periodTradingResult": 0.0,
+            }}}
+            mock_datetime.now.return_value = datetime(2025, 4, 19, 12, 0)
+            await restarted.async_refresh()
+        for key in (("battery1", "periodTotalResult"), ("battery1", "periodTradingResult")):
+            self.assertEqual(restarted.data.periods[key].all_time, coordinator.data.periods[key].all_time)
+        net = restarted.data.periods[("battery1", "periodTotalResult")]
+        self.assertEqual(net.all_time, round(sessions["periodTotalResult"], 4))
+        gross = restarted.data.periods[("battery1", "periodTradingResult")]
+        self.assertEqual(gross.all_time, round(sessions["periodTradingResult"], 4))
+
+    async def test_entries_sharing_the_store_only_count_their_batteries(self):
+        from custom_components.frank_energie_slim.fleet import FrankEnergieFleet
+        from custom_components.frank_energie_slim.result_index import PeriodResults
+        self.store.upsert_sessions("battery1", [{"date": "2025-04-19", "result": 2.0}])
+        self.store.upsert_sessions("battery2", [{"date": "2025-04-19", "result": 10.0}])
+        first = self._coordinator("entry1", "battery1")
+        second = self._coordinator("entry2", "battery2")
+        # The session history holds the trading result
+        key = (None, "periodTradingResult")
+        with patch("custom_components.frank_energie_slim.coordinator.datetime") as mock_datetime:
+            mock_datetime.now.return_value = datetime(2025, 4, 20, 12, 0)
+            await first.async_refresh()
+            await second.async_refresh()
+            self.assertEqual(first.data.periods[key].month, 2.0)
+            self.assertEqual(second.data.periods[key].month, 10.0)
+            # A history sync of the second entry is not folded into the first
+            self.store.upsert_sessions("battery2", [{"date": "2025-04-18", "result": 5.0}])
+            await first.async_fold_history(date(2025, 4, 18))
+            await second.async_fold_history(date(2025, 4, 18))
+            await first.async_refresh()
+            await second.async_refresh()
+        self.assertEqual(first.data.periods[key].month, 2.0)
+        self.assertEqual(second.data.periods[key].month, 15.0)
+
+        fleet = FrankEnergieFleet(MagicMock(), MagicMock())
+        fleet._members = {"entry1": (None, first), "entry2": (None, second)}
+        self.assertEqual(fleet.period_totals()[key], PeriodResults(17.0, 17.0, 17.0))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+from custom_components.frank_energie_slim.coordinator import EntrySnapshot
+from custom_components.frank_energie_slim.fleet import ClientPool, FrankEnergieFleet
+from custom_components.frank_energie_slim.models import BatteryData, parse_battery_results
+from custom_components.frank_energie_slim.result_index import PeriodResults
+
+class TestClientPool(unittest.TestCase):
+    def test_entries_for_one_account_share_a_client(self):
+        clients = [MagicMock(), MagicMock()]
+        with patch('custom_components.frank_energie_slim.fleet.AsyncFrankEnergie', side_effect=clients) as client_class:
+            pool = ClientPool(MagicMock())
+            first = pool.acquire("a@example.com", "pw", {"authToken": "stored", "refreshToken": "refresh"})
+            second = pool.acquire("a@example.com", "pw")
+            other = pool.acquire("b@example.com", "pw")
+        self.assertIs(first, second)
+        self.assertIsNot(first, other)
+        self.assertEqual(client_class.call_count, 2)
+        self.assertEqual(client_class.call_args_list[0].args[1:], ("stored", "refresh"))
+        # Logging in is left to the first refresh
+        first.set_credentials.assert_called_once_with("a@example.com", "pw")
+        first.login.assert_not_called()
+        pool.release("a@example.com")
+        self.assertEqual(len(pool), 2)
+        pool.release("a@example.com")
+        self.assertEqual(len(pool), 1)
+
+def make_coordinator(*batteries, periods=None):
+    return SimpleNamespace(data=SimpleNamespace(batteries=batteries, periods=periods or {}))
+
+class TestFrankEnergieFleet(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        patcher = patch('custom_components.frank_energie_slim.fleet.async_call_later')
+        self.call_later = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.fleet = FrankEnergieFleet(MagicMock(), MagicMock())
+
+    async def test_one_cycle_refreshes_all_entries(self):
+        first = AsyncMock(return_value=("2025-04-20T11:00:00Z", (("imbalance", 50),)))
+        second = AsyncMock(return_value=("2025-04-20T11:15:00Z", (("imbalance", 70),)))
+        failing = AsyncMock(side_effect=Exception("502 Bad Gateway"))
+        update_totals = MagicMock()
+        self.assertTrue(self.fleet.claim_totals("entry1"))
+        self.assertFalse(self.fleet.claim_totals("entry2"))
+        self.fleet.set_totals_updater(update_totals)
+        data1, data2, data3 = (BatteryData(f"battery{i}") for i in range(1, 4))
+        self.fleet.join("entry1", first, make_coordinator(data1))
+        self.fleet.join("entry2", second, make_coordinator(data2, data3))
+        self.fleet.join("entry3", failing, make_coordinator())
+        # One timer for the whole fleet
+        self.assertEqual(self.call_later.call_count, 1)
+
+        await self.fleet.async_refresh()
+        first.assert_awaited_once()
+        second.assert_awaited_once()
+        update_totals.assert_called_once_with([data1, data2, data3])
+        self.assertEqual(self.fleet.scheduler.last_publish.minute, 15)
+
+    def test_owner_leaving_hands_over_the_totals(self):
+        self.fleet.claim_totals("entry1")
+        self.fleet.join("entry1", AsyncMock(), make_coordinator())
+        self.fleet.join("entry2", AsyncMock(), make_coordinator())
+        self.assertIsNone(self.fleet.leave("entry2"))
+        self.fleet.join("entry2", AsyncMock(), make_coordinator())
+        self.assertEqual(self.fleet.leave("entry1"), "entry2")
+        self.assertTrue(self.fleet.claim_totals("entry2"))
+        cancel = self.call_later.return_value
+        self.fleet.leave("entry2")
+        cancel.assert_called_once()
+
+    def test_battery_of_an_account_shared_by_two_entries_counts_once(self):
+        battery = parse_battery_results({"battery1": {
+            "smartBatterySessions": {"deviceId": "battery1", "periodTotalResult": 2.0},
+        }})["battery1"]
+        self.fleet.join("entry1", AsyncMock(), make_coordinator(battery))
+        self.fleet.join("entry2", AsyncMock(), make_coordinator(battery))
+        battery_data = self.fleet.all_battery_data()
+        self.assertEqual(battery_data, [battery])
+        self.assertEqual(EntrySnapshot.from_battery_data(battery_data).results["periodTotalResult"], 2.0)
+
+    def test_period_totals_across_entries(self):
+        key = (None, "periodTotalResult")
+        self.fleet.join("entry1", AsyncMock(), make_coordinator(periods={
+            key: PeriodResults(1.5, 2.5, 3.5),
+            ("battery1", "periodTotalResult"): PeriodResults(1.0, 2.0, 3.0),
+            ("battery2", "periodTotalResult"): PeriodResults(0.5, 0.5, 0.5),
+        }))
+        # battery2 is also part of the second entry and only counted once
+        self.fleet.join("entry2", AsyncMock(), make_coordinator(periods={
+            key: PeriodResults(0.75, 0.75, 0.75),
+            ("battery2", "periodTotalResult"): PeriodResults(0.5, 0.5, 0.5),
+            ("battery3", "periodTotalResult"): PeriodResults(0.25, 0.25, 0.25),
+        }))
+        self.fleet.join("entry3", AsyncMock(), make_coordinator())
+        self.assertEqual(self.fleet.period_totals(), {key: PeriodResults(1.75, 2.75, 3.75)})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import hashlib
+import json
+import unittest
+from urllib.parse import parse_qs, urlsplit
+from custom_components.frank_energie_slim.graphql import (
+    MAX_GET_URL_LENGTH,
+    compile_query,
+    compiled_for,
+    minify_query,
+    persisted_query_error,
+)
+
+DOCUMENT = """
+    query SmartBatterySummary($deviceId: String!) {
+        smartBatterySummary(deviceId: $deviceId) {
+            lastKnownStateOfCharge
+            totalResult
+        }
+    }
+"""
+
+class TestCompiledQuery(unittest.TestCase):
+    def test_minify(self):
+        self.assertEqual(
+            minify_query(DOCUMENT),
+            "query SmartBatterySummary($deviceId:String!){smartBatterySummary(deviceId:$deviceId)"
+            "{lastKnownStateOfCharge totalResult}}",
+        )
+
+    def test_compiled_once(self):
+        compiled = compile_query("SmartBatterySummary", DOCUMENT)
+        self.assertIs(compile_query("SmartBatterySummary", DOCUMENT), compiled)
+        self.assertIs(compiled_for(compiled.payload({"deviceId": "x"})), compiled)
+        self.assertEqual(compiled.sha256, hashlib.sha256(compiled.document.encode()).hexdigest())
+        self.assertFalse(compiled.mutation)
+
+    def test_bodies(self):
+        compiled = compile_query("SmartBatterySummary", DOCUMENT)
+        variables = {"deviceId": "Battery1"}
+        plain = json.loads(compiled.body(variables))
+        self.assertEqual(plain, compiled.payload(variables))
+        persisted = json.loads(compiled.body(variables, persisted=True))
+        self.assertNotIn("query", persisted)
+        self.assertEqual(persisted["extensions"]["persistedQuery"], {"version": 1, "sha256Hash": compiled.sha256})
+        register = json.loads(compiled.body(variables, register=True))
+        self.assertEqual(register["query"], compiled.document)
+        self.assertEqual(register["extensions"], persisted["extensions"])
+
+    def test_get_url(self):
+        compiled = compile_query("SmartBatterySummary", DOCUMENT)
+        url = compiled.get_url("https://example.com/", {"deviceId": "Battery1"})
+        params = parse_qs(urlsplit(url).query)
+        self.assertEqual(json.loads(params["variables"][0]), {"deviceId": "Battery1"})
+        self.assertEqual(json.loads(params["extensions"][0])["persistedQuery"]["sha256Hash"], compiled.sha256)
+        self.assertIsNone(compiled.get_url("https://example.com/", {"deviceId": "x" * MAX_GET_URL_LENGTH}))
+
+class TestPersistedQueryError(unittest.TestCase):
+    def test_classification(self):
+        self.assertEqual(persisted_query_error({"errors": [{"message": "PersistedQueryNotFound"}]}), "not_found")
+        self.assertEqual(
+            persisted_query_error({"errors": [{"message": "x", "extensions": {"code": "PERSISTED_QUERY_NOT_FOUND"}}]}),
+            "not_found",
+        )
+        self.assertEqual(persisted_query_error({"errors": [{"message": "PersistedQueryNotSupported"}]}), "unsupported")
+        self.assertEqual(persisted_query_error({"errors": [{"message": "Must provide query string."}]}), "unsupported")
+        self.assertIsNone(persisted_query_error({"errors": [{"message": "user-error:auth-not-authorised"}]}))
+        self.assertIsNone(persisted_query_error({"errors": [{"message": "user-error:user-not-found"}]}))
+        self.assertIsNone(persisted_query_error({"data": {"smartBatteries": []}}))
+
+if __name__ == "__main__":
+    unittest.main()
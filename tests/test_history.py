@@ -0,0 +1,188 @@
+import os
+import tempfile
+import unittest
+from datetime import date, datetime, timedelta
+from unittest.mock import MagicMock
+from custom_components.frank_energie_slim.history import SessionHistoryStore, SessionHistorySync
+from custom_components.frank_energie_slim.range_planner import MAX_RANGE_DAYS
+from custom_components.frank_energie_slim.models import BatterySession
+
+def make_hass():
+    """Mock hass that runs executor jobs inline."""
+    hass = MagicMock()
+
+    async def async_add_executor_job(func, *args):
+        return func(*args)
+
+    hass.async_add_executor_job.side_effect = async_add_executor_job
+    return hass
+
+class FakeSessionsClient:
+    """Answers sessions requests from per-day results; requests starting at a day in fail raise."""
+
+    def __init__(self, days, fail=()):
+        self.days = days
+        self.fail = set(fail)
+        self.requests = []
+
+    def _sessions(self, device_id, start, end):
+        return {"deviceId": device_id, "sessions": [
+            {"date": day.isoformat(), "result": result}
+            for day, result in sorted(self.days[device_id].items()) if start <= day <= end
+        ]}
+
+    def _request(self, device_ids, start, end):
+        self.requests.append((tuple(device_ids), start, end))
+        if any((device_id, start) in self.fail for device_id in device_ids):
+            raise Exception("502 Bad Gateway")
+
+    async def get_smart_battery_sessions(self, device_id, start, end):
+        self._request([device_id], start, end)
+        return {"data": {"smartBatterySessions": self._sessions(device_id, start, end)}}
+
+    async def get_smart_battery_batch(self, device_ids, start, end, include_details=True, include_summary=None):
+        self._request(device_ids, start, end)
+        return {device_id: {"smartBatterySessions": self._sessions(device_id, start, end)} for device_id in device_ids}
+
+class TestSessionHistoryStore(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        self.store = SessionHistoryStore(self.path)
+        self.addCleanup(os.remove, self.path)
+        self.addCleanup(self.store.close)
+
+    def test_upsert_and_query_range(self):
+        self.store.upsert_sessions("id123", [
+            {"date": "2025-04-01", "result": 1.0, "cumulativeResult": 1.0},
+            {"date": "2025-04-02T00:00:00.000Z", "result": 2.0, "cumulativeResult": 3.0},
+            {"date": "2025-04-03", "result": 4.0, "cumulativeResult": 7.0},
+        ])
+        sessions = self.store.get_sessions("id123", date(2025, 4, 2), date(2025, 4, 3))
+        self.assertEqual([s['date'] for s in sessions], ["2025-04-02", "2025-04-03"])
+        self.assertEqual(self.store.get_total("id123"), 7.0)
+        self.assertIsNone(self.store.get_settled_through("id123"))
+
+    def test_settled_days_are_immutable(self):
+        self.store.upsert_sessions("id123", [{"date": "2025-04-01", "result": 1.0}], settled_through=date(2025, 4, 1))
+        self.store.upsert_sessions("id123", [
+            {"date": "2025-04-01", "result": 5.0},
+            {"date": "2025-04-02", "result": 2.0},
+        ])
+        self.store.upsert_sessions("id123", [{"date": "2025-04-02", "result": 3.0}])
+        self.assertEqual([s['result'] for s in self.store.get_sessions("id123")], [1.0, 3.0])
+        self.assertEqual(self.store.get_settled_through("id123"), date(2025, 4, 1))
+
+    def test_persists_across_connections(self):
+        self.store.upsert_sessions("id123", [{"date": "2025-04-01", "result": 1.0}], settled_through=date(2025, 4, 1))
+        self.store.close()
+        reopened = SessionHistoryStore(self.path)
+        self.addCleanup(reopened.close)
+        self.assertEqual(reopened.get_settled_through("id123"), date(2025, 4, 1))
+        self.assertEqual(reopened.get_total("id123"), 1.0)
+
+    def test_result_index_from_sessions_and_day_results(self):
+        self.store.upsert_sessions("id123", [
+            {"date": "2025-03-31", "result": 2.0},
+            {"date": "2025-04-01", "result": 1.0},
+        ])
+        stored = self.store.upsert_day_results(date(2025, 4, 1), {
+            ("id123", "periodEpexResult"): 0.25,
+            ("id123", "periodTotalResult"): 0.75,
+            # Stored with the session instead
+            ("id123", "periodTradingResult"): 1.0,
+        })
+        self.assertEqual(stored, 2)
+        self.store.upsert_day_results(date(2025, 4, 1), {("id123", "periodEpexResult"): 0.5})
+        # Another entry's battery in the same database
+        self.store.upsert_sessions("other", [{"date": "2025-04-01", "result": 4.0}])
+        self.store.upsert_day_results(date(2025, 4, 1), {("other", "periodEpexResult"): 1.0})
+        index = self.store.load_result_index(["id123"])
+        self.assertEqual(index.periods("id123", "periodTradingResult", date(2025, 4, 1)).month, 1.0)
+        self.assertEqual(index.periods(None, "periodTradingResult", date(2025, 4, 1)).month, 1.0)
+        self.assertEqual(index.periods("id123", "periodTradingResult", date(2025, 4, 1)).year, 3.0)
+        # The net total result only comes from the stored day results
+        self.assertEqual(index.periods("id123", "periodTotalResult", date(2025, 4, 1)).year, 0.75)
+        self.assertEqual(index.periods(None, "periodEpexResult", date(2025, 4, 1)).all_time, 0.5)
+
+class TestSessionHistorySync(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        self.store = SessionHistoryStore(self.path)
+        self.addCleanup(os.remove, self.path)
+        self.addCleanup(self.store.close)
+
+    async def test_backfills_once_then_syncs_from_last_settled_day(self):
+        client = FakeSessionsClient({"id123": {
+            date(2025, 4, 8): 1.0, date(2025, 4, 9): 2.0, date(2025, 4, 10): 3.0,
+        }})
+        sync = SessionHistorySync(make_hass(), client, self.store)
+
+        await sync.async_sync(["id123"], date(2025, 4, 10))
+        # The year is fetched in chunks of at most a month
+        self.assertEqual(len(client.requests), 12)
+        self.assertEqual(client.requests[0][1], date(2025, 4, 10) - timedelta(days=365))
+        self.assertTrue(all((end - start).days < MAX_RANGE_DAYS for _, start, end in client.requests))
+        self.assertEqual(self.store.get_settled_through("id123"), date(2025, 4, 8))
+
+        client.days["id123"].update({date(2025, 4, 9): 2.5, date(2025, 4, 10): 3.5, date(2025, 4, 11): 4.0})
+        client.requests.clear()
+        self.assertEqual(await sync.async_sync(["id123"], date(2025, 4, 11)), date(2025, 4, 9))
+        self.assertEqual(client.requests, [(("id123",), date(2025, 4, 9), date(2025, 4, 11))])
+        self.assertEqual(self.store.get_total("id123"), 1.0 + 2.5 + 3.5 + 4.0)
+
+    async def test_sync_if_due_is_throttled(self):
+        client = FakeSessionsClient({"id123": {}})
+        sync = SessionHistorySync(make_hass(), client, self.store)
+        self.assertTrue(await sync.async_sync_if_due(["id123"], datetime(2025, 4, 10, 12)))
+        requests = len(client.requests)
+        self.assertFalse(await sync.async_sync_if_due(["id123"], datetime.now()))
+        self.assertEqual(len(client.requests), requests)
+
+    async def test_failed_chunk_is_retried_without_refetching_held_days(self):
+        days = {date(2025, 1, 1) + timedelta(days=offset): 1.0 for offset in range(100)}
+        client = FakeSessionsClient({"id123": days}, fail={("id123", date(2025, 2, 1))})
+        sync = SessionHistorySync(make_hass(), client, self.store)
+        self.store.upsert_sessions("id123", [], settled_through=date(2024, 12, 31))
+
+        await sync.async_sync(["id123"], date(2025, 4, 10))
+        # Later syncs start at the failed chunk; the chunks after it are already held
+        self.assertEqual(self.store.get_settled_through("id123"), date(2025, 1, 31))
+        self.assertEqual(self.store.get_total("id123"), 100 - 31)
+
+        client.fail.clear()
+        client.requests.clear()
+        await sync.async_sync(["id123"], date(2025, 4, 10))
+        self.assertEqual(client.requests, [
+            (("id123",), date(2025, 2, 1), date(2025, 3, 3)),
+            (("id123",), date(2025, 4, 9), date(2025, 4, 10)),
+        ])
+        self.assertEqual(self.store.get_total("id123"), 100)
+        self.assertEqual(self.store.get_settled_through("id123"), date(2025, 4, 8))
+
+    async def test_batteries_share_requests_and_fail_independently(self):
+        client = FakeSessionsClient({"id123": {date(2025, 4, 10): 2.0}, "id456": {date(2025, 4, 10): 1.0}})
+        sync = SessionHistorySync(make_hass(), client, self.store)
+        for device_id in ("id123", "id456"):
+            self.store.upsert_sessions(device_id, [], settled_through=date(2025, 4, 7))
+        await sync.async_sync(["id123", "id456"], date(2025, 4, 10))
+        self.assertEqual(client.requests, [(("id123", "id456"), date(2025, 4, 8), date(2025, 4, 10))])
+        self.assertEqual(self.store.get_total(), 3.0)
+
+        self.store.upsert_sessions("id456", [], settled_through=date(2025, 4, 9))
+        client.fail.add(("id123", date(2025, 4, 9)))
+        self.assertEqual(await sync.async_sync(["id123", "id456"], date(2025, 4, 11)), date(2025, 4, 10))
+        self.assertEqual(self.store.get_settled_through("id123"), date(2025, 4, 8))
+        self.assertEqual(self.store.get_settled_through("id456"), date(2025, 4, 9))
+
+    async def test_store_periods_from_refresh(self):
+        sync = SessionHistorySync(make_hass(), MagicMock(), self.store)
+        await sync.async_store_periods([
+            BatterySession.from_dict({"deviceId": "id123", "sessions": [{"date": "2025-04-10", "result": 0.3}]}),
+            BatterySession(device_id="id456"),
+        ])
+        self.assertEqual(self.store.get_total(), 0.3)
+
+if __name__ == "__main__":
+    unittest.main()
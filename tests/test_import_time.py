@@ -0,0 +1,67 @@
+import os
+import subprocess
+import sys
+import unittest
+
+# Cumulative import time of the sensor platform, in milliseconds. Raise it only deliberately;
+# current releases import in roughly half of this.
+IMPORT_TIME_BUDGET_MS = 100
+
+# Home Assistant has loaded these before it imports the platform, so they are not counted
+PRELOADED = [
+    "aiohttp",
+    "homeassistant.config_entries",
+    "homeassistant.helpers.aiohttp_client",
+    "homeassistant.helpers.device_registry",
+    "homeassistant.helpers.entity",
+    "homeassistant.helpers.entity_platform",
+    "homeassistant.helpers.entity_registry",
+    "homeassistant.helpers.event",
+    "homeassistant.helpers.storage",
+    # Used by most core integrations; it imports requests itself
+    "homeassistant.helpers.update_coordinator",
+]
+PLATFORM = "custom_components.frank_energie_slim.sensor"
+# Only needed by fleet mode or once setup runs
+DEFERRED = [
+    "sqlite3",
+    "custom_components.frank_energie_slim.fleet",
+    "custom_components.frank_energie_slim.history",
+    "custom_components.frank_energie_slim.range_planner",
+    "custom_components.frank_energie_slim.long_term_statistics",
+]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_import(code, *args):
+    return subprocess.run(
+        [sys.executable, *args, "-c", f"import {', '.join(PRELOADED)}; {code}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+
+
+def parse_importtime(stderr):
+    """Cumulative microseconds per module from -X importtime output."""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line.split("|")
+        times[module.strip()] = int(cumulative)
+    return times
+
+
+class TestImportTime(unittest.TestCase):
+    def test_heavy_dependencies_are_imported_lazily(self):
+        result = run_import(f"import sys, {PLATFORM}; print(','.join(m for m in {DEFERRED!r} if m in sys.modules))")
+        self.assertEqual(result.stdout.strip(), "")
+
+    def test_platform_import_within_budget(self):
+        # Warm up the bytecode cache so only the import itself is measured
+        run_import(f"import {PLATFORM}")
+        timings = [parse_importtime(run_import(f"import {PLATFORM}", "-X", "importtime").stderr)[PLATFORM] for _ in range(3)]
+        self.assertLess(min(timings) / 1000, IMPORT_TIME_BUDGET_MS)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+from datetime import date, datetime, timezone
+from unittest.mock import MagicMock, patch
+from custom_components.frank_energie_slim.history import SessionHistoryStore
+from custom_components.frank_energie_slim.long_term_statistics import (
+    TOTAL_STATISTIC_ID,
+    async_import_statistics,
+    build_statistics,
+    get_battery_statistic_id,
+)
+
+def make_hass():
+    """Mock hass with the recorder loaded that runs executor jobs inline."""
+    hass = MagicMock()
+    hass.config.components = {"recorder"}
+
+    async def async_add_executor_job(func, *args):
+        return func(*args)
+
+    hass.async_add_executor_job.side_effect = async_add_executor_job
+    return hass
+
+class TestBuildStatistics(unittest.TestCase):
+    def test_running_sum_from_base(self):
+        rows = build_statistics([(date(2025, 4, 1), 1.5), (date(2025, 4, 2), -0.5)], base_sum=10.0)
+        self.assertEqual([row["sum"] for row in rows], [11.5, 11.0])
+        self.assertEqual([row["state"] for row in rows], [1.5, -0.5])
+        self.assertEqual(rows[0]["start"].date(), date(2025, 4, 1))
+        self.assertIsNotNone(rows[0]["start"].tzinfo)
+
+    def test_statistic_id_is_valid(self):
+        self.assertEqual(get_battery_statistic_id("ID-123"), "frank_energie_slim:battery_id_123_result")
+
+class TestImportStatistics(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        self.store = SessionHistoryStore(self.path)
+        self.addCleanup(os.remove, self.path)
+        self.addCleanup(self.store.close)
+        for device_id, results in [("a", [1.0, 2.0, 3.0, 4.0]), ("b", [10.0, 20.0, 30.0, 40.0])]:
+            self.store.upsert_sessions(device_id, [
+                {"date": f"2025-04-0{day + 1}", "result": result} for day, result in enumerate(results)
+            ])
+
+    async def _import(self, last_statistics):
+        hass = make_hass()
+        recorder = MagicMock()
+
+        async def recorder_executor_job(func, *args):
+            return last_statistics.get(args[2], {})
+
+        recorder.async_add_executor_job.side_effect = recorder_executor_job
+        imported = {}
+        with patch('homeassistant.components.recorder.get_instance', return_value=recorder), \
+                patch('homeassistant.components.recorder.statistics.async_add_external_statistics',
+                      side_effect=lambda hass, metadata, rows: imported.__setitem__(metadata["statistic_id"], rows)):
+            await async_import_statistics(hass, self.store, ["a", "b"])
+        return imported
+
+    async def test_first_import_backfills_everything(self):
+        imported = await self._import({})
+        self.assertEqual([row["sum"] for row in imported[get_battery_statistic_id("a")]], [1.0, 3.0, 6.0, 10.0])
+        self.assertEqual([row["state"] for row in imported[TOTAL_STATISTIC_ID]], [11.0, 22.0, 33.0, 44.0])
+
+    async def test_incremental_import_resends_unsettled_tail(self):
+        statistic_id = get_battery_statistic_id("a")
+        last_start = datetime(2025, 4, 4, tzinfo=timezone.utc).timestamp()
+        imported = await self._import({statistic_id: {statistic_id: [{"start": last_start, "sum": 10.0}]}})
+        rows = imported[statistic_id]
+        # Resume two days before the last imported day, continuing the sum from the store
+        self.assertEqual([row["start"].date() for row in rows], [date(2025, 4, 2), date(2025, 4, 3), date(2025, 4, 4)])
+        self.assertEqual([row["sum"] for row in rows], [3.0, 6.0, 10.0])
+
+    async def test_skipped_without_recorder(self):
+        hass = make_hass()
+        hass.config.components = set()
+        with patch('homeassistant.components.recorder.statistics.async_add_external_statistics') as add:
+            await async_import_statistics(hass, self.store, ["a"])
+        add.assert_not_called()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+import unittest
+from datetime import date
+from custom_components.frank_energie_slim.metrics import ApiMetrics, LatencyHistogram
+
+class TestLatencyHistogram(unittest.TestCase):
+    def test_buckets(self):
+        histogram = LatencyHistogram(buckets=(100, 1000))
+        for duration in (20, 100, 500, 4000):
+            histogram.record(duration)
+        result = histogram.as_dict()
+        self.assertEqual(result["buckets_ms"], {"<=100": 2, "<=1000": 1, ">1000": 1})
+        self.assertEqual(result["count"], 4)
+        self.assertEqual(result["max_ms"], 4000)
+        self.assertEqual(result["avg_ms"], 1155.0)
+
+class TestApiMetrics(unittest.TestCase):
+    def test_calls_per_operation_and_day(self):
+        now = [0.0]
+        today = [date(2025, 4, 20)]
+        metrics = ApiMetrics(clock=lambda: now[0], today=lambda: today[0])
+        started = metrics.start()
+        now[0] = 0.25
+        metrics.record("SmartBatteries", started, 100, 2000)
+        metrics.record("SmartBatteries", started, 100, 0, error=Exception("HTTP 502"))
+        metrics.record_retry("SmartBatteries")
+        stats = metrics.as_dict()["operations"]["SmartBatteries"]
+        self.assertEqual((stats["calls"], stats["errors"], stats["retries"]), (2, 1, 1))
+        self.assertEqual((stats["bytes_sent"], stats["bytes_received"]), (200, 2000))
+        self.assertEqual(stats["latency"]["max_ms"], 250)
+        self.assertEqual(metrics.calls_today, 2)
+        today[0] = date(2025, 4, 21)
+        self.assertEqual(metrics.calls_today, 0)
+        metrics.record("Login", metrics.start())
+        self.assertEqual(metrics.calls_today, 1)
+        self.assertEqual(metrics.total_calls, 3)
+
+if __name__ == "__main__":
+    unittest.main()
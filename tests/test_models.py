@@ -0,0 +1,55 @@
+import json
+import os
+import unittest
+from custom_components.frank_energie_slim.models import (
+    Battery,
+    BatterySession,
+    BatterySummary,
+    parse_battery_result,
+    parse_battery_results,
+)
+
+def load_json(filename):
+    with open(os.path.join(os.path.dirname(__file__), filename), "r") as f:
+        return json.load(f)
+
+class TestModels(unittest.TestCase):
+    def test_parse_battery_result(self):
+        result = dict(load_json("batterysessions.response.json")["data"])
+        result.update(load_json("batterydetails.response.json")["data"])
+        data = parse_battery_result("id123", result)
+        self.assertEqual(data.session.device_id, "id123")
+        self.assertAlmostEqual(data.session.get_result("periodTotalResult"), 0.19538372)
+        self.assertIsNone(data.session.period_trade_index)
+        self.assertEqual(data.session.sessions[0].date, "2025-04-18")
+        self.assertEqual(data.battery.brand, "SolarEdge")
+        self.assertEqual(data.battery.settings.mode, "imbalance_aggressive")
+        self.assertEqual(data.summary.state_of_charge, 72)
+        self.assertEqual(data.summary.last_update, "2025-04-20T11:30:00.000Z")
+
+    def test_parts_that_were_not_fetched_are_none(self):
+        data = parse_battery_results({"id123": {"smartBatterySessions": None}, "id456": None})
+        self.assertIsNone(data["id123"].session)
+        self.assertIsNone(data["id123"].battery)
+        self.assertIsNone(data["id456"].summary)
+
+    def test_malformed_values_become_none(self):
+        session = BatterySession.from_dict(
+            {"periodTotalResult": "1.5", "periodEpexResult": "n/a", "sessions": [{"result": 1}, None]},
+            device_id="id123",
+        )
+        self.assertEqual(session.device_id, "id123")
+        self.assertEqual(session.get_result("periodTotalResult"), 1.5)
+        self.assertIsNone(session.get_result("periodEpexResult"))
+        self.assertIsNone(session.get_result("unknownField"))
+        self.assertEqual(session.sessions, ())
+        self.assertIsNone(BatterySummary.from_dict({"lastKnownStateOfCharge": True}).state_of_charge)
+
+    def test_models_are_slotted_and_frozen(self):
+        battery = Battery.from_dict({"brand": "SolarEdge"})
+        self.assertFalse(hasattr(battery, "__dict__"))
+        with self.assertRaises(AttributeError):
+            battery.brand = "Other"
+
+if __name__ == "__main__":
+    unittest.main()
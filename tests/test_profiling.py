@@ -0,0 +1,42 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+from custom_components.frank_energie_slim.profiling import async_profile_refresh
+
+def make_hass(config_dir):
+    hass = MagicMock()
+    hass.config.path.side_effect = lambda *parts: os.path.join(config_dir, *parts)
+
+    async def run(func, *args):
+        return func(*args)
+
+    hass.async_add_executor_job.side_effect = run
+    return hass
+
+class TestProfileRefresh(unittest.IsolatedAsyncioTestCase):
+    async def test_writes_profile_and_report(self):
+        async def refresh():
+            sorted(str(i) for i in range(20000))
+
+        with tempfile.TemporaryDirectory() as config_dir:
+            summary = await async_profile_refresh(make_hass(config_dir), "entry1", refresh)
+            self.assertTrue(os.path.exists(summary["profile"]))
+            with open(summary["report"]) as f:
+                report = f.read()
+        self.assertIsNone(summary["error"])
+        self.assertGreater(summary["function_calls"], 20000)
+        self.assertGreater(summary["peak_memory_kib"], 0)
+        self.assertIn("Top 25 allocations", report)
+        self.assertIn("test_profiling.py", report)
+
+    async def test_failing_refresh_is_reported(self):
+        async def refresh():
+            raise Exception("502 Bad Gateway")
+
+        with tempfile.TemporaryDirectory() as config_dir:
+            summary = await async_profile_refresh(make_hass(config_dir), "entry1", refresh)
+        self.assertEqual(summary["error"], "Exception('502 Bad Gateway')")
+
+if __name__ == "__main__":
+    unittest.main()
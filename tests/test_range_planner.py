@@ -0,0 +1,83 @@
+import asyncio
+import unittest
+from datetime import date, timedelta
+from unittest.mock import AsyncMock, MagicMock
+from custom_components.frank_energie_slim.range_planner import (
+    RangeRequest,
+    async_fetch_session_ranges,
+    plan_ranges,
+    plan_requests,
+)
+
+def sessions(device_id, *days):
+    return {"deviceId": device_id, "sessions": [{"date": day, "result": 1.0} for day in days]}
+
+class TestPlanRanges(unittest.TestCase):
+    def test_long_range_is_chunked(self):
+        ranges = plan_ranges(date(2025, 1, 1), date(2025, 3, 10), max_days=31)
+        self.assertEqual(ranges, [
+            (date(2025, 1, 1), date(2025, 1, 31)),
+            (date(2025, 2, 1), date(2025, 3, 3)),
+            (date(2025, 3, 4), date(2025, 3, 10)),
+        ])
+
+    def test_held_days_are_skipped(self):
+        held = {date(2025, 1, 3), date(2025, 1, 4), date(2025, 1, 10)}
+        self.assertEqual(plan_ranges(date(2025, 1, 1), date(2025, 1, 10), held), [
+            (date(2025, 1, 1), date(2025, 1, 2)),
+            (date(2025, 1, 5), date(2025, 1, 9)),
+        ])
+        self.assertEqual(plan_ranges(date(2025, 1, 3), date(2025, 1, 4), held), [])
+
+    def test_batteries_with_the_same_range_are_batched(self):
+        week = (date(2025, 4, 4), date(2025, 4, 10))
+        year = (date(2024, 4, 10), date(2024, 5, 10))
+        requests = plan_requests({"a": [year, week], "b": [week], "c": [week]}, max_battery_days=14)
+        self.assertEqual(requests, [
+            RangeRequest(*year, ("a",)),
+            RangeRequest(*week, ("a", "b")),
+            RangeRequest(*week, ("c",)),
+        ])
+
+class TestFetchSessionRanges(unittest.IsolatedAsyncioTestCase):
+    async def test_chunks_are_merged_in_date_order(self):
+        client = MagicMock()
+
+        async def get_sessions(device_id, start, end):
+            # Later chunks answer first
+            await asyncio.sleep(0.01 if start.month == 1 else 0)
+            return {"data": {"smartBatterySessions": sessions(device_id, start.isoformat(), end.isoformat())}}
+
+        client.get_smart_battery_sessions = AsyncMock(side_effect=get_sessions)
+        ranges = plan_ranges(date(2025, 1, 1), date(2025, 3, 10))
+        results = await async_fetch_session_ranges(client, {"a": ranges}, max_concurrency=4)
+        days = [session.date for session in results["a"].sessions]
+        self.assertEqual(days, sorted(days))
+        self.assertEqual(len(days), 6)
+        self.assertIsNone(results["a"].first_gap)
+
+    async def test_failures_only_affect_their_ranges(self):
+        client = MagicMock()
+        client.get_smart_battery_batch = AsyncMock(return_value={
+            "a": {"smartBatterySessions": sessions("a", "2025-04-10")},
+            "b": {"smartBatterySessions": None},
+        })
+        client.get_smart_battery_sessions = AsyncMock(side_effect=Exception("504 Gateway Timeout"))
+        week = (date(2025, 4, 4), date(2025, 4, 10))
+        earlier = (date(2025, 3, 1), date(2025, 3, 31))
+        results = await async_fetch_session_ranges(client, {"a": [earlier, week], "b": [week]})
+        self.assertEqual([session.date for session in results["a"].sessions], ["2025-04-10"])
+        self.assertEqual(results["a"].first_gap, date(2025, 3, 1))
+        self.assertEqual(results["b"].failed_ranges, [week])
+        client.get_smart_battery_batch.assert_awaited_once_with(
+            ["a", "b"], *week, include_details=False, include_summary=False
+        )
+
+    async def test_authentication_error_is_raised(self):
+        client = MagicMock()
+        client.get_smart_battery_sessions = AsyncMock(side_effect=Exception("Authentication required"))
+        with self.assertRaisesRegex(Exception, "Authentication required"):
+            await async_fetch_session_ranges(client, {"a": [(date(2025, 4, 1), date(2025, 4, 1) + timedelta(days=1))]})
+
+if __name__ == "__main__":
+    unittest.main()
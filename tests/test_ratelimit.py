@@ -0,0 +1,76 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock
+from custom_components.frank_energie_slim.ratelimit import (
+    RetryPolicy,
+    TokenBucket,
+    TransientError,
+    parse_retry_after,
+    remaining_time,
+    request_deadline,
+)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestTokenBucket(unittest.IsolatedAsyncioTestCase):
+    def test_burst_then_rate(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, capacity=3, clock=clock)
+        self.assertEqual([bucket.reserve() for _ in range(3)], [0.0, 0.0, 0.0])
+        self.assertAlmostEqual(bucket.reserve(), 0.5)
+        self.assertAlmostEqual(bucket.reserve(), 1.0)
+        clock.now = 10
+        # Refills up to the burst size only
+        self.assertEqual([bucket.reserve() for _ in range(3)], [0.0, 0.0, 0.0])
+        self.assertAlmostEqual(bucket.reserve(), 0.5)
+
+    async def test_wait_beyond_deadline_is_refused(self):
+        bucket = TokenBucket(rate=1, capacity=1, clock=FakeClock())
+        with request_deadline(0.5):
+            await bucket.acquire()
+            with self.assertRaises(asyncio.TimeoutError):
+                await bucket.acquire()
+        # The refused request did not consume a token
+        self.assertAlmostEqual(bucket.reserve(), 1.0)
+
+class TestRetryPolicy(unittest.IsolatedAsyncioTestCase):
+    def test_backoff_is_jittered_and_capped(self):
+        policy = RetryPolicy(base_delay=1, max_delay=4)
+        for retry in range(6):
+            delay = policy.backoff(retry)
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(delay, min(4, 2 ** retry))
+        self.assertEqual(policy.backoff(0, retry_after=3), 3)
+        self.assertEqual(parse_retry_after("2"), 2.0)
+        self.assertIsNone(parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"))
+
+    async def test_retries_transient_errors_only(self):
+        policy = RetryPolicy(attempts=3, base_delay=0)
+        func = AsyncMock(side_effect=[TransientError("HTTP 502"), TransientError("HTTP 503"), "ok"])
+        self.assertEqual(await policy.async_call(func), "ok")
+        func = AsyncMock(side_effect=[TransientError("HTTP 502")] * 3)
+        with self.assertRaises(TransientError):
+            await policy.async_call(func)
+        self.assertEqual(func.await_count, 3)
+        func = AsyncMock(side_effect=Exception("Authentication required"))
+        with self.assertRaises(Exception):
+            await policy.async_call(func)
+        self.assertEqual(func.await_count, 1)
+
+    async def test_no_retry_past_deadline(self):
+        policy = RetryPolicy(attempts=5)
+        func = AsyncMock(side_effect=TransientError("HTTP 429", retry_after=30))
+        with request_deadline(5):
+            self.assertLessEqual(remaining_time(), 5)
+            with self.assertRaises(TransientError):
+                await policy.async_call(func)
+        self.assertEqual(func.await_count, 1)
+        self.assertIsNone(remaining_time())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+from datetime import date
+from custom_components.frank_energie_slim.result_index import PeriodResults, PrefixSumSeries, ResultIndex
+
+class TestPrefixSumSeries(unittest.TestCase):
+    def test_range_sums(self):
+        series = PrefixSumSeries()
+        for day, value in ((1, 1.0), (2, 2.0), (3, 4.0)):
+            series.set(date(2025, 4, day), value)
+        self.assertEqual(series.sum(), 7.0)
+        self.assertEqual(series.sum(date(2025, 4, 2), date(2025, 4, 3)), 6.0)
+        self.assertEqual(series.sum(date(2025, 4, 2), date(2025, 4, 2)), 2.0)
+        # Ranges are clamped to the stored days
+        self.assertEqual(series.sum(date(2025, 3, 1), date(2025, 5, 1)), 7.0)
+        self.assertEqual(series.sum(date(2025, 5, 1)), 0.0)
+        self.assertEqual(series.sum(None, date(2025, 3, 31)), 0.0)
+
+    def test_updating_today_only_changes_the_last_day(self):
+        series = PrefixSumSeries()
+        series.set(date(2025, 4, 1), 1.0)
+        series.set(date(2025, 4, 2), 0.5)
+        self.assertEqual(series.set(date(2025, 4, 2), 0.75), 0.25)
+        self.assertEqual(series.get(date(2025, 4, 2)), 0.75)
+        self.assertEqual(series.sum(), 1.75)
+
+    def test_gaps_and_earlier_days(self):
+        series = PrefixSumSeries()
+        series.set(date(2025, 4, 10), 2.0)
+        series.set(date(2025, 4, 13), 3.0)
+        self.assertEqual(len(series), 4)
+        self.assertEqual(series.get(date(2025, 4, 11)), 0.0)
+        # A backfilled day before the first day
+        series.set(date(2025, 4, 8), 1.0)
+        self.assertEqual(series.get(date(2025, 4, 8)), 1.0)
+        self.assertEqual(series.sum(), 6.0)
+        # A corrected day in the middle
+        series.set(date(2025, 4, 10), 1.5)
+        self.assertEqual(series.sum(date(2025, 4, 10)), 4.5)
+
+class TestResultIndex(unittest.TestCase):
+    def test_periods_per_battery_and_in_total(self):
+        index = ResultIndex()
+        index.set("battery1", "periodTotalResult", date(2024, 12, 31), 5.0)
+        index.set("battery1", "periodTotalResult", date(2025, 3, 31), 2.0)
+        index.set("battery1", "periodTotalResult", date(2025, 4, 1), 1.0)
+        index.set("battery2", "periodTotalResult", date(2025, 4, 1), 0.5)
+        index.set("battery2", "periodTotalResult", date(2025, 4, 2), 0.25)
+        today = date(2025, 4, 2)
+        self.assertEqual(index.periods("battery1", "periodTotalResult", today), PeriodResults(1.0, 3.0, 8.0))
+        self.assertEqual(index.periods(None, "periodTotalResult", today), PeriodResults(1.75, 3.75, 8.75))
+        # A refresh later that day moves the battery and the totals by the difference
+        index.set("battery2", "periodTotalResult", today, 0.5)
+        self.assertEqual(index.periods(None, "periodTotalResult", today), PeriodResults(2.0, 4.0, 9.0))
+        self.assertEqual(index.periods("battery3", "periodTotalResult", today), PeriodResults())
+
+    def test_period_results_are_rounded(self):
+        index = ResultIndex()
+        for day in range(1, 4):
+            index.set("battery1", "periodEpexResult", date(2025, 4, day), 0.1)
+        results = index.period_results(["battery1"], ["periodEpexResult"], date(2025, 4, 3))
+        self.assertEqual(results[("battery1", "periodEpexResult")].month, 0.3)
+        self.assertEqual(results[(None, "periodEpexResult")].all_time, 0.3)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+from custom_components.frank_energie_slim.scheduler import AdaptivePollScheduler, parse_last_update
+
+T0 = datetime(2025, 4, 20, 11, 0, tzinfo=timezone.utc)
+
+def iso(value):
+    return value.isoformat().replace('+00:00', 'Z')
+
+class TestParseLastUpdate(unittest.TestCase):
+    def test_parses_zulu_timestamp(self):
+        self.assertEqual(parse_last_update("2025-04-20T11:30:00.000Z"), datetime(2025, 4, 20, 11, 30, tzinfo=timezone.utc))
+
+    def test_invalid_values(self):
+        self.assertIsNone(parse_last_update(None))
+        self.assertIsNone(parse_last_update("not a date"))
+
+class TestAdaptivePollScheduler(unittest.TestCase):
+    def test_default_interval_without_history(self):
+        scheduler = AdaptivePollScheduler()
+        self.assertEqual(scheduler.next_delay(T0), timedelta(minutes=5))
+
+    def test_learns_cadence_and_polls_after_predicted_publish(self):
+        scheduler = AdaptivePollScheduler()
+        for i in range(3):
+            scheduler.record(iso(T0 + timedelta(minutes=15 * i)), ("mode", i))
+        self.assertEqual(scheduler.cadence, timedelta(minutes=15))
+        # Last publish at 11:30, next expected at 11:45 plus grace
+        now = T0 + timedelta(minutes=32)
+        self.assertEqual(scheduler.next_delay(now), timedelta(minutes=13, seconds=30))
+
+    def test_backs_off_when_predicted_publish_is_missed(self):
+        scheduler = AdaptivePollScheduler()
+        for i in range(3):
+            scheduler.record(iso(T0 + timedelta(minutes=15 * i)), ("mode", i))
+        scheduler.record(iso(T0 + timedelta(minutes=30)), ("mode", 3))
+        first = scheduler.next_delay(T0 + timedelta(minutes=46))
+        scheduler.record(iso(T0 + timedelta(minutes=30)), ("mode", 4))
+        second = scheduler.next_delay(T0 + timedelta(minutes=48))
+        self.assertEqual(first, timedelta(minutes=2))
+        self.assertEqual(second, timedelta(minutes=4))
+        # A new publish resets the backoff
+        scheduler.record(iso(T0 + timedelta(minutes=45)), ("mode", 5))
+        self.assertEqual(scheduler.next_delay(T0 + timedelta(minutes=50)), timedelta(minutes=10, seconds=30))
+
+    def test_backs_off_when_values_are_flat(self):
+        scheduler = AdaptivePollScheduler()
+        for i in range(4):
+            scheduler.record(iso(T0 + timedelta(minutes=5 * i)), ("mode", 50))
+        delay = scheduler.next_delay(T0 + timedelta(minutes=16))
+        self.assertEqual(delay, timedelta(minutes=10))
+
+    def test_delay_is_clamped(self):
+        scheduler = AdaptivePollScheduler()
+        scheduler.record(iso(T0))
+        for _ in range(50):
+            scheduler.record(iso(T0), ("mode", 50))
+        scheduler.record(iso(T0 + timedelta(minutes=5)), ("mode", 50))
+        self.assertEqual(scheduler.next_delay(T0 + timedelta(minutes=6)), timedelta(minutes=30))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,10 @@
 import unittest
-from unittest.mock import patch, MagicMock, call
-from custom_components.frank_energie_slim.sensor import FrankEnergieBatterySessionResultSensor, get_battery_mode_from_settings
-from custom_components.frank_energie_slim.api import FrankEnergie
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock, AsyncMock, call
+from datetime import datetime
+from custom_components.frank_energie_slim.sensor import get_battery_mode_from_settings
+from custom_components.frank_energie_slim.coordinator import EntrySnapshot
+from custom_components.frank_energie_slim.models import parse_battery_results
 from custom_components.frank_energie_slim.entities import (
     FrankEnergieBatterySessionResultSensor,
     FrankEnergieBatteryModeSensor,
@@ -10,11 +13,16 @@ from custom_components.frank_energie_slim.entities import (
     FrankEnergieTotalAvgSocSensor,
     FrankEnergieTotalLastModeSensor,
 )
-from custom_components.frank_energie_slim.api import FrankEnergie
+
+def make_coordinator(results=None, attributes=None):
+    """Stand-in for a coordinator whose snapshot holds the given per-battery results."""
+    battery_data = parse_battery_results(results or {}).values()
+    return SimpleNamespace(
+        hass=None, last_update_success=True, data=EntrySnapshot.from_battery_data(battery_data, attributes)
+    )
 
 class TestFrankEnergieBatterySessionResultSensor(unittest.TestCase):
-    @patch('custom_components.frank_energie_slim.api.requests.post')
-    def test_battery_session_result_sensors(self, mock_post):
+    def test_battery_session_result_sensors(self):
         # Load mock session data as would be returned by the API
         session = {
             "deviceId": "id123",
@@ -25,12 +33,13 @@ class TestFrankEnergieBatterySessionResultSensor(unittest.TestCase):
             "periodImbalanceResult": 0.24638372,
             "periodTotalResult": 0.19538371999999998,
         }
+        coordinator = make_coordinator({"id123": {"smartBatterySessions": session}})
         # Test each result sensor
         sensors = [
-            (FrankEnergieBatterySessionResultSensor(None, session, 'periodEpexResult', 'epex'), -0.10908, 'EPEX-correctie vandaag'),
-            (FrankEnergieBatterySessionResultSensor(None, session, 'periodFrankSlim', 'frankslim'), 0.05807999999999999, 'Frank Slim vandaag'),
-            (FrankEnergieBatterySessionResultSensor(None, session, 'periodImbalanceResult', 'handelsresultaat'), 0.24638372, 'Handelsresultaat vandaag'),
-            (FrankEnergieBatterySessionResultSensor(None, session, 'periodTotalResult', 'nettoresultaat'), 0.19538371999999998, 'Totaalresultaat vandaag'),
+            (FrankEnergieBatterySessionResultSensor(coordinator, "id123", 'periodEpexResult', 'epex'), -0.10908, 'EPEX-correctie vandaag'),
+            (FrankEnergieBatterySessionResultSensor(coordinator, "id123", 'periodFrankSlim', 'frankslim'), 0.05807999999999999, 'Frank Slim vandaag'),
+            (FrankEnergieBatterySessionResultSensor(coordinator, "id123", 'periodImbalanceResult', 'handelsresultaat'), 0.24638372, 'Handelsresultaat vandaag'),
+            (FrankEnergieBatterySessionResultSensor(coordinator, "id123", 'periodTotalResult', 'nettoresultaat'), 0.19538371999999998, 'Totaalresultaat vandaag'),
         ]
         for sensor, expected_state, expected_name in sensors:
             self.assertEqual(sensor.state, expected_state)
@@ -48,53 +57,114 @@ class TestFrankEnergieEntities(unittest.TestCase):
             "periodTotalResult": 0.19538,
             "periodTradingResult": 0.30446,
         }
-        self.details = {
+        self.coordinator = make_coordinator({"id123": {
+            "smartBatterySessions": self.session,
             "smartBattery": {"brand": "SolarEdge", "provider": "SOLAREDGE", "settings": {"batteryMode": "auto"}},
-            "smartBatterySummary": {"lastKnownStateOfCharge": 77}
-        }
+            "smartBatterySummary": {"lastKnownStateOfCharge": 77},
+        }})
 
     def test_battery_mode_sensor(self):
-        sensor = FrankEnergieBatteryModeSensor(None, "id123", "auto", self.details)
+        sensor = FrankEnergieBatteryModeSensor(self.coordinator, "id123")
         self.assertEqual(sensor.state, "auto")
         self.assertIn("SolarEdge", sensor.device_info["name"])
         self.assertEqual(sensor._attr_name, "Batterijmodus")
 
     def test_battery_soc_sensor(self):
-        sensor = FrankEnergieBatteryStateOfChargeSensor(None, "id123", 77, self.details)
+        sensor = FrankEnergieBatteryStateOfChargeSensor(self.coordinator, "id123")
         self.assertEqual(sensor.state, 77)
         self.assertIn("SolarEdge", sensor.device_info["name"])
         self.assertEqual(sensor._attr_name, "State of Charge")
         self.assertEqual(sensor._attr_unit_of_measurement, "%")
 
     def test_battery_session_result_sensor(self):
-        sensor = FrankEnergieBatterySessionResultSensor(None, self.session, 'periodEpexResult', 'epex', self.details)
+        sensor = FrankEnergieBatterySessionResultSensor(self.coordinator, "id123", 'periodEpexResult', 'epex')
         self.assertEqual(sensor.state, -0.10908)
         self.assertIn("SolarEdge", sensor.device_info["name"])
         self.assertEqual(sensor._attr_name, "EPEX-correctie vandaag")
         self.assertEqual(sensor._attr_unit_of_measurement, "EUR")
 
+    def test_battery_missing_from_snapshot_is_unavailable(self):
+        sensor = FrankEnergieBatteryStateOfChargeSensor(self.coordinator, "other")
+        self.assertFalse(sensor.available)
+        self.assertIsNone(sensor.state)
+        self.assertTrue(FrankEnergieBatteryStateOfChargeSensor(self.coordinator, "id123").available)
+
     def test_total_result_sensor(self):
-        sensor = FrankEnergieTotalResultSensor(None, 'periodEpexResult')
+        sensor = FrankEnergieTotalResultSensor(make_coordinator(), 'periodEpexResult')
         self.assertEqual(sensor._attr_name, "EPEX-correctie vandaag")
         self.assertEqual(sensor._attr_unit_of_measurement, "EUR")
         self.assertEqual(sensor.device_info["name"], "Totaal batterijen")
-        self.assertIsNone(sensor.state)
+        self.assertEqual(sensor.state, 0)
+        self.assertEqual(FrankEnergieTotalResultSensor(self.coordinator, 'periodEpexResult').state, -0.10908)
 
     def test_total_avg_soc_sensor(self):
-        sensor = FrankEnergieTotalAvgSocSensor(None)
-        sensor._state = 55.5
-        self.assertEqual(sensor.state, 55.5)
+        sensor = FrankEnergieTotalAvgSocSensor(self.coordinator)
+        self.assertEqual(sensor.state, 77)
         self.assertEqual(sensor._attr_name, "Gemiddelde SoC")
         self.assertEqual(sensor.device_info["name"], "Totaal batterijen")
         self.assertEqual(sensor._attr_unit_of_measurement, "%")
 
     def test_total_last_mode_sensor(self):
-        sensor = FrankEnergieTotalLastModeSensor(None)
-        sensor._state = "auto"
+        sensor = FrankEnergieTotalLastModeSensor(self.coordinator)
         self.assertEqual(sensor.state, "auto")
         self.assertEqual(sensor._attr_name, "Batterijmodus")
         self.assertEqual(sensor.device_info["name"], "Totaal batterijen")
 
+    def test_total_sensors_scoped_to_entry(self):
+        from custom_components.frank_energie_slim.sensor import create_total_entity_group, migrate_total_unique_id
+        first = create_total_entity_group(self.coordinator, "entry1")
+        second = create_total_entity_group(self.coordinator, "entry2")
+        first_ids = {entity._attr_unique_id for entity in first.entities}
+        second_ids = {entity._attr_unique_id for entity in second.entities}
+        self.assertEqual(len(first_ids), 8)
+        self.assertFalse(first_ids & second_ids)
+        self.assertIn("frank_energie_entry1_average_soc", first_ids)
+        self.assertEqual(migrate_total_unique_id("frank_energie_epex_total", "entry1"), "frank_energie_entry1_epex_total")
+        self.assertIsNone(migrate_total_unique_id("frank_energie_battery_id123_mode", "entry1"))
+
+class TestChangeDetection(unittest.TestCase):
+    def _sensor(self, deadband=0):
+        self.coordinator = make_coordinator({"id123": {"smartBatterySummary": {"lastKnownStateOfCharge": 50}}})
+        sensor = FrankEnergieBatteryStateOfChargeSensor(self.coordinator, "id123")
+        sensor._deadband = deadband
+        self.writes = []
+        # Stand in for the state machine write done by Home Assistant
+        with patch('homeassistant.helpers.entity.Entity.async_write_ha_state', lambda entity: self.writes.append(entity.state)):
+            sensor.async_write_ha_state()
+        return sensor
+
+    def _update(self, sensor, value, attributes=None):
+        self.coordinator.data = make_coordinator(
+            {"id123": {"smartBatterySummary": {"lastKnownStateOfCharge": value}}}, attributes
+        ).data
+        with patch('homeassistant.helpers.entity.Entity.async_write_ha_state', lambda entity: self.writes.append(entity.state)):
+            sensor._handle_coordinator_update()
+
+    def test_unchanged_state_is_not_written(self):
+        sensor = self._sensor()
+        self._update(sensor, 50)
+        self._update(sensor, 51)
+        self.assertEqual(self.writes, [50, 51])
+
+    def test_deadband_accumulates_small_changes(self):
+        sensor = self._sensor(deadband=1)
+        self._update(sensor, 50.5)
+        self._update(sensor, 50.9)
+        self._update(sensor, 51.2)
+        self.assertEqual(self.writes, [50, 51.2])
+
+    def test_transition_to_unknown_is_always_written(self):
+        sensor = self._sensor(deadband=5)
+        self._update(sensor, None)
+        self._update(sensor, 50)
+        self.assertEqual(self.writes, [50, None, 50])
+
+    def test_attribute_changes_are_written(self):
+        sensor = self._sensor()
+        self._update(sensor, 50, {"stale": True})
+        self._update(sensor, 50, {"stale": True})
+        self.assertEqual(self.writes, [50, 50])
+
 class TestBatteryModeHelper(unittest.TestCase):
     def test_imbalance_aggressive(self):
         settings = {
@@ -128,113 +198,227 @@ class TestBatteryModeHelper(unittest.TestCase):
         }
         self.assertEqual(get_battery_mode_from_settings(settings), 'something_else')
 
-class TestReAuthentication(unittest.TestCase):
-    @patch('custom_components.frank_energie_slim.api.requests.post')
-    async def test_authentication_required_exception_handling(self, mock_post):
-        """Test that when an Authentication required exception is raised, the system re-authenticates."""
-        # Create mock HomeAssistant
-        hass = MagicMock()
-
-        # Create mock client
-        client = FrankEnergie()
-
-        # Setup hass.data with our test client and credentials
-        test_username = "test_user"
-        test_password = "test_password"
-        entry_id = "test_entry_id"
-        hass.data = {
-            "frank_energie_slim": {
-                entry_id: {
-                    "client": client,
-                    "battery_ids": ["battery1"],
-                    "username": test_username,
-                    "password": test_password,
-                    "battery_details": [{"smartBattery": {}, "smartBatterySummary": {}}]
-                }
-            }
-        }
+def make_token_store(tokens=None):
+    token_store = MagicMock()
+    token_store.async_get = AsyncMock(return_value=tokens)
+    return token_store
+
+def make_snapshot_store(saved_at=None, battery_data=None):
+    snapshot = MagicMock()
+    snapshot.async_load = AsyncMock(return_value=(saved_at, battery_data or []))
+    return snapshot
 
-        # Setup mock responses
-        # First call raises Authentication required exception
-        def side_effect(*args, **kwargs):
-            if mock_post.call_count == 1:
-                response = MagicMock()
-                response.json.return_value = {
-                    "errors": [{"message": "user-error:auth-not-authorised"}]
-                }
-                return response
-            else:
-                response = MagicMock()
-                response.json.return_value = {
-                    "data": {
-                        "login": {
-                            "authToken": "new_auth_token",
-                            "refreshToken": "new_refresh_token"
-                        }
-                    }
-                }
-                return response
-
-        mock_post.side_effect = side_effect
-
-        # Mock async_add_executor_job to simulate the API calls
-        async def async_add_executor_job(func, *args, **kwargs):
-            if func == client.get_smart_battery_sessions:
-                if client.auth and 'authToken' in client.auth:
-                    return {
-                        "data": {
-                            "smartBatterySessions": {
-                                "deviceId": args[0],
-                                "periodStartDate": "2025-04-01",
-                                "periodEndDate": "2025-04-10",
-                                "periodEpexResult": 10.0,
-                                "periodFrankSlim": 5.0,
-                                "periodImbalanceResult": 2.0,
-                                "periodTotalResult": 17.0,
-                                "periodTradeIndex": 1.0,
-                                "periodTradingResult": 3.0,
-                                "sessions": []
-                            }
-                        }
-                    }
-                else:
-                    raise Exception("Authentication required")
-            elif func == client.login:
-                client.auth = {"authToken": "new_auth_token", "refreshToken": "new_refresh_token"}
-                return client.auth
-            elif func == client.get_smart_battery_details:
-                return {
-                    "data": {
-                        "smartBattery": {
-                            "settings": {}
-                        },
-                        "smartBatterySummary": {}
-                    }
-                }
-            return None
-
-        hass.async_add_executor_job.side_effect = async_add_executor_job
-
-        # Import the function here to avoid circular imports
+BATCH_RESPONSE = {
+    "battery1": {
+        "smartBatterySessions": {
+            "deviceId": "battery1",
+            "periodStartDate": "2025-04-01",
+            "periodEndDate": "2025-04-10",
+            "periodEpexResult": 10.0,
+            "periodFrankSlim": 5.0,
+            "periodImbalanceResult": 2.0,
+            "periodTotalResult": 17.0,
+            "periodTradeIndex": 1.0,
+            "periodTradingResult": 3.0,
+            "sessions": []
+        },
+        "smartBattery": {"settings": {}},
+        "smartBatterySummary": {"lastKnownStateOfCharge": 50},
+    }
+}
+
+class TestSetupEntry(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.client = MagicMock()
+        self.client.async_ensure_authenticated = AsyncMock()
+        self.client.get_smart_batteries = AsyncMock(return_value={"data": {"smartBatteries": [{"id": "battery1"}]}})
+        self.client.get_smart_battery_batch = AsyncMock(return_value=BATCH_RESPONSE)
+        self.hass = MagicMock()
+        self.hass.data = {}
+        self.tasks = []
+        self.hass.async_create_task.side_effect = self.tasks.append
+        self.entry = MagicMock()
+        self.entry.entry_id = "test_entry_id"
+        self.entry.data = {"username": "test_user", "password": "test_password"}
+        self.entry.options = {}
+        self.async_add_entities = MagicMock()
+        self.token_store = make_token_store()
+        self.snapshot = make_snapshot_store()
+
+    async def _setup(self):
+        """Run setup; returns the background tasks it created without running them."""
         from custom_components.frank_energie_slim.sensor import async_setup_entry
+        with patch('custom_components.frank_energie_slim.sensor.AsyncFrankEnergie', return_value=self.client) as client_class, \
+                patch('custom_components.frank_energie_slim.sensor.async_create_clientsession'), \
+                patch('custom_components.frank_energie_slim.sensor.async_migrate_total_unique_ids', new=AsyncMock()), \
+                patch('custom_components.frank_energie_slim.sensor.get_token_store', return_value=self.token_store), \
+                patch('custom_components.frank_energie_slim.sensor.SnapshotStore', return_value=self.snapshot), \
+                patch('custom_components.frank_energie_slim.sensor.async_call_later') as call_later:
+            await async_setup_entry(self.hass, self.entry, self.async_add_entities)
+        self.client_class = client_class
+        self.call_later = call_later
+        self.data = self.hass.data["frank_energie_slim"]["test_entry_id"]
+        tasks, self.tasks[:] = list(self.tasks), []
+        return tasks
+
+    async def _run(self, tasks):
+        with patch('custom_components.frank_energie_slim.sensor.async_call_later') as call_later:
+            for task in tasks:
+                await task
+        # Background work started by the refresh, e.g. the history sync, is not under test here
+        for task in self.tasks:
+            task.close()
+        self.tasks.clear()
+        return call_later
+
+    async def test_setup_does_not_wait_for_the_api(self):
+        tasks = await self._setup()
+        # Totals are registered before any request is made
+        self.client.async_ensure_authenticated.assert_not_awaited()
+        self.client.get_smart_batteries.assert_not_awaited()
+        self.assertEqual(len(self.async_add_entities.call_args_list[0].args[0]), 8)
+
+        call_later = await self._run(tasks)
+        # The background refresh logs in, discovers the battery and adds its entities
+        self.client.set_credentials.assert_called_once_with("test_user", "test_password")
+        self.client.async_ensure_authenticated.assert_awaited_once()
+        self.assertEqual(len(self.async_add_entities.call_args_list[1].args[0]), 7)
+        self.assertEqual(self.data["coordinator"].device_ids, ["battery1"])
+        self.assertEqual(self.data["total_entities"][4].state, 17.0)
+        # Discovery and the refresh each fetch once; the refresh reuses the details fetched during discovery
+        self.assertEqual(self.client.get_smart_battery_batch.await_count, 2)
+        refresh_call = self.client.get_smart_battery_batch.await_args_list[1]
+        self.assertFalse(refresh_call.kwargs["include_details"])
+        self.snapshot.async_save.assert_called_once()
+        call_later.assert_called_once()
+        # Credentials are no longer scanned from hass.data for re-authentication
+        self.assertNotIn("password", self.data)
+
+    async def test_warm_start_from_snapshot(self):
+        from custom_components.frank_energie_slim.models import parse_battery_results
+        saved_at = datetime(2025, 4, 10, 12, 0)
+        self.snapshot = make_snapshot_store(saved_at, list(parse_battery_results(BATCH_RESPONSE).values()))
+        tasks = await self._setup()
+        entities = self.async_add_entities.call_args.args[0]
+        self.assertEqual(len(entities), 15)
+        self.assertEqual(entities[1].state, 50)
+        self.assertEqual(self.data["total_entities"][4].state, 17.0)
+        self.assertEqual(self.data["refresh_status"].last_success, saved_at)
+
+        await self._run(tasks)
+        # The restored battery is still part of the account: no new entities and no extra fetch
+        self.assertEqual(self.async_add_entities.call_count, 1)
+        self.assertEqual(self.client.get_smart_battery_batch.await_count, 1)
+
+    async def test_failed_refresh_serves_last_values_as_stale(self):
+        from custom_components.frank_energie_slim.api import AsyncFrankEnergie
+        from custom_components.frank_energie_slim.ratelimit import RetryPolicy, TokenBucket, TransientError
+        await self._run(await self._setup())
+        self.snapshot.async_save.reset_mock()
+        # A real client whose every request fails with a 503, through its retries and circuit breaker
+        coordinator = self.data["coordinator"]
+        mocked_client = coordinator.client
+        client = AsyncFrankEnergie(None, auth_token="test_auth_token", rate_limiter=TokenBucket(rate=1000, capacity=1000),
+                                   retry_policy=RetryPolicy(attempts=2, base_delay=0))
+        client._post_once = AsyncMock(side_effect=TransientError("HTTP 503"))
+        coordinator.client = client
+        # The failure is not propagated and the next refresh is still scheduled
+        call_later = await self._run([self.data["refresh"]()])
+        call_later.assert_called_once()
+        self.assertTrue(client._post_once.await_count)
+
+        soc_sensor = next(e for e in self.data["entities"] if e._attr_unique_id == "frank_energie_battery_battery1_soc")
+        self.assertEqual(soc_sensor.state, 50)
+        self.assertEqual(self.data["total_entities"][4].state, 17.0)
+        self.assertEqual(soc_sensor.extra_state_attributes["consecutive_failures"], 1)
+        self.assertTrue(self.data["total_entities"][0].extra_state_attributes["stale"])
+        self.assertTrue(soc_sensor.available)
+        # The last good snapshot is not overwritten by the failed refresh
+        self.snapshot.async_save.assert_not_called()
+
+        coordinator.client = mocked_client
+        await self._run([self.data["refresh"]()])
+        self.assertIsNone(soc_sensor.extra_state_attributes)
+
+    async def test_fleet_totals_refresh_on_request(self):
+        from custom_components.frank_energie_slim.fleet import FrankEnergieFleet
+        self.entry.options = {"fleet_mode": True}
+        with patch('custom_components.frank_energie_slim.fleet.async_call_later'):
+            fleet = FrankEnergieFleet(self.hass, MagicMock())
+            fleet.clients.acquire = MagicMock(return_value=self.client)
+            with patch('custom_components.frank_energie_slim.fleet.get_fleet', return_value=fleet), \
+                    patch('custom_components.frank_energie_slim.sensor.async_get_clientsession'):
+                await self._run(await self._setup())
+            fleet_total = next(
+                e for e in self.async_add_entities.call_args_list[0].args[0] if e.coordinator is not self.data["coordinator"]
+            )
+            fetches = self.client.get_smart_battery_batch.await_count
+            # What homeassistant.update_entity does for a coordinator entity
+            await fleet_total.coordinator.async_refresh()
+        await self._run([])
+        self.assertTrue(fleet_total.coordinator.last_update_success)
+        self.assertEqual(self.client.get_smart_battery_batch.await_count, fetches + 1)
+        self.assertEqual(fleet_total.coordinator.data.device_ids, ["battery1"])
+
+    async def test_diagnostic_sensors_and_download(self):
+        from custom_components.frank_energie_slim.breaker import CircuitBreaker
+        from custom_components.frank_energie_slim.diagnostics import async_get_config_entry_diagnostics
+        from custom_components.frank_energie_slim.metrics import ApiMetrics
+        self.entry.options = {"diagnostic_sensors": True}
+        self.client.metrics = ApiMetrics()
+        self.client.metrics.record("SmartBatteries", self.client.metrics.start())
+        self.client.circuit_breaker = CircuitBreaker()
+        await self._run(await self._setup())
+        duration, calls = [
+            entity for entity in self.data["entities"]
+            if entity._attr_unique_id in ("frank_energie_test_entry_id_refresh_duration", "frank_energie_test_entry_id_api_calls_today")
+        ]
+        self.assertEqual(duration.entity_category, "diagnostic")
+        self.assertIsNotNone(duration.state)
+        self.assertEqual(calls.state, 1)
+
+        diagnostics = await async_get_config_entry_diagnostics(self.hass, self.entry)
+        self.assertEqual(diagnostics["entry"]["data"]["password"], "**REDACTED**")
+        self.assertEqual(diagnostics["batteries"], 1)
+        self.assertEqual(diagnostics["refresh"]["consecutive_failures"], 0)
+        self.assertEqual(diagnostics["circuit_breaker"]["state"], "closed")
+        self.assertEqual(diagnostics["api"]["operations"]["SmartBatteries"]["calls"], 1)
 
-        # Call async_setup_entry to initialize the integration
-        async_add_entities = MagicMock()
-        entry = MagicMock()
-        entry.data = {"username": test_username, "password": test_password}
+    async def test_setup_reuses_stored_tokens(self):
+        self.token_store = make_token_store({"authToken": "stored", "refreshToken": "refresh"})
+        for task in await self._setup():
+            task.close()
+        self.assertEqual(self.client_class.call_args.args[1:], ("stored", "refresh"))
+        # Renewed tokens are persisted for the next restart
+        self.client.token_listener({"authToken": "renewed", "refreshToken": "refresh2"})
+        self.token_store.async_update.assert_called_once_with("test_user", {"authToken": "renewed", "refreshToken": "refresh2"})
 
-        # This should trigger the re-authentication logic
-        await async_setup_entry(hass, entry, async_add_entities)
+class TestFetchBatteryResults(unittest.IsolatedAsyncioTestCase):
+    async def test_falls_back_to_concurrent_fetch_when_batch_fails(self):
+        from custom_components.frank_energie_slim.coordinator import async_fetch_battery_results
+        client = MagicMock()
+        client.get_smart_battery_batch = AsyncMock(side_effect=Exception("502 Bad Gateway"))
+        client.get_smart_battery_concurrent = AsyncMock(return_value={"battery1": {}})
+        results = await async_fetch_battery_results(client, ["battery1"], datetime(2025, 4, 1), True, {"max_concurrency": 2})
+        self.assertEqual(results, {"battery1": {}})
+        self.assertEqual(client.get_smart_battery_concurrent.await_args.kwargs["max_concurrency"], 2)
 
-        # Verify that login was called with the correct credentials
-        login_calls = [call for call in hass.async_add_executor_job.call_args_list 
-                      if call[0][0] == client.login]
-        self.assertTrue(any(call[0][1:] == (test_username, test_password) for call in login_calls))
+    async def test_concurrent_only_when_batching_disabled(self):
+        from custom_components.frank_energie_slim.coordinator import async_fetch_battery_results
+        client = MagicMock()
+        client.get_smart_battery_batch = AsyncMock()
+        client.get_smart_battery_concurrent = AsyncMock(return_value={})
+        await async_fetch_battery_results(client, ["battery1"], datetime(2025, 4, 1), False, {"batch_requests": False})
+        client.get_smart_battery_batch.assert_not_awaited()
 
-        # Verify that after re-authentication, the operation was retried
-        session_calls = [call for call in hass.async_add_executor_job.call_args_list 
-                        if call[0][0] == client.get_smart_battery_sessions]
-        self.assertGreaterEqual(len(session_calls), 1)
+    async def test_authentication_error_is_not_swallowed(self):
+        from custom_components.frank_energie_slim.coordinator import async_fetch_battery_results
+        client = MagicMock()
+        client.get_smart_battery_batch = AsyncMock(side_effect=Exception("Authentication required"))
+        client.get_smart_battery_concurrent = AsyncMock()
+        with self.assertRaises(Exception):
+            await async_fetch_battery_results(client, ["battery1"], datetime(2025, 4, 1), True, {})
+        client.get_smart_battery_concurrent.assert_not_awaited()
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+from datetime import date
+from unittest.mock import patch
+import aiohttp
+from aiohttp.test_utils import TestServer
+from benchmarks.server import Faults, StandInAPI, create_app
+from benchmarks.simulated_api import SimulatedAccount
+from custom_components.frank_energie_slim.api import AsyncFrankEnergie, DATA_URL, DATA_URL_ENV
+from custom_components.frank_energie_slim.ratelimit import TokenBucket
+
+class TestStandInServer(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.api = StandInAPI(SimulatedAccount(batteries=2), Faults(seed=1))
+        self.server = TestServer(create_app(self.api))
+        await self.server.start_server()
+        self.session = aiohttp.ClientSession()
+        self.client = AsyncFrankEnergie(self.session, rate_limiter=TokenBucket(), data_url=str(self.server.make_url("/")))
+        self.client.set_credentials("user@example.com", "secret")
+
+    async def asyncTearDown(self):
+        await self.session.close()
+        await self.server.close()
+
+    async def test_batteries_through_the_client(self):
+        await self.client.async_ensure_authenticated()
+        batteries = (await self.client.get_smart_batteries())['data']['smartBatteries']
+        device_ids = [battery['id'] for battery in batteries]
+        results = await self.client.get_smart_battery_batch(device_ids, date(2025, 4, 20), date(2025, 4, 20))
+        self.assertEqual(sorted(results), ["battery0000", "battery0001"])
+        self.assertEqual(results["battery0001"]["smartBattery"]["id"], "battery0001")
+        # Sent by hash, then registered with the full document
+        self.assertEqual(self.api.stats["operation:SmartBatteryBatch"], 2)
+        await self.client.get_smart_battery_batch(device_ids, date(2025, 4, 20), date(2025, 4, 20))
+        self.assertEqual(self.api.stats["operation:SmartBatteryBatch"], 3)
+        self.assertEqual(self.api.stats["persisted:miss"], 3)
+
+    async def test_expired_token_is_renewed(self):
+        await self.client.async_ensure_authenticated()
+        self.api.expire_tokens()
+        await self.client.get_smart_batteries()
+        self.assertEqual(self.api.stats["fault:auth"], 1)
+        # Both sent by hash first and registered with the full document
+        self.assertEqual(self.api.stats["operation:RenewToken"], 2)
+        self.assertEqual(self.api.stats["operation:Login"], 2)
+
+    async def test_get_requests(self):
+        self.client.get_requests = True
+        await self.client.async_ensure_authenticated()
+        await self.client.get_smart_batteries()
+        await self.client.get_smart_batteries()
+        self.assertTrue(self.client.get_requests)
+        self.assertEqual(self.api.stats["operation:SmartBatteries"], 3)
+
+    async def test_server_without_persisted_queries(self):
+        self.api.account.persisted_queries = False
+        await self.client.async_ensure_authenticated()
+        self.assertFalse(self.client.persisted_queries)
+        await self.client.get_smart_batteries()
+        self.assertEqual(self.api.stats["operation:SmartBatteries"], 1)
+
+    async def test_injected_faults(self):
+        self.api.faults = Faults(rate_limit_rate=1.0, retry_after=7)
+        status, headers, _ = await self.api.handle({"operationName": "SmartBatteries"}, {})
+        self.assertEqual((status, headers["Retry-After"]), (429, "7"))
+        self.api.faults = Faults(error_rate=1.0)
+        status, _, _ = await self.api.handle({"operationName": "SmartBatteries"}, {})
+        self.assertIn(status, (500, 502, 503))
+        self.api.faults = Faults(null_data_rate=1.0)
+        _, _, body = await self.api.handle({"operationName": "Login", "variables": {}}, {})
+        self.assertEqual(body, {"data": None})
+
+class TestServerWithoutGet(unittest.IsolatedAsyncioTestCase):
+    async def test_get_falls_back_to_post(self):
+        api = StandInAPI(SimulatedAccount(batteries=1))
+        server = TestServer(create_app(api, get_requests=False))
+        await server.start_server()
+        async with aiohttp.ClientSession() as session:
+            client = AsyncFrankEnergie(session, rate_limiter=TokenBucket(), data_url=str(server.make_url("/")),
+                                       get_requests=True)
+            await client.login("user@example.com", "secret")
+            await client.get_smart_batteries()
+            batteries = await client.get_smart_batteries()
+        await server.close()
+        self.assertFalse(client.get_requests)
+        self.assertTrue(client.persisted_queries)
+        self.assertEqual(batteries["data"]["smartBatteries"], [{"id": "battery0000"}])
+
+class TestDataUrl(unittest.TestCase):
+    def test_environment_override(self):
+        self.assertEqual(AsyncFrankEnergie(None).DATA_URL, DATA_URL)
+        with patch.dict('os.environ', {DATA_URL_ENV: "http://127.0.0.1:8765/"}):
+            self.assertEqual(AsyncFrankEnergie(None).DATA_URL, "http://127.0.0.1:8765/")
+            self.assertEqual(AsyncFrankEnergie(None, data_url="http://other/").DATA_URL, "http://other/")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+from custom_components.frank_energie_slim.models import parse_battery_result
+from custom_components.frank_energie_slim.snapshot import SnapshotStore
+
+RESULT = {
+    "smartBatterySessions": {
+        "deviceId": "battery1",
+        "periodStartDate": "2025-04-01",
+        "periodEndDate": "2025-04-10",
+        "periodTotalResult": 17.0,
+        "sessions": [{"date": "2025-04-10", "result": 1.5, "cumulativeResult": 17.0}],
+    },
+    "smartBattery": {"id": "battery1", "brand": "SolarEdge", "settings": {"batteryMode": "IMBALANCE_TRADING"}},
+    "smartBatterySummary": {"lastKnownStateOfCharge": 50, "lastUpdate": "2025-04-10T12:00:00Z"},
+}
+
+class TestSnapshotStore(unittest.IsolatedAsyncioTestCase):
+    async def test_round_trip(self):
+        store = MagicMock()
+        with patch('custom_components.frank_energie_slim.snapshot.Store', return_value=store):
+            snapshot = SnapshotStore(MagicMock(), "entry1")
+        data = parse_battery_result("battery1", RESULT)
+        snapshot.async_save([data])
+        store.async_load = AsyncMock(return_value=store.async_delay_save.call_args.args[0]())
+
+        saved_at, restored = await snapshot.async_load()
+        self.assertIsNotNone(saved_at)
+        self.assertEqual(restored, [data])
+
+    async def test_pending_write_is_not_postponed(self):
+        store = MagicMock()
+        with patch('custom_components.frank_energie_slim.snapshot.Store', return_value=store):
+            snapshot = SnapshotStore(MagicMock(), "entry1")
+        data = parse_battery_result("battery1", RESULT)
+        snapshot.async_save([data])
+        snapshot.async_save([])
+        # The second refresh does not restart the timer, but its values are written
+        store.async_delay_save.assert_called_once()
+        self.assertEqual(store.async_delay_save.call_args.args[0]()["batteries"], [])
+        # Once written, the next refresh schedules a new write
+        snapshot.async_save([data])
+        self.assertEqual(store.async_delay_save.call_count, 2)
+
+    async def test_no_snapshot(self):
+        store = MagicMock()
+        store.async_load = AsyncMock(return_value=None)
+        with patch('custom_components.frank_energie_slim.snapshot.Store', return_value=store):
+            snapshot = SnapshotStore(MagicMock(), "entry1")
+        self.assertEqual(await snapshot.async_load(), (None, []))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,23 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+from custom_components.frank_energie_slim.tokens import TokenStore
+
+class TestTokenStore(unittest.IsolatedAsyncioTestCase):
+    async def test_tokens_per_account(self):
+        store = MagicMock()
+        store.async_load = AsyncMock(return_value={"a@example.com": {"authToken": "a", "refreshToken": "ra"}})
+        with patch('custom_components.frank_energie_slim.tokens.Store', return_value=store):
+            tokens = TokenStore(MagicMock())
+        self.assertEqual(await tokens.async_get("a@example.com"), {"authToken": "a", "refreshToken": "ra"})
+        self.assertIsNone(await tokens.async_get("b@example.com"))
+
+        tokens.async_update("b@example.com", {"authToken": "b", "refreshToken": "rb", "other": 1})
+        self.assertEqual(await tokens.async_get("b@example.com"), {"authToken": "b", "refreshToken": "rb"})
+        await tokens.async_remove("a@example.com")
+        self.assertIsNone(await tokens.async_get("a@example.com"))
+        saved = store.async_delay_save.call_args.args[0]()
+        self.assertEqual(list(saved), ["b@example.com"])
+        store.async_load.assert_awaited_once()
+
+if __name__ == "__main__":
+    unittest.main()